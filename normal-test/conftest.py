@@ -1,2 +1,16 @@
+import os
+
+from qa_common.tracing import TRACE_DIR, TraceRecorder
+
+# Options and hooks shared with the visual suite.
+pytest_plugins = ["qa_common.pytest_plugin"]
+
+
 def pytest_addoption(parser):
-    parser.addoption("--headless", action="store_true", default=False, help="Run browsers in headless mode")
\ No newline at end of file
+    parser.addoption("--browser", action="store", default="chrome", help="Browser to use: chrome, firefox, edge")
+    parser.addoption("--mobile", action="store_true", help="Run in mobile viewport")
+
+
+def pytest_configure(config):
+    if config.getoption("--tracing"):
+        config.pluginmanager.register(TraceRecorder(os.path.join("screenshots", TRACE_DIR)), "trace_recorder")
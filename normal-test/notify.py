@@ -1,44 +1,318 @@
-import os
-import yagmail
-from slack_sdk import WebClient
-from slack_sdk.errors import SlackApiError
-from dotenv import load_dotenv
-
-load_dotenv("config.env")
-
-# Load config
-GMAIL_USER = os.getenv("GMAIL_USER")
-GMAIL_APP_PASSWORD = os.getenv("GMAIL_APP_PASSWORD")
-SLACK_TOKEN = os.getenv("SLACK_TOKEN")
-SLACK_CHANNEL = os.getenv("SLACK_CHANNEL")
-REPORT_PATH = "test-report.html"
-
-def send_email():
-    try:
-        yag = yagmail.SMTP(GMAIL_USER, GMAIL_APP_PASSWORD)
-        subject = "📊 Selenium Test Report"
-        body = "Hi,\n\nAttached is the latest Selenium test report.\n\nRegards,\nAutomation Bot"
-        yag.send(to=GMAIL_USER, subject=subject, contents=body, attachments=REPORT_PATH)
-        print("✅ Email sent.")
-    except Exception as e:
-        print(f"❌ Email failed: {e}")
-
-def send_slack_message():
-    client = WebClient(token=SLACK_TOKEN)
-    try:
-        # Upload file
-        result = client.files_upload(
-            channels=SLACK_CHANNEL,
-            file=REPORT_PATH,
-            title="📊 Selenium Test Report"
-        )
-        print("✅ Report uploaded to Slack.")
-    except SlackApiError as e:
-        print(f"❌ Slack error: {e.response['error']}")
-
-if __name__ == "__main__":
-    if os.path.exists(REPORT_PATH):
-        send_email()
-        send_slack_message()
-    else:
-        print("❌ Report not found.")
+import argparse
+import asyncio
+import gzip
+import hashlib
+import io
+import json
+import os
+import smtplib
+import ssl
+import time
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from email.message import EmailMessage
+from urllib.parse import urljoin
+
+import aiohttp
+from dotenv import load_dotenv
+from PIL import Image
+
+load_dotenv("config.env")
+
+# Load config
+GMAIL_USER = os.getenv("GMAIL_USER")
+GMAIL_APP_PASSWORD = os.getenv("GMAIL_APP_PASSWORD")
+EMAIL_TO = os.getenv("EMAIL_TO") or GMAIL_USER
+# Point these at a local SMTP server (SMTP_STARTTLS=0, no password) or a
+# stub Slack API to try the notifications without sending anything.
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") != "0"
+SLACK_TOKEN = os.getenv("SLACK_TOKEN")
+SLACK_CHANNEL = os.getenv("SLACK_CHANNEL")
+SLACK_BASE_URL = os.getenv("SLACK_BASE_URL", "https://slack.com/api/")
+REPORT_PATH = "test-report.html"
+RESULTS_PATH = "test-results.xml"
+# The visual suite writes each run's diffs to screenshots/<run id>/failed/.
+DIFF_DIR = os.path.join("..", "visual-test", "screenshots")
+RUN_ID_ENV = "QA_RUN_ID"
+STATE_PATH = ".notify_state.json"
+TIMEOUT = 30
+RETRIES = 2
+# Seconds before the first retry of a failed step; doubled for each one after.
+BACKOFF = 1
+SLOWEST = 5
+MAX_THUMBNAILS = 6
+THUMB_WIDTH = 240
+TITLE = "📊 Selenium Test Report"
+
+
+@dataclass
+class Summary:
+    counts: dict = field(default_factory=dict)
+    failed: list = field(default_factory=list)
+    slowest: list = field(default_factory=list)
+    thumbnails: list = field(default_factory=list)
+    report: bytes = None
+    report_name: str = None
+
+    def text(self):
+        if not self.counts:
+            lines = ["No test results found."]
+        else:
+            lines = [", ".join(f"{n} {outcome}" for outcome, n in self.counts.items())]
+        if self.failed:
+            lines.append("\n❌ Failed:")
+            lines += [f"  • {nodeid}" for nodeid in self.failed]
+        if self.slowest:
+            lines.append("\n🐢 Slowest:")
+            lines += [f"  • {nodeid} ({seconds:.1f}s)" for nodeid, seconds in self.slowest]
+        return "\n".join(lines)
+
+    def fingerprint(self):
+        # What the results are, not when they ran: the report itself carries
+        # timestamps, so it is left out.
+        digest = hashlib.sha256(json.dumps([self.counts, self.failed], sort_keys=True).encode("utf-8"))
+        for name, data in self.thumbnails:
+            digest.update(name.encode("utf-8"))
+            digest.update(hashlib.sha256(data).digest())
+        return digest.hexdigest()
+
+
+def read_results(path):
+    # Counts, failed tests and per-test durations from pytest's --junitxml
+    # output.
+    counts = {"passed": 0, "failed": 0, "error": 0, "skipped": 0}
+    failed, durations = [], []
+    if not os.path.exists(path):
+        return {}, failed, durations
+    root = ET.parse(path).getroot()
+    for case in root.iter("testcase"):
+        nodeid = f"{case.get('classname', '')}::{case.get('name', '')}".strip(":")
+        durations.append((nodeid, float(case.get("time") or 0)))
+        tags = {child.tag for child in case}
+        outcome = ("failed" if "failure" in tags else "error" if "error" in tags
+                   else "skipped" if "skipped" in tags else "passed")
+        counts[outcome] += 1
+        if outcome in ("failed", "error"):
+            failed.append(nodeid)
+    return {k: v for k, v in counts.items() if v}, failed, durations
+
+
+def thumbnail(path, width=THUMB_WIDTH):
+    with Image.open(path) as img:
+        img = img.convert("RGB")
+        if img.width > width:
+            img = img.resize((width, max(1, round(img.height * width / img.width))), Image.Resampling.LANCZOS)
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=75, optimize=True)
+    return buf.getvalue()
+
+
+def run_diffs(directory, run_id):
+    # The diffs of one run, found by its id rather than by file times.
+    if not run_id:
+        return []
+    failed_dir = os.path.join(directory, run_id, "failed")
+    if not os.path.isdir(failed_dir):
+        return []
+    diffs = sorted(f for f in os.listdir(failed_dir) if f.endswith("_diff.png"))
+    return [os.path.join(failed_dir, f) for f in diffs[:MAX_THUMBNAILS]]
+
+
+def build_summary(results_paths=(RESULTS_PATH,), report_path=REPORT_PATH, diff_dir=DIFF_DIR, run_id=None):
+    # Built once and shared by every channel, from the results of one or
+    # more suites.
+    counts, failed, durations = {}, [], []
+    for path in results_paths:
+        suite_counts, suite_failed, suite_durations = read_results(path)
+        for outcome, n in suite_counts.items():
+            counts[outcome] = counts.get(outcome, 0) + n
+        failed += suite_failed
+        durations += suite_durations
+    summary = Summary(counts, failed, sorted(durations, key=lambda d: d[1], reverse=True)[:SLOWEST])
+    summary.thumbnails = [(os.path.splitext(os.path.basename(p))[0] + ".jpg", thumbnail(p))
+                          for p in run_diffs(diff_dir, run_id)]
+    if os.path.exists(report_path):
+        with open(report_path, "rb") as f:
+            summary.report = gzip.compress(f.read(), compresslevel=9, mtime=0)
+        summary.report_name = os.path.basename(report_path) + ".gz"
+    return summary
+
+
+class SlackError(RuntimeError):
+    def __init__(self, method, error):
+        super().__init__(f"{method}: {error}")
+        self.error = error
+
+
+async def _retry(step, retries, retryable=lambda e: True):
+    # Retries one step of a send, never the whole send: a step is only retried
+    # when `retryable` says the failed attempt cannot have been delivered.
+    for attempt in range(retries + 1):
+        try:
+            return await step()
+        except Exception as e:
+            if attempt == retries or not retryable(e):
+                raise
+            await asyncio.sleep(BACKOFF * 2 ** attempt)
+
+
+def _smtp_send(message, timeout):
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=timeout) as smtp:
+        if SMTP_STARTTLS:
+            smtp.starttls(context=ssl.create_default_context())
+        if GMAIL_APP_PASSWORD:
+            smtp.login(GMAIL_USER, GMAIL_APP_PASSWORD)
+        smtp.send_message(message)
+
+
+def _email_retryable(e):
+    # A timed-out send may still be delivered: the smtplib thread can't be
+    # cancelled and keeps talking to the server. Anything else was refused
+    # before the server accepted the message.
+    return not isinstance(e, TimeoutError)
+
+
+async def send_email(summary, timeout=TIMEOUT, retries=RETRIES):
+    message = EmailMessage()
+    message["Subject"] = TITLE
+    message["From"] = GMAIL_USER or EMAIL_TO
+    message["To"] = EMAIL_TO
+    message.set_content(f"Hi,\n\n{summary.text()}\n\nThe full report is attached.\n\nRegards,\nAutomation Bot")
+    for name, data in summary.thumbnails:
+        message.add_attachment(data, maintype="image", subtype="jpeg", filename=name)
+    if summary.report:
+        message.add_attachment(summary.report, maintype="application", subtype="gzip",
+                               filename=summary.report_name)
+    # smtplib blocks; a worker thread lets Slack go out at the same time.
+    await _retry(lambda: asyncio.wait_for(asyncio.to_thread(_smtp_send, message, timeout), timeout),
+                 retries, _email_retryable)
+
+
+async def _slack_call(session, method, **kwargs):
+    async with session.post(urljoin(SLACK_BASE_URL, method), **kwargs) as resp:
+        resp.raise_for_status()
+        payload = await resp.json(content_type=None)
+    if not payload.get("ok"):
+        raise SlackError(method, payload.get("error"))
+    return payload
+
+
+def _slack_not_sent(e):
+    # chat.postMessage has no idempotency key, so it is only retried when
+    # Slack never got the request or turned it away unprocessed.
+    if isinstance(e, aiohttp.ClientResponseError):
+        return e.status == 429
+    if isinstance(e, SlackError):
+        return e.error == "ratelimited"
+    return isinstance(e, aiohttp.ClientConnectorError)
+
+
+async def _slack_upload(session, name, data, retries):
+    # A failed upload leaves at most an orphaned file that is never shared,
+    # so both requests are retried, each on its own.
+    ticket = await _retry(lambda: _slack_call(session, "files.getUploadURLExternal",
+                                              data={"filename": name, "length": len(data)}), retries)
+
+    async def upload():
+        async with session.post(ticket["upload_url"], data=data) as resp:
+            resp.raise_for_status()
+
+    await _retry(upload, retries)
+    return {"id": ticket["file_id"], "title": name}
+
+
+async def send_slack_message(summary, timeout=TIMEOUT, retries=RETRIES):
+    headers = {"Authorization": f"Bearer {SLACK_TOKEN}"}
+    async with aiohttp.ClientSession(headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        posted = await _retry(lambda: _slack_call(session, "chat.postMessage",
+                                                  json={"channel": SLACK_CHANNEL,
+                                                        "text": f"*{TITLE}*\n{summary.text()}"}),
+                              retries, _slack_not_sent)
+        files = list(summary.thumbnails)
+        if summary.report:
+            files.append((summary.report_name, summary.report))
+        if files:
+            uploaded = await asyncio.gather(*(_slack_upload(session, name, data, retries) for name, data in files))
+            # Attached in the message's thread, to the channel id Slack resolved.
+            await _retry(lambda: _slack_call(session, "files.completeUploadExternal",
+                                             json={"files": uploaded, "channel_id": posted["channel"],
+                                                   "thread_ts": posted["ts"]}),
+                         retries, _slack_not_sent)
+
+
+CHANNELS = {
+    "Email": (send_email, lambda: bool(EMAIL_TO and SMTP_HOST)),
+    "Slack": (send_slack_message, lambda: bool(SLACK_TOKEN and SLACK_CHANNEL)),
+}
+
+
+async def _dispatch(name, send, summary, timeout, retries):
+    try:
+        await send(summary, timeout, retries)
+    except TimeoutError:
+        print(f"❌ {name} timed out after {timeout}s; not retried, as it may still arrive.")
+        return False
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        print(f"❌ {name} failed: {error}")
+        return False
+    print(f"✅ {name} sent.")
+    return True
+
+
+def _load_state(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+async def notify(summary, state_path=STATE_PATH, force=False, timeout=TIMEOUT, retries=RETRIES):
+    # Every configured channel at once; a channel that already delivered these
+    # exact results is skipped, one that failed is tried again next time.
+    state = _load_state(state_path)
+    fingerprint = summary.fingerprint()
+    pending = {}
+    for name, (send, configured) in CHANNELS.items():
+        if not configured():
+            continue
+        if not force and state.get(name) == fingerprint:
+            print(f"⏭️ {name}: results unchanged since the last notification.")
+            continue
+        pending[name] = send
+    sent = await asyncio.gather(*(_dispatch(name, send, summary, timeout, retries) for name, send in pending.items()))
+    for name, ok in zip(pending, sent):
+        if ok:
+            state[name] = fingerprint
+    with open(state_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1)
+    return dict(zip(pending, sent))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send the test summary to the configured channels")
+    parser.add_argument("--report", default=REPORT_PATH, help="pytest-html report to attach (gzipped)")
+    parser.add_argument("--results", nargs="+", default=[RESULTS_PATH],
+                        help="JUnit XML written by pytest --junitxml, one per suite")
+    parser.add_argument("--diff-dir", default=DIFF_DIR, help="The visual suite's screenshots folder")
+    parser.add_argument("--run-id", default=os.getenv(RUN_ID_ENV),
+                        help=f"Run whose <diff-dir>/<run>/failed/*_diff.png become thumbnails (default: ${RUN_ID_ENV})")
+    parser.add_argument("--force", action="store_true", help="Notify even if the results are unchanged")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="Seconds allowed per request")
+    parser.add_argument("--retries", type=int, default=RETRIES,
+                        help="Extra attempts per failed step (never for a send that may have gone through)")
+    args = parser.parse_args(argv)
+    if not (os.path.exists(args.report) or any(os.path.exists(p) for p in args.results)):
+        print("❌ Report not found.")
+        return
+    started = time.perf_counter()
+    summary = build_summary(args.results, args.report, args.diff_dir, args.run_id)
+    asyncio.run(notify(summary, force=args.force, timeout=args.timeout, retries=args.retries))
+    print(f"📨 Notifications done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
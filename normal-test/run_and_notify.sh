@@ -1,3 +1,6 @@
 #!/bin/bash
-pytest tests/ -n 4 --html=test-report.html --self-contained-html
-python notify.py
+# One run id for both suites, so notify.py finds this run's visual diffs.
+export QA_RUN_ID="${QA_RUN_ID:-$(date +%Y-%m-%d_%H-%M-%S)}"
+pytest tests/ -n 4 --html=test-report.html --self-contained-html --junitxml=test-results.xml
+(cd ../visual-test && pytest tests/ --junitxml=test-results.xml)
+python notify.py --results test-results.xml ../visual-test/test-results.xml --run-id "$QA_RUN_ID"
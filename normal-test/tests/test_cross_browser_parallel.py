@@ -1,121 +1,176 @@
 import os
-import time
 import pytest
 from selenium import webdriver
-from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.firefox.service import Service as FirefoxService
 from selenium.webdriver.edge.service import Service as EdgeService
 from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.firefox.options import Options as FirefoxOptions
 from selenium.webdriver.edge.options import Options as EdgeOptions
-from webdriver_manager.chrome import ChromeDriverManager
-from webdriver_manager.firefox import GeckoDriverManager
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
 from datetime import datetime
+from qa_common.driver_pool import DriverPool
+from qa_common.driver_resolver import resolve_driver
+from qa_common.readiness import wait_for_page_ready
+from qa_common.dom_audit import collect_audit
+from qa_common.link_checker import LinkChecker
+from qa_common.crawler import Crawler, page_slug
+from qa_common.interactions import InteractionEngine
+from qa_common.tracing import instrument, span
 
-URL = "https://arunahf.vercel.app/"
 SCREENSHOT_DIR = "screenshots"
 
-def pytest_addoption(parser):
-    parser.addoption("--browser", action="store", default="chrome", help="Browser to use: chrome, firefox, edge")
-    parser.addoption("--mobile", action="store_true", help="Run in mobile viewport")
-    parser.addoption("--headless", action="store_true", help="Run in headless mode")
-
-@pytest.fixture
-def driver(request):
-    browser = request.config.getoption("--browser").lower()
-    mobile = request.config.getoption("--mobile")
-    headless = request.config.getoption("--headless")
-
-    width, height = (375, 812) if mobile else (1280, 1000)
-
+def create_driver(browser, headless, driver_dir=None):
     if browser == "chrome":
         options = ChromeOptions()
         if headless:
             options.add_argument("--headless=new")
-        options.add_argument(f"--window-size={width},{height}")
-        service = ChromeService(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
+        options.add_argument("--window-size=1280,1000")
+        service = ChromeService(resolve_driver("chrome", driver_dir))
+        return webdriver.Chrome(service=service, options=options)
 
     elif browser == "firefox":
         options = FirefoxOptions()
         if headless:
             options.add_argument("--headless")
-        service = FirefoxService(GeckoDriverManager().install())
-        driver = webdriver.Firefox(service=service, options=options)
-        driver.set_window_size(width, height)
+        service = FirefoxService(resolve_driver("firefox", driver_dir))
+        return webdriver.Firefox(service=service, options=options)
 
     elif browser == "edge":
         options = EdgeOptions()
         if headless:
             options.add_argument("--headless=new")
-        options.add_argument(f"--window-size={width},{height}")
-        service = EdgeService(EdgeChromiumDriverManager().install())
-        driver = webdriver.Edge(service=service, options=options)
+        options.add_argument("--window-size=1280,1000")
+        service = EdgeService(resolve_driver("edge", driver_dir))
+        return webdriver.Edge(service=service, options=options)
 
-    else:
-        raise ValueError(f"Unsupported browser: {browser}")
+    raise ValueError(f"Unsupported browser: {browser}")
 
-    yield driver
-    driver.quit()
-
-@pytest.mark.usefixtures("driver")
-def test_site(driver):
-    os.makedirs(SCREENSHOT_DIR, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    driver.get(URL)
-    time.sleep(3)  # wait for site to fully load
-
-    # Check title
-    assert "aruna" in driver.title.lower()
-    print(f"✅ Page title validated: {driver.title}")
+def check_interactions(driver, request, prefix=""):
+    # Collect buttons, .card-btn and links in one round trip
+    with span("audit.collect"):
+        buttons, links = collect_audit(driver, button_selector="button, a.card-btn, div.card-btn")
 
     # Test all buttons and .card-btn
-    buttons = driver.find_elements(By.TAG_NAME, "button") + \
-              driver.find_elements(By.CSS_SELECTOR, "a.card-btn, div.card-btn")
-
+    targets = []
     for i, btn in enumerate(buttons):
-        try:
-            label = btn.text.strip() or btn.get_attribute("aria-label") or f"Button{i+1}"
-            if btn.is_displayed() and btn.is_enabled():
-                btn.screenshot(os.path.join(SCREENSHOT_DIR, f"btn_{i+1}_{label.replace(' ', '_')}.png"))
-                btn.click()
-                print(f"✅ Clicked button: {label}")
-                time.sleep(0.5)
-            else:
-                print(f"⚠️ Skipped hidden/disabled button: {label}")
-        except Exception as e:
-            print(f"❌ Failed to click button {i+1}: {e}")
+        label = btn.label(f"Button{i+1}")
+        if btn.visible and btn.enabled:
+            try:
+                btn.element.screenshot(os.path.join(SCREENSHOT_DIR, f"{prefix}btn_{i+1}_{label.replace(' ', '_')}.png"))
+            except Exception as e:
+                print(f"⚠️ Could not screenshot button {label}: {e}")
+            targets.append(btn)
+        else:
+            print(f"⚠️ Skipped hidden/disabled button: {label}")
+
+    # Each click is replayed in its own fresh tab, several at a time; one that
+    # navigates away or opens the modal no longer breaks the clicks after it.
+    engine = InteractionEngine(driver, driver.current_url, tabs=request.config.getoption("--interaction-tabs"))
+    with span("audit.buttons", buttons=len(targets)):
+        outcomes = engine.run(targets)
+    for outcome in outcomes:
+        if outcome.ok:
+            print(f"✅ Clicked button: {outcome.label} → {outcome.describe()}")
+        else:
+            print(f"❌ Failed to click button {outcome.label}: {outcome.error}")
+        for message in outcome.console_errors:
+            print(f"⚠️ Console error after {outcome.label}: {message}")
 
     # Test all links
-    links = driver.find_elements(By.TAG_NAME, "a")
     for i, link in enumerate(links):
-        href = link.get_attribute("href")
+        href = link.href
         if href and not href.startswith("javascript"):
             print(f"✅ Valid href: Link {i+1} → {href}")
         else:
             print(f"❌ Invalid href: Link {i+1}")
+    return links
+
+def check_links(hrefs, link_checker):
+    print("\n🌐 Link reachability check:")
+    with span("audit.links", links=len(hrefs)):
+        broken = [r for r in link_checker.check(hrefs) if not r.ok]
+    for r in broken:
+        print(f"❌ Broken link: {r.url} ({r.status or r.error})")
+    assert not broken, f"{len(broken)} broken link(s)"
+
+@pytest.fixture(scope="session")
+def driver_pool(request):
+    headless = request.config.getoption("--headless")
+    driver_dir = request.config.getoption("--driver-dir")
+    pool = DriverPool(lambda browser: instrument(create_driver(browser, headless, driver_dir)))
+    yield pool
+    request.config.driver_pool_stats = getattr(request.config, "driver_pool_stats", []) + pool.close()
+
+@pytest.fixture(scope="session")
+def link_checker(request, tmp_path_factory):
+    # One checker per worker. Its cache file sits in the run's temp folder,
+    # which every xdist worker shares, so each URL is requested once per run.
+    root = tmp_path_factory.getbasetemp()
+    if hasattr(request.config, "workerinput"):
+        root = root.parent
+    return LinkChecker(cache_path=str(root / "link_cache.json"))
 
-    # Try modal
+@pytest.fixture
+def driver(request, driver_pool):
+    browser = request.config.getoption("--browser").lower()
+    mobile = request.config.getoption("--mobile")
+
+    width, height = (375, 812) if mobile else (1280, 1000)
+
+    session = driver_pool.acquire(browser, (width, height))
+    yield session.driver
+    driver_pool.release(session)
+
+@pytest.mark.usefixtures("driver")
+def test_site(driver, request, site_url, link_checker):
+    os.makedirs(SCREENSHOT_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    with span("navigate", url=site_url):
+        driver.get(site_url)
+    with span("page_ready"):
+        wait_for_page_ready(driver)
+
+    # Check title
+    assert "aruna" in driver.title.lower()
+    print(f"✅ Page title validated: {driver.title}")
+
+    links = check_interactions(driver, request)
+
+    if request.config.getoption("--check-links"):
+        check_links([link.href for link in links], link_checker)
+
+def test_crawl_site(request, site_url, link_checker):
+    # Same button, link and modal checks on every same-origin page reachable
+    # from the start page, which test_site already covers and only seeds links.
+    if not request.config.getoption("--crawl"):
+        pytest.skip("multi-page crawl runs with --crawl")
+    os.makedirs(SCREENSHOT_DIR, exist_ok=True)
+    browser = request.config.getoption("--browser").lower()
+    headless = request.config.getoption("--headless")
+    driver_dir = request.config.getoption("--driver-dir")
+    window_size = (375, 812) if request.config.getoption("--mobile") else (1280, 1000)
+    hrefs = []
+
+    def visit(driver, url, depth):
+        if depth == 0:
+            return [link.href for link in collect_audit(driver)[1]]
+        print(f"\n🕸️ Crawling {url}")
+        links = [link.href for link in check_interactions(driver, request, prefix=f"{page_slug(url)}_")]
+        hrefs.extend(links)
+        return links
+
+    workers = request.config.getoption("--crawl-workers")
+    pool = DriverPool(lambda name: instrument(create_driver(name, headless, driver_dir)), size=workers)
     try:
-        modal_candidates = driver.find_elements(By.CLASS_NAME, "modal-overlay")
-        modal = next((m for m in modal_candidates if m.is_displayed()), None)
-
-        if modal:
-            print("✅ Modal appeared")
-
-            modal_buttons = modal.find_elements(By.TAG_NAME, "button")
-            for j, mbtn in enumerate(modal_buttons):
-                if mbtn.is_displayed() and mbtn.is_enabled():
-                    try:
-                        label = mbtn.text.strip() or mbtn.get_attribute("aria-label") or f"ModalButton{j+1}"
-                        mbtn.click()
-                        print(f"✅ Clicked modal button: {label}")
-                        time.sleep(0.5)
-                    except Exception as e:
-                        print(f"❌ Failed to click modal button {j+1}: {e}")
-        else:
-            print("⚠️ Modal not visible")
-    except Exception as e:
-        print(f"⚠️ Modal interaction failed: {e}")
+        pages = Crawler(pool, browser, visit, window_size,
+                        max_depth=request.config.getoption("--crawl-depth"),
+                        max_pages=request.config.getoption("--crawl-max-pages"),
+                        workers=workers).crawl(site_url)
+        print(f"\n🕸️ Crawled {len(pages)} page(s)")
+        errors = [f"{page.url} — {page.error}" for page in pages if page.error]
+        assert not errors, "Pages failed to load:\n" + "\n".join(errors)
+
+        if request.config.getoption("--check-links"):
+            check_links(hrefs, link_checker)
+    finally:
+        request.config.driver_pool_stats = getattr(request.config, "driver_pool_stats", []) + pool.close()
@@ -0,0 +1 @@
+# Modules shared by the visual suite (visual-test/) and the functional suite (normal-test/).
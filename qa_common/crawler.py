@@ -0,0 +1,123 @@
+import hashlib
+import re
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from qa_common.readiness import wait_for_page_ready
+from qa_common.tracing import span
+
+MAX_DEPTH = 2
+MAX_PAGES = 25
+WORKERS = 3
+SKIP_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg", ".ico",
+                   ".zip", ".mp4", ".mp3", ".css", ".js", ".json", ".xml", ".txt")
+TRACKING_PARAMS = re.compile(r"^(utm_.*|fbclid|gclid|mc_cid|mc_eid)$")
+
+
+def normalize_url(href, base=None):
+    # Canonical form used for dedupe: absolute, no fragment, lower-case
+    # scheme and host, default ports and tracking parameters dropped, query
+    # sorted and no trailing slash except on the root.
+    if not href:
+        return None
+    parts = urlsplit(urljoin(base, href) if base else href)
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https"):
+        return None
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if not TRACKING_PARAMS.match(k)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def same_origin(url, other):
+    a, b = urlsplit(url), urlsplit(other)
+    return (a.scheme, a.netloc) == (b.scheme, b.netloc)
+
+
+def page_slug(url):
+    # Filesystem-safe name for a page, used to namespace its baselines. The
+    # readable part folds punctuation together (/a-b and /a_b both give a_b),
+    # so a short hash of the normalized path and query keeps pages apart. The
+    # host is left out: the live site and its replay mirror share baselines.
+    parts = urlsplit(normalize_url(url) or url)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", parts.path).strip("_") or "home"
+    key = parts.path + ("?" + parts.query if parts.query else "")
+    return f"{slug}_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]}"
+
+
+@dataclass
+class PageResult:
+    url: str
+    depth: int
+    links: list = field(default_factory=list)
+    error: str = None
+
+    @property
+    def slug(self):
+        return page_slug(self.url)
+
+
+class Crawler:
+    # Breadth-first crawl of same-origin pages over a bounded DriverPool.
+    # Each page is loaded in a pooled session and handed to `visit(driver,
+    # url, depth)`, which runs the page's checks and returns the hrefs it
+    # found; new same-origin links are queued until max_depth or max_pages.
+
+    def __init__(self, pool, browser, visit, window_size=None, max_depth=MAX_DEPTH,
+                 max_pages=MAX_PAGES, workers=WORKERS):
+        self.pool = pool
+        self.browser = browser
+        self.visit = visit
+        self.window_size = window_size
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.workers = workers
+
+    def crawl(self, start_url):
+        start = normalize_url(start_url)
+        seen = {start}
+        queue = deque([(start, 0)])
+        results = []
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="crawler") as executor:
+            running = set()
+            while queue or running:
+                while queue and len(running) < self.workers:
+                    running.add(executor.submit(self._visit, *queue.popleft()))
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    page = future.result()
+                    results.append(page)
+                    if page.depth >= self.max_depth:
+                        continue
+                    for href in page.links:
+                        url = normalize_url(href, page.url)
+                        if (url and url not in seen and same_origin(url, start)
+                                and not urlsplit(url).path.lower().endswith(SKIP_EXTENSIONS)
+                                and len(seen) < self.max_pages):
+                            seen.add(url)
+                            queue.append((url, page.depth + 1))
+        return results
+
+    def _visit(self, url, depth):
+        page = PageResult(url, depth)
+        session = self.pool.acquire(self.browser, self.window_size)
+        try:
+            with span("crawl.page", url=url, depth=depth):
+                with span("navigate", url=url):
+                    session.driver.get(url)
+                with span("page_ready"):
+                    wait_for_page_ready(session.driver)
+                page.links = list(self.visit(session.driver, url, depth) or [])
+        except Exception as e:
+            page.error = f"{type(e).__name__}: {e}"
+        finally:
+            self.pool.release(session)
+        return page
@@ -0,0 +1,76 @@
+from dataclasses import dataclass
+
+BUTTON_SELECTOR = "button, .card-btn"
+LINK_SELECTOR = "a"
+
+# Collects every property the audits need for all selector groups in a single
+# round trip instead of one WebDriver call per element per property.
+COLLECT_JS = """
+const groups = arguments[0];
+const unique = sel => { try { return document.querySelectorAll(sel).length === 1; } catch (e) { return false; } };
+// Stable CSS selector: a unique id or test attribute, else an nth-of-type path
+// up to the nearest ancestor that has one.
+const selectorFor = el => {
+    const parts = [];
+    for (let node = el; node && node.nodeType === 1; node = node.parentElement) {
+        const tag = node.tagName.toLowerCase();
+        if (node.id && unique(`#${CSS.escape(node.id)}`)) { parts.unshift(`#${CSS.escape(node.id)}`); break; }
+        const attr = ["data-testid", "data-test", "name", "aria-label"].find(a => node.hasAttribute(a));
+        const byAttr = attr && `${tag}[${attr}="${CSS.escape(node.getAttribute(attr))}"]`;
+        if (byAttr && unique(byAttr)) { parts.unshift(byAttr); break; }
+        if (tag === "html") { parts.unshift(tag); break; }
+        const index = Array.from(node.parentElement.children).filter(c => c.tagName === node.tagName).indexOf(node) + 1;
+        parts.unshift(`${tag}:nth-of-type(${index})`);
+    }
+    return parts.join(" > ");
+};
+const result = {};
+for (const [key, selector] of Object.entries(groups)) {
+    result[key] = Array.from(document.querySelectorAll(selector), el => {
+        const style = window.getComputedStyle(el);
+        const rect = el.getBoundingClientRect();
+        return {
+            element: el,
+            tag: el.tagName.toLowerCase(),
+            text: (el.innerText || "").trim(),
+            aria_label: el.getAttribute("aria-label"),
+            visible: el.getClientRects().length > 0 && style.visibility !== "hidden"
+                && style.display !== "none" && parseFloat(style.opacity) > 0,
+            enabled: !el.disabled,
+            href: el.hasAttribute("href") ? (typeof el.href === "string" ? el.href : el.getAttribute("href")) : null,
+            rect: [rect.x, rect.y, rect.width, rect.height],
+            selector: selectorFor(el)
+        };
+    });
+}
+return result;
+"""
+
+
+@dataclass(frozen=True)
+class ElementInfo:
+    element: object
+    tag: str
+    text: str
+    aria_label: str
+    visible: bool
+    enabled: bool
+    href: str
+    rect: tuple
+    selector: str = None
+
+    def label(self, fallback):
+        return self.text or self.aria_label or fallback
+
+
+def collect_elements(driver, groups):
+    raw = driver.execute_script(COLLECT_JS, groups)
+    return {
+        key: [ElementInfo(**dict(item, rect=tuple(item["rect"]))) for item in raw.get(key, [])]
+        for key in groups
+    }
+
+
+def collect_audit(driver, button_selector=BUTTON_SELECTOR, link_selector=LINK_SELECTOR):
+    found = collect_elements(driver, {"buttons": button_selector, "links": link_selector})
+    return found["buttons"], found["links"]
@@ -0,0 +1,198 @@
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from qa_common.tracing import span
+
+
+def default_pool_size():
+    # Tests inside one xdist worker run one after another, so a single warm
+    # session per browser per worker keeps the whole run at "worker count"
+    # browsers without ever blocking.
+    return 1
+
+
+class PooledSession:
+    def __init__(self, browser, driver, launch_seconds):
+        self.browser = browser
+        self.driver = driver
+        self.launch_seconds = launch_seconds
+        self.uses = 0
+        # Origins the session has navigated to since it was last reset.
+        self.origins = set()
+
+    @property
+    def reuses(self):
+        return max(0, self.uses - 1)
+
+    def stats(self):
+        return {
+            "browser": self.browser,
+            "launch_seconds": round(self.launch_seconds, 3),
+            "uses": self.uses,
+            "reuses": self.reuses,
+            "saved_seconds": round(self.reuses * self.launch_seconds, 3),
+        }
+
+
+class DriverPool:
+    def __init__(self, factory, size=None):
+        self.factory = factory
+        self.size = size or default_pool_size()
+        self.idle = defaultdict(list)
+        self.sessions = []
+        self.retired = []
+        self.cond = threading.Condition()
+
+    def _live(self, browser):
+        return sum(1 for s in self.sessions if s.browser == browser)
+
+    def acquire(self, browser, window_size=None):
+        with self.cond:
+            while not self.idle[browser] and self._live(browser) >= self.size:
+                self.cond.wait()
+            session = self.idle[browser].pop() if self.idle[browser] else None
+            if session is None:
+                # Reserve the slot before launching so concurrent callers respect the bound.
+                session = PooledSession(browser, None, 0.0)
+                self.sessions.append(session)
+        if session.driver is None:
+            started = time.perf_counter()
+            try:
+                with span("driver.launch", browser=browser):
+                    session.driver = self.factory(browser)
+            except BaseException:
+                self._discard(session)
+                raise
+            session.launch_seconds = time.perf_counter() - started
+            track_origins(session)
+        session.uses += 1
+        if window_size:
+            session.driver.set_window_size(*window_size)
+        return session
+
+    def release(self, session):
+        try:
+            clean = reset_session(session.driver, session.origins)
+        except Exception as e:
+            print(f"⚠️ Session reset failed, relaunching next time: {e}")
+            self._discard(session)
+            return
+        if not clean:
+            self._discard(session)
+            return
+        session.origins.clear()
+        with self.cond:
+            self.idle[session.browser].append(session)
+            self.cond.notify_all()
+
+    def _discard(self, session):
+        if session.driver is not None:
+            try:
+                session.driver.quit()
+            except Exception:
+                pass
+        with self.cond:
+            if session in self.sessions:
+                self.sessions.remove(session)
+            # Keep its counters so the summary still reflects the work it did.
+            if session.uses:
+                self.retired.append(session.stats())
+            self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            sessions, self.sessions = self.sessions, []
+            self.idle.clear()
+        for session in sessions:
+            if session.driver is not None:
+                try:
+                    session.driver.quit()
+                except Exception:
+                    pass
+        return [s.stats() for s in sessions] + self.retired
+
+
+def origin_of(url):
+    parts = urlsplit(url or "")
+    if parts.scheme in ("http", "https") and parts.netloc:
+        return f"{parts.scheme}://{parts.netloc.lower()}"
+    return None
+
+
+def track_origins(session):
+    # Navigations go through the driver's execute(), as WebDriver get() or as
+    # a DevTools Page.navigate; shadow it on the instance to note each origin.
+    driver = session.driver
+    execute = driver.execute
+
+    def tracking_execute(driver_command, params=None):
+        url = None
+        if driver_command == "get" and params:
+            url = params.get("url")
+        elif driver_command == "executeCdpCommand" and params and params.get("cmd") == "Page.navigate":
+            url = params.get("params", {}).get("url")
+        origin = origin_of(url)
+        if origin:
+            session.origins.add(origin)
+        return execute(driver_command, params)
+
+    driver.execute = tracking_execute
+
+
+def reset_session(driver, origins=()):
+    # Clears cookies and storage so the next test starts clean without a
+    # browser relaunch. Returns False when that can't be done in place and
+    # the session should be relaunched instead.
+    origins = set(origins)
+    handles = driver.window_handles
+    for handle in handles:
+        driver.switch_to.window(handle)
+        origins.add(origin_of(driver.current_url))
+    origins.discard(None)
+    if hasattr(driver, "execute_cdp_cmd"):
+        # A fresh tab drops the sessionStorage of every origin the old ones
+        # visited; DevTools then clears the rest of each origin's storage.
+        driver.switch_to.new_window("tab")
+        fresh = driver.current_window_handle
+        for handle in handles:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(fresh)
+        for origin in sorted(origins):
+            driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        return True
+    # Without DevTools storage can only be cleared from a page of its own
+    # origin, which the test may have left behind.
+    if len(origins) > 1:
+        return False
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+    driver.execute_script(
+        "try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}"
+    )
+    driver.delete_all_cookies()
+    driver.get("about:blank")
+    return True
+
+
+def summary_lines(stats):
+    if not stats:
+        return []
+    totals = defaultdict(lambda: {"sessions": 0, "uses": 0, "reuses": 0, "launch": 0.0, "saved": 0.0})
+    for s in stats:
+        t = totals[s["browser"]]
+        t["sessions"] += 1
+        t["uses"] += s["uses"]
+        t["reuses"] += s["reuses"]
+        t["launch"] += s["launch_seconds"]
+        t["saved"] += s["saved_seconds"]
+    lines = [f"{'browser':<10}{'sessions':>10}{'tests':>8}{'reuses':>8}{'launch s':>10}{'saved s':>10}"]
+    for browser, t in sorted(totals.items()):
+        lines.append(f"{browser:<10}{t['sessions']:>10}{t['uses']:>8}{t['reuses']:>8}"
+                     f"{t['launch']:>10.1f}{t['saved']:>10.1f}")
+    return lines
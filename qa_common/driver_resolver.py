@@ -0,0 +1,78 @@
+import json
+import os
+import sys
+import time
+
+from filelock import FileLock
+from webdriver_manager.chrome import ChromeDriverManager
+from webdriver_manager.firefox import GeckoDriverManager
+from webdriver_manager.microsoft import EdgeChromiumDriverManager
+
+CACHE_FILE = ".driver_cache.json"
+CACHE_TTL = 24 * 60 * 60
+DRIVER_MANAGERS = {
+    "chrome": ChromeDriverManager,
+    "firefox": GeckoDriverManager,
+    "edge": EdgeChromiumDriverManager,
+}
+DRIVER_BINARIES = {
+    "chrome": "chromedriver",
+    "firefox": "geckodriver",
+    "edge": "msedgedriver",
+}
+
+_resolved = {}
+
+
+def binary_name(browser):
+    name = DRIVER_BINARIES[browser]
+    return f"{name}.exe" if sys.platform.startswith("win") else name
+
+
+def _read_cache(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(path, cache):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=1)
+    os.replace(tmp, path)
+
+
+def resolve_driver(browser, driver_dir=None, cache_file=CACHE_FILE):
+    if browser not in DRIVER_BINARIES:
+        raise ValueError(f"Unsupported browser: {browser}")
+    if browser in _resolved:
+        return _resolved[browser]
+
+    # Pinned local drivers: no version lookup and no network at all.
+    driver_dir = driver_dir or os.environ.get("WEBDRIVER_DIR")
+    if driver_dir:
+        path = os.path.join(driver_dir, binary_name(browser))
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"{binary_name(browser)} not found in {driver_dir}")
+        _resolved[browser] = path
+        return path
+
+    # The first xdist worker to take the lock runs webdriver-manager; the rest
+    # wait for it and read the path it cached.
+    with FileLock(f"{cache_file}.lock"):
+        cache = _read_cache(cache_file)
+        entry = cache.get(browser)
+        if entry and os.path.isfile(entry["path"]) and time.time() - entry["resolved_at"] < CACHE_TTL:
+            path = entry["path"]
+        else:
+            path = DRIVER_MANAGERS[browser]().install()
+            cache[browser] = {"path": path, "resolved_at": time.time()}
+            _write_cache(cache_file, cache)
+            print(f"🔧 Resolved {browser} driver: {path}")
+
+    _resolved[browser] = path
+    return path
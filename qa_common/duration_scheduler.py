@@ -0,0 +1,213 @@
+import json
+import os
+import statistics
+import tempfile
+from collections import defaultdict
+
+from xdist.scheduler import LoadScheduling
+
+HISTORY_FILE = ".test_durations.json"
+BROWSERS = ("chrome", "firefox", "edge")
+DEFAULT_DURATION = 30.0
+DEFAULT_LAUNCH = 5.0
+# Weight of the latest run when folding a duration into the history.
+SMOOTHING = 0.5
+# Tests queued on a worker at once: the one running plus the next, so there
+# is no round trip between tests but nearly everything stays stealable.
+PREFETCH = 2
+
+
+def browser_of(nodeid):
+    # Browser from the test's parametrize ids, e.g. "...[Desktop-chrome]".
+    if nodeid.endswith("]"):
+        for part in nodeid[nodeid.rindex("[") + 1:-1].split("-"):
+            if part in BROWSERS:
+                return part
+    return ""
+
+
+class DurationHistory:
+    # Per-test durations and per-browser launch times from previous runs,
+    # kept as a moving average in a small JSON file.
+
+    def __init__(self, path=HISTORY_FILE):
+        self.path = path
+        self.tests = {}
+        self.launch = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                self.tests = data.get("tests", {})
+                self.launch = data.get("launch", {})
+            except (OSError, ValueError):
+                pass
+
+    def estimate(self, nodeid):
+        if nodeid in self.tests:
+            return self.tests[nodeid]
+        # Unseen tests are assumed typical, so they neither hog nor trail the plan.
+        return statistics.median(self.tests.values()) if self.tests else DEFAULT_DURATION
+
+    def launch_cost(self, browser):
+        return self.launch.get(browser, DEFAULT_LAUNCH)
+
+    @staticmethod
+    def _fold(table, key, value):
+        old = table.get(key)
+        table[key] = round(value if old is None else SMOOTHING * value + (1 - SMOOTHING) * old, 3)
+
+    def record(self, durations, launches):
+        for nodeid, seconds in durations.items():
+            self._fold(self.tests, nodeid, seconds)
+        for browser, seconds in launches.items():
+            self._fold(self.launch, browser, seconds)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"tests": self.tests, "launch": self.launch}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+class DurationRecorder:
+    # Plugin that sums setup, call and teardown time per test and, on the
+    # controller (or a run without xdist), folds them into the history.
+
+    def __init__(self, path=HISTORY_FILE):
+        self.path = path
+        self.durations = defaultdict(float)
+
+    def pytest_runtest_logreport(self, report):
+        self.durations[report.nodeid] += report.duration
+
+    def pytest_sessionfinish(self, session):
+        config = session.config
+        if hasattr(config, "workerinput") or not self.durations:
+            return
+        launches = defaultdict(list)
+        for stats in getattr(config, "driver_pool_stats", []):
+            if stats["uses"]:
+                launches[stats["browser"]].append(stats["launch_seconds"])
+        DurationHistory(self.path).record(
+            self.durations, {browser: statistics.mean(s) for browser, s in launches.items()})
+
+
+class DurationScheduling(LoadScheduling):
+    # Longest-processing-time-first scheduling with browser affinity. Every
+    # test is planned onto the worker where it would finish earliest,
+    # counting a browser launch for workers that have no session of that
+    # browser yet, so same-browser tests stay together and reuse the warm
+    # session. Workers pull from their own queue and, once it is empty, steal
+    # the shortest queued test from the worker with the most work left, so
+    # nobody sits idle at the end of the run.
+
+    def __init__(self, config, log=None, history=None):
+        super().__init__(config, log)
+        self.history = history or DurationHistory()
+        self.queues = {}
+        self.browsers = defaultdict(set)
+
+    @property
+    def tests_finished(self):
+        return super().tests_finished and not any(self.queues.values())
+
+    @property
+    def has_pending(self):
+        return super().has_pending or any(self.queues.values())
+
+    def add_node(self, node):
+        super().add_node(node)
+        self.queues[node] = []
+
+    def _estimate(self, index):
+        return self.history.estimate(self.collection[index])
+
+    def _queued_load(self, node):
+        return sum(self._estimate(i) for i in self.queues[node])
+
+    def _plan(self, indices):
+        nodes = [n for n in self.nodes if not n.shutting_down]
+        if not nodes:
+            self.pending.extend(indices)
+            return
+        load = {n: self._queued_load(n) for n in nodes}
+        planned = {n: set(self.browsers[n]) for n in nodes}
+        for index in sorted(indices, key=self._estimate, reverse=True):
+            browser = browser_of(self.collection[index])
+            cost = self._estimate(index)
+
+            def finish(n):
+                launch = 0 if not browser or browser in planned[n] else self.history.launch_cost(browser)
+                return load[n] + cost + launch
+
+            node = min(nodes, key=finish)
+            load[node] = finish(node)
+            planned[node].add(browser)
+            self.queues[node].append(index)
+
+    def schedule(self):
+        assert self.collection_is_completed
+        if self.collection is not None:
+            for node in self.nodes:
+                self.check_schedule(node)
+            return
+        if not self._check_nodes_have_same_collection():
+            self.log("**Different tests collected, aborting run**")
+            return
+        self.collection = next(iter(self.node2collection.values()))
+        if not self.collection:
+            return
+        self._plan(range(len(self.collection)))
+        for node in self.nodes:
+            self.check_schedule(node)
+
+    def _steal(self, node):
+        victims = [n for n in self.queues if n is not node and self.queues[n]]
+        if not victims:
+            return None
+        victim = max(victims, key=self._queued_load)
+        queue = self.queues[victim]
+        # Queues are longest first; take the shortest, preferring a browser
+        # this worker already has open.
+        for pos in range(len(queue) - 1, -1, -1):
+            if browser_of(self.collection[queue[pos]]) in self.browsers[node]:
+                return queue.pop(pos)
+        return queue.pop()
+
+    def _next(self, node):
+        if self.pending:
+            return self.pending.pop(0)
+        if self.queues[node]:
+            return self.queues[node].pop(0)
+        # Only an idle worker steals: prefetching from another queue could take
+        # a test before the worker it was planned for has even started.
+        return None if self.node2pending[node] else self._steal(node)
+
+    def check_schedule(self, node, duration=0):
+        if node.shutting_down:
+            return
+        while len(self.node2pending[node]) < PREFETCH:
+            index = self._next(node)
+            if index is None:
+                break
+            self.browsers[node].add(browser_of(self.collection[index]))
+            self.node2pending[node].append(index)
+            node.send_runtest_some([index])
+        if not self.pending and not any(self.queues.values()):
+            node.shutdown()
+
+    def mark_test_pending(self, item):
+        self.pending.insert(0, self.collection.index(item))
+        for node in self.nodes:
+            self.check_schedule(node)
+
+    def remove_node(self, node):
+        pending = self.node2pending.pop(node)
+        queued = self.queues.pop(node, [])
+        self.browsers.pop(node, None)
+        crashitem = self.collection[pending.pop(0)] if pending else None
+        if pending or queued:
+            self._plan(pending + queued)
+            for other in self.nodes:
+                self.check_schedule(other)
+        return crashitem
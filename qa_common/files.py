@@ -0,0 +1,16 @@
+import os
+import tempfile
+
+
+def atomic_write(path, data):
+    # Readers (other xdist workers, a later run) see the old file or the new
+    # one, never a partial write.
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
@@ -0,0 +1,185 @@
+import os
+import re
+from dataclasses import dataclass, field
+
+from selenium.webdriver.common.by import By
+
+from qa_common.readiness import wait_for_page_ready, wait_for_settle
+
+TABS = 4
+MODAL_SELECTOR = ".modal-overlay"
+
+# Records uncaught errors, rejected promises and console.error calls from the
+# moment it runs, and marks the document so a full navigation can be told
+# apart from an in-page change.
+INSTRUMENT_JS = """
+const w = window;
+w.__qaClick = {errors: [], href: location.href};
+const push = msg => w.__qaClick.errors.push(String(msg).slice(0, 300));
+w.addEventListener("error", e => push(e.message || e.type));
+w.addEventListener("unhandledrejection", e => push("Unhandled rejection: " + (e.reason && e.reason.message || e.reason)));
+const origError = console.error;
+console.error = function () { push(Array.from(arguments).join(" ")); return origError.apply(this, arguments); };
+"""
+
+OUTCOME_JS = """
+const state = window.__qaClick;
+const modal = Array.from(document.querySelectorAll(arguments[0])).find(m => m.getClientRects().length > 0);
+return {
+    href: location.href,
+    navigated: !state || state.href !== location.href,
+    errors: state ? state.errors : [],
+    modal_buttons: modal ? modal.querySelectorAll("button").length : null
+};
+"""
+
+
+def open_tab(driver, url):
+    # Default tab factory: a new tab of the current browser context.
+    driver.switch_to.new_window("tab")
+    # Assigning location returns at once, so the batch's pages load concurrently.
+    driver.execute_script("window.location.href = arguments[0]", url)
+    return driver.current_window_handle
+
+
+def _error(e):
+    message = str(e).splitlines()[0] if str(e) else ""
+    return f"{type(e).__name__}: {message}" if message else type(e).__name__
+
+
+@dataclass
+class ClickOutcome:
+    label: str
+    selector: str
+    navigated_to: str = None
+    modal_buttons: int = None
+    modal_clicks: int = 0
+    new_windows: int = 0
+    console_errors: list = field(default_factory=list)
+    screenshot: str = None
+    error: str = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def describe(self):
+        effects = []
+        if self.navigated_to:
+            effects.append(f"navigated to {self.navigated_to}")
+        if self.modal_buttons is not None:
+            effects.append(f"opened modal ({self.modal_clicks}/{self.modal_buttons} modal buttons clicked)")
+        if self.new_windows:
+            effects.append(f"opened {self.new_windows} window(s)")
+        return ", ".join(effects) or "no navigation or modal"
+
+
+class InteractionEngine:
+    # Replays every click in a fresh tab of the same session instead of one
+    # after another on a single page, so a click that navigates away or opens
+    # a modal can't break the ones after it. Tabs are opened in batches: the
+    # page loads start together (later ones from the HTTP cache), each tab
+    # gets its click, and the settle waits and outcome checks run after all
+    # clicks in the batch have been issued, so they overlap. `new_tab(driver,
+    # url)` opens a tab, starts loading url and returns its handle; emulated
+    # devices pass one that opens it in their own browser context.
+
+    def __init__(self, driver, url, tabs=TABS, modal_selector=MODAL_SELECTOR, screenshot_dir=None, new_tab=open_tab):
+        self.driver = driver
+        self.url = url
+        self.tabs = max(1, tabs)
+        self.modal_selector = modal_selector
+        self.screenshot_dir = screenshot_dir
+        self.new_tab = new_tab
+
+    def run(self, targets):
+        home = self.driver.current_window_handle
+        outcomes = []
+        try:
+            for start in range(0, len(targets), self.tabs):
+                outcomes += self._batch(list(enumerate(targets))[start:start + self.tabs])
+        finally:
+            self.driver.switch_to.window(home)
+        return outcomes
+
+    def _batch(self, batch):
+        driver = self.driver
+        opened = [self.new_tab(driver, self.url) for _ in batch]
+
+        outcomes = []
+        known = set(driver.window_handles)
+        # Popup handle -> the outcome whose click or modal was being handled when it appeared.
+        appeared = {}
+        for handle, (i, target) in zip(opened, batch):
+            outcome = ClickOutcome(target.label(f"Button{i+1}"), target.selector)
+            outcomes.append(outcome)
+            driver.switch_to.window(handle)
+            try:
+                wait_for_page_ready(driver)
+                driver.execute_script(INSTRUMENT_JS)
+                driver.find_element(By.CSS_SELECTOR, target.selector).click()
+            except Exception as e:
+                outcome.error = _error(e)
+            known = self._note_popups(known, outcome, appeared)
+
+        for handle, (i, target), outcome in zip(opened, batch, outcomes):
+            driver.switch_to.window(handle)
+            try:
+                if outcome.ok:
+                    self._observe(outcome, i)
+            except Exception as e:
+                outcome.error = _error(e)
+            known = self._note_popups(known, outcome, appeared)
+
+        # DevTools records which tab opened each window; without it a popup is
+        # charged to the click being handled when it appeared.
+        openers = self._openers() if appeared else {}
+        by_tab = dict(zip(opened, outcomes))
+        for popup, outcome in appeared.items():
+            by_tab.get(openers.get(popup), outcome).new_windows += 1
+        still_open = set(driver.window_handles)
+        for handle in [h for h in appeared if h in still_open] + opened:
+            driver.switch_to.window(handle)
+            driver.close()
+        return outcomes
+
+    def _note_popups(self, known, outcome, appeared):
+        handles = set(self.driver.window_handles)
+        for handle in handles - known:
+            appeared.setdefault(handle, outcome)
+        return known | handles
+
+    def _openers(self):
+        # ChromeDriver window handles are DevTools target ids.
+        if not hasattr(self.driver, "execute_cdp_cmd"):
+            return {}
+        try:
+            targets = self.driver.execute_cdp_cmd("Target.getTargets", {})["targetInfos"]
+        except Exception:
+            return {}
+        return {t["targetId"]: t.get("openerId") for t in targets}
+
+    def _observe(self, outcome, index):
+        driver = self.driver
+        wait_for_settle(driver)
+        state = driver.execute_script(OUTCOME_JS, self.modal_selector)
+        outcome.console_errors = state["errors"]
+        if state["navigated"]:
+            outcome.navigated_to = state["href"]
+        outcome.modal_buttons = state["modal_buttons"]
+        if self.screenshot_dir:
+            name = re.sub(r"[^A-Za-z0-9]+", "_", outcome.label).strip("_")
+            outcome.screenshot = os.path.join(self.screenshot_dir, f"click_{index+1}_{name}.png")
+            driver.save_screenshot(outcome.screenshot)
+        if outcome.modal_buttons:
+            # The modal's own buttons are clicked in this tab, so their effects
+            # stay isolated from every other click.
+            modal = next(m for m in driver.find_elements(By.CSS_SELECTOR, self.modal_selector) if m.is_displayed())
+            for button in modal.find_elements(By.TAG_NAME, "button"):
+                try:
+                    if button.is_displayed() and button.is_enabled():
+                        button.click()
+                        outcome.modal_clicks += 1
+                        wait_for_settle(driver)
+                except Exception:
+                    pass
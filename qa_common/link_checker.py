@@ -0,0 +1,117 @@
+import asyncio
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from urllib.parse import urldefrag, urlsplit
+
+import aiohttp
+from filelock import FileLock
+
+CONCURRENCY = 20
+PER_HOST = 4
+TIMEOUT = 10
+RETRIES = 2
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Servers that refuse or mishandle HEAD get a second chance with GET.
+GET_FALLBACK_STATUSES = {403, 404, 405, 501}
+HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; arunahf-qa link checker)"}
+
+
+@dataclass
+class LinkResult:
+    url: str
+    status: int = None
+    method: str = None
+    error: str = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None and self.status is not None and self.status < 400
+
+
+def normalize_links(hrefs):
+    # Drop fragments and non-http(s) schemes, keep first-seen order.
+    seen = {}
+    for href in hrefs:
+        if not href:
+            continue
+        url = urldefrag(href)[0]
+        if urlsplit(url).scheme in ("http", "https"):
+            seen.setdefault(url, None)
+    return list(seen)
+
+
+class LinkChecker:
+    def __init__(self, concurrency=CONCURRENCY, per_host=PER_HOST, timeout=TIMEOUT,
+                 retries=RETRIES, cache_path=None):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.cache_path = cache_path
+        self.cache = {}
+
+    def _load_shared(self):
+        if self.cache_path and os.path.exists(self.cache_path):
+            with open(self.cache_path, encoding="utf-8") as f:
+                for url, data in json.load(f).items():
+                    self.cache.setdefault(url, LinkResult(**data))
+
+    def _save_shared(self, results):
+        if not self.cache_path:
+            return
+        with FileLock(f"{self.cache_path}.lock"):
+            shared = {}
+            if os.path.exists(self.cache_path):
+                with open(self.cache_path, encoding="utf-8") as f:
+                    shared = json.load(f)
+            shared.update({r.url: asdict(r) for r in results})
+            tmp = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(shared, f, indent=1)
+            os.replace(tmp, self.cache_path)
+
+    def check(self, hrefs):
+        # Links already checked by this process, or by another xdist worker in
+        # this run, are answered from the cache without a request.
+        urls = normalize_links(hrefs)
+        self._load_shared()
+        pending = [u for u in urls if u not in self.cache]
+        if pending:
+            fresh = asyncio.run(self._check_all(pending))
+            self.cache.update((r.url, r) for r in fresh)
+            self._save_shared(fresh)
+        return [self.cache[u] for u in urls]
+
+    async def _check_all(self, urls):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=HEADERS) as session:
+            return await asyncio.gather(*(self._check_one(session, url) for url in urls))
+
+    async def _request(self, session, method, url):
+        async with session.request(method, url, allow_redirects=True) as resp:
+            return resp.status
+
+    async def _check_one(self, session, url):
+        started = time.perf_counter()
+        result = LinkResult(url)
+        for attempt in range(self.retries + 1):
+            try:
+                result.method = "HEAD"
+                result.status = await self._request(session, "HEAD", url)
+                if result.status in GET_FALLBACK_STATUSES:
+                    result.method = "GET"
+                    result.status = await self._request(session, "GET", url)
+                result.error = None
+                if result.status not in RETRY_STATUSES:
+                    break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                result.status = None
+                result.error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            if attempt < self.retries:
+                await asyncio.sleep(0.5 * 2 ** attempt)
+        result.elapsed = time.perf_counter() - started
+        return result
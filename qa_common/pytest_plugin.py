@@ -0,0 +1,97 @@
+import pytest
+
+from qa_common.crawler import MAX_DEPTH, MAX_PAGES, WORKERS
+from qa_common.driver_pool import summary_lines
+from qa_common.duration_scheduler import HISTORY_FILE, DurationHistory, DurationRecorder, DurationScheduling
+from qa_common.interactions import TABS
+from qa_common.replay_server import ARCHIVE_DIR, MirrorServer
+from qa_common.tracing import merge_totals, session_totals, trace_summary_lines
+
+# Options and hooks shared by both suites. Each conftest loads this module
+# with `pytest_plugins = ["qa_common.pytest_plugin"]` and only adds what is
+# specific to its suite.
+
+URL = "https://arunahf.vercel.app/"
+
+
+def pytest_addoption(parser):
+    parser.addoption("--headless", action="store_true", default=False, help="Run browsers in headless mode")
+    parser.addoption("--driver-dir", action="store", default=None,
+                     help="Directory with pinned chromedriver/geckodriver/msedgedriver binaries (offline mode)")
+    parser.addoption("--duration-history", action="store", default=HISTORY_FILE,
+                     help="File of per-test durations used to balance xdist workers")
+    parser.addoption("--interaction-tabs", type=int, default=TABS,
+                     help="Tabs opened at once to replay each button click on a fresh page load")
+    parser.addoption("--check-links", action="store_true", default=False,
+                     help="Request every collected link (HEAD, falling back to GET) and fail on broken ones")
+    parser.addoption("--crawl", action="store_true", default=False,
+                     help="Also crawl same-origin pages linked from the start page and check each one")
+    parser.addoption("--crawl-depth", type=int, default=MAX_DEPTH,
+                     help="How many links away from the start page the crawl goes")
+    parser.addoption("--crawl-max-pages", type=int, default=MAX_PAGES,
+                     help="Upper bound on pages visited by the crawl, start page included")
+    parser.addoption("--crawl-workers", type=int, default=WORKERS,
+                     help="Browser sessions the crawl runs pages on concurrently")
+    parser.addoption("--tracing", action="store_true", default=False,
+                     help="Write a Chrome trace-event file per test to the suite's traces/ folder and summarise "
+                          "the slowest phases and noisiest WebDriver commands")
+    parser.addoption("--record", action="store_true", default=False,
+                     help="Serve the site through a local mirror that records every response into the replay archive")
+    parser.addoption("--replay", action="store_true", default=False,
+                     help="Serve the site from the replay archive instead of the network")
+    parser.addoption("--replay-dir", action="store", default=ARCHIVE_DIR,
+                     help="Directory of the recorded replay archive")
+
+
+def pytest_configure(config):
+    config.pluginmanager.register(DurationRecorder(config.getoption("--duration-history")), "duration_recorder")
+
+
+@pytest.fixture(scope="session")
+def site_url(request):
+    # The live site, or a local mirror of it with --record / --replay.
+    record = request.config.getoption("--record")
+    if not (record or request.config.getoption("--replay")):
+        yield URL
+        return
+    mirror = MirrorServer(URL, request.config.getoption("--replay-dir"), record=record)
+    yield mirror.url_for(URL)
+    for url in mirror.close():
+        print(f"⚠️ Not in replay archive: {url}")
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_make_scheduler(config, log):
+    # Only replaces the default --dist=load; explicit modes keep xdist's schedulers.
+    if config.getoption("dist") != "load":
+        return None
+    return DurationScheduling(config, log, DurationHistory(config.getoption("--duration-history")))
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    # xdist controller: collect each worker's pool counters.
+    stats = node.workeroutput.get("driver_pool", [])
+    node.config.driver_pool_stats = getattr(node.config, "driver_pool_stats", []) + stats
+    node.config.trace_totals = merge_totals(getattr(node.config, "trace_totals", {}),
+                                            node.workeroutput.get("trace", {}))
+
+
+def pytest_sessionfinish(session):
+    workeroutput = getattr(session.config, "workeroutput", None)
+    if workeroutput is not None:
+        workeroutput["driver_pool"] = getattr(session.config, "driver_pool_stats", [])
+        workeroutput["trace"] = session_totals()
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    lines = summary_lines(getattr(config, "driver_pool_stats", []))
+    if lines:
+        terminalreporter.section("WebDriver pool")
+        for line in lines:
+            terminalreporter.write_line(line)
+    lines = trace_summary_lines(getattr(config, "trace_totals", None) or session_totals())
+    if lines:
+        terminalreporter.section("Trace")
+        for line in lines:
+            terminalreporter.write_line(line)
@@ -0,0 +1,96 @@
+import time
+
+from selenium.common.exceptions import JavascriptException, TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+PAGE_TIMEOUT = 15
+SETTLE_TIMEOUT = 5
+POLL_INTERVAL = 0.1
+# Consecutive polls with identical scrollHeight/resource count before the
+# layout and network are treated as settled.
+STABLE_POLLS = 2
+
+# Installs an in-flight counter around fetch/XHR on first call, then reports the
+# page state in one round trip. Infinite animations (spinners, marquees) are
+# ignored because they never finish.
+READINESS_JS = """
+const w = window;
+if (!w.__qaInflight) {
+    w.__qaInflight = {count: 0};
+    const track = w.__qaInflight;
+    if (w.fetch) {
+        const origFetch = w.fetch;
+        w.fetch = function () {
+            track.count++;
+            return origFetch.apply(this, arguments).finally(() => { track.count--; });
+        };
+    }
+    const origSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        track.count++;
+        this.addEventListener("loadend", () => { track.count--; }, {once: true});
+        return origSend.apply(this, arguments);
+    };
+}
+let animations = 0;
+if (document.getAnimations) {
+    animations = document.getAnimations().filter(a => {
+        if (a.playState !== "running") return false;
+        const end = a.effect && a.effect.getComputedTiming().endTime;
+        return end !== Infinity;
+    }).length;
+}
+const root = document.documentElement;
+return {
+    ready: document.readyState === "complete",
+    fonts: !document.fonts || document.fonts.status === "loaded",
+    inflight: w.__qaInflight.count,
+    images: Array.from(document.images).every(img => img.complete),
+    resources: performance.getEntriesByType("resource").length,
+    animations: animations,
+    height: Math.max(root ? root.scrollHeight : 0, document.body ? document.body.scrollHeight : 0),
+    scroll: window.scrollY
+};
+"""
+
+
+class _Settled:
+    def __init__(self, require_load):
+        self.require_load = require_load
+        self.history = []
+        self.last = None
+
+    def __call__(self, driver):
+        state = driver.execute_script(READINESS_JS)
+        self.last = state
+        if self.require_load and not (state["ready"] and state["fonts"] and state["images"]):
+            self.history.clear()
+            return False
+        if state["inflight"] or state["animations"]:
+            self.history.clear()
+            return False
+        key = (state["height"], state["resources"], state["scroll"])
+        self.history = (self.history + [key])[-STABLE_POLLS:]
+        return len(self.history) == STABLE_POLLS and len(set(self.history)) == 1
+
+
+def _wait(driver, timeout, require_load, label):
+    condition = _Settled(require_load)
+    started = time.perf_counter()
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL,
+                      ignored_exceptions=(JavascriptException,)).until(condition)
+        return time.perf_counter() - started
+    except TimeoutException:
+        # A page that never fully settles is still worth testing; carry on and say so.
+        print(f"⚠️ {label} not settled after {timeout}s: {condition.last}")
+        return None
+
+
+def wait_for_page_ready(driver, timeout=PAGE_TIMEOUT):
+    return _wait(driver, timeout, True, "Page")
+
+
+def wait_for_settle(driver, timeout=SETTLE_TIMEOUT):
+    # After a scroll or click: no new network, animations or layout shifts.
+    return _wait(driver, timeout, False, "Page after interaction")
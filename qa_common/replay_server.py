@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from filelock import FileLock
+
+from qa_common.files import atomic_write
+
+ARCHIVE_DIR = "replay_archive"
+INDEX = "index.json"
+INDEX_VERSION = 1
+EXTERNAL_PREFIX = "/__ext__/"
+TIMEOUT = 30
+HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; arunahf-qa recorder)", "Accept-Encoding": "identity"}
+# Hop-by-hop, length, date and server headers are set again when serving;
+# CSP/HSTS would otherwise block the rewritten http://127.0.0.1 URLs.
+DROP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-length", "content-encoding",
+                "date", "server",
+                "content-security-policy", "content-security-policy-report-only",
+                "strict-transport-security", "alt-svc"}
+TEXT_TYPES = ("text/", "javascript", "json", "xml", "svg", "manifest")
+# Namespace URIs are identifiers, not resources, and must survive rewriting.
+KEEP_HOSTS = {"www.w3.org", "schema.org", "ogp.me", "purl.org"}
+# Scheme (absent for protocol-relative URLs), the slashes as written (JSON
+# escapes them as \/\/) and the host.
+ABSOLUTE_URL = re.compile(rb"(?:(https?):)?(//|\\/\\/)([a-z0-9-]+(?:\.[a-z0-9-]+)+(?::\d+)?)(?=[/\\\"'`\s)?#]|$)",
+                          re.IGNORECASE)
+
+
+class ReplayArchive:
+    # Recorded responses: index.json maps "METHOD url" to status and headers,
+    # bodies are stored once under bodies/<sha256>. Bodies are kept exactly as
+    # the server sent them; URL rewriting happens when they are served.
+
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+        self.bodies_dir = os.path.join(directory, "bodies")
+        self.index_path = os.path.join(directory, INDEX)
+        self.lock = threading.Lock()
+        self.entries = self._read_index()
+        self.recorded = {}
+
+    def _read_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path, encoding="utf-8") as f:
+            return json.load(f).get("entries", {})
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, method, url):
+        entry = self.entries.get(f"{method} {url}")
+        if entry is None and method == "HEAD":
+            entry = self.entries.get(f"GET {url}")
+        if entry is None:
+            return None
+        with open(os.path.join(self.bodies_dir, entry["body"]), "rb") as f:
+            return entry["status"], entry["headers"], f.read()
+
+    def put(self, method, url, status, headers, body):
+        digest = hashlib.sha256(body).hexdigest()
+        os.makedirs(self.bodies_dir, exist_ok=True)
+        path = os.path.join(self.bodies_dir, digest)
+        if not os.path.exists(path):
+            atomic_write(path, body)
+        entry = {"status": status, "headers": headers, "body": digest}
+        with self.lock:
+            self.entries[f"{method} {url}"] = entry
+            self.recorded[f"{method} {url}"] = entry
+
+    def save(self):
+        if not self.recorded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with FileLock(self.index_path + ".lock"):
+            # Merge under the lock so xdist workers recording in parallel keep each other's entries.
+            entries = self._read_index()
+            entries.update(self.recorded)
+            payload = {"version": INDEX_VERSION, "entries": entries}
+            atomic_write(self.index_path, json.dumps(payload, indent=1, sort_keys=True).encode("utf-8"))
+        self.entries = entries
+        self.recorded = {}
+
+
+def _fetch(method, url, body=None, headers=None):
+    class NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    request = urllib.request.Request(url, data=body, method=method, headers={**HEADERS, **(headers or {})})
+    opener = urllib.request.build_opener(NoRedirect)
+    try:
+        with opener.open(request, timeout=TIMEOUT) as resp:
+            return resp.status, list(resp.headers.items()), resp.read()
+    except urllib.error.HTTPError as e:
+        # Redirects and error pages are recorded as they are.
+        return e.code, list(e.headers.items()), e.read()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "arunahf-qa-replay"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._serve()
+
+    def do_HEAD(self):
+        self._serve()
+
+    def do_POST(self):
+        self._serve()
+
+    def _serve(self):
+        mirror = self.server.mirror
+        url = mirror.upstream_url(self.path)
+        # Always drain the request body so the kept-alive connection stays in sync.
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else None
+        # Recording always goes to the network so a re-record refreshes the archive.
+        response = None if mirror.record else mirror.archive.get(self.command, url)
+        if mirror.record:
+            forward = {k: v for k, v in self.headers.items() if k.lower() in ("accept", "content-type")}
+            try:
+                status, headers, data = _fetch(self.command, url, body, forward)
+            except OSError as e:
+                self.send_error(502, f"Recording {url} failed: {e}")
+                return
+            headers = [[k, v] for k, v in headers if k.lower() not in DROP_HEADERS]
+            mirror.archive.put(self.command, url, status, headers, data)
+            response = status, headers, data
+        if response is None:
+            mirror.misses.append(url)
+            self.send_error(404, f"Not in replay archive: {url}")
+            return
+        status, headers, data = response
+        data = mirror.rewrite(headers, data, self.headers.get("Host") or mirror.host)
+        self.send_response(status)
+        for key, value in headers:
+            if key.lower() == "location":
+                value = mirror.rewrite_url(value, self.headers.get("Host") or mirror.host)
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+
+class MirrorServer:
+    # Local HTTP mirror of the site under test. In record mode every request is
+    # fetched from the live site (or, under /__ext__/<scheme>/<host>/, from the
+    # third-party host) and stored; in replay mode only the archive is used.
+    # Absolute URLs in text responses, JSON-escaped ones included, are
+    # rewritten to point back at the mirror so the browser never leaves it.
+
+    def __init__(self, origin, archive_dir=ARCHIVE_DIR, record=False, port=0):
+        parts = urlsplit(origin)
+        self.origin = f"{parts.scheme}://{parts.netloc}"
+        # Protocol-relative URLs load with the page's scheme.
+        self.scheme = parts.scheme.lower()
+        self.origin_host = parts.netloc.lower()
+        self.archive = ReplayArchive(archive_dir)
+        self.record = record
+        self.misses = []
+        if not record and not len(self.archive):
+            raise FileNotFoundError(f"No recorded responses in {self.archive.index_path}; run with --record first")
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.mirror = self
+        self.host = f"127.0.0.1:{self.httpd.server_port}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="replay-server", daemon=True)
+        self.thread.start()
+
+    def url_for(self, url):
+        # Local address of a live URL, e.g. the test's start page.
+        return self.rewrite_url(url, self.host)
+
+    def upstream_url(self, path):
+        if path.startswith(EXTERNAL_PREFIX):
+            scheme, _, rest = path[len(EXTERNAL_PREFIX):].partition("/")
+            host, _, rest = rest.partition("/")
+            return f"{scheme}://{host}/{rest}"
+        return self.origin + path
+
+    def rewrite_url(self, url, host):
+        match = ABSOLUTE_URL.match(url.encode("utf-8"))
+        if not match:
+            return url
+        return self._local(match, host.encode("ascii")).decode("utf-8") + url[match.end():]
+
+    def _local(self, match, host):
+        scheme, slashes, target = match.group(1), match.group(2), match.group(3).lower()
+        if target.decode("ascii") == self.origin_host:
+            local = b"http://" + host
+        elif target.decode("ascii") in KEEP_HOSTS or target == host:
+            return match.group(0)
+        else:
+            scheme = (scheme or self.scheme.encode("ascii")).lower()
+            local = b"http://" + host + EXTERNAL_PREFIX.encode("ascii") + scheme + b"/" + target
+        return local if slashes == b"//" else local.replace(b"/", b"\\/")
+
+    def rewrite(self, headers, data, host):
+        content_type = next((v for k, v in headers if k.lower() == "content-type"), "").lower()
+        if not any(t in content_type for t in TEXT_TYPES):
+            return data
+        host = host.encode("ascii")
+        return ABSOLUTE_URL.sub(lambda m: self._local(m, host), data)
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.record:
+            self.archive.save()
+        return sorted(set(self.misses))
@@ -0,0 +1,148 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+TRACE_DIR = "traces"
+TOP = 10
+
+# The test currently being traced in this process. Crawler threads and tabs
+# of the same test all record into it; with no test traced, spans and
+# commands cost one attribute check.
+_active = None
+# Per-process totals over every traced test, shipped to the xdist controller
+# for the session summary: {"spans"|"commands": {name: [count, seconds, max]}}.
+_totals = {"spans": {}, "commands": {}}
+
+
+class Tracer:
+    # Collects Chrome trace-event "complete" events (open the file in
+    # chrome://tracing or https://ui.perfetto.dev): one per span and one per
+    # WebDriver command, on the thread that ran it.
+
+    def __init__(self, name):
+        self.name = name
+        self.origin = time.perf_counter()
+        self.events = []
+        self.threads = {}
+        self.lock = threading.Lock()
+
+    def add(self, name, cat, started, ended, args=None):
+        thread = threading.current_thread()
+        event = {"name": name, "cat": cat, "ph": "X", "pid": os.getpid(), "tid": thread.ident,
+                 "ts": round((started - self.origin) * 1e6, 1), "dur": round((ended - started) * 1e6, 1)}
+        if args:
+            event["args"] = args
+        with self.lock:
+            self.threads.setdefault(thread.ident, thread.name)
+            self.events.append(event)
+            _add_total(cat, name, ended - started)
+
+    def save(self, path):
+        meta = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                for tid, name in self.threads.items()]
+        meta.append({"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": self.name}})
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": meta + self.events, "displayTimeUnit": "ms"}, f)
+
+
+def _add_total(cat, name, seconds):
+    table = _totals["commands" if cat == "webdriver" else "spans"]
+    entry = table.setdefault(name, [0, 0.0, 0.0])
+    entry[0] += 1
+    entry[1] += seconds
+    entry[2] = max(entry[2], seconds)
+
+
+@contextmanager
+def span(name, **args):
+    tracer = _active
+    if tracer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        tracer.add(name, "phase", started, time.perf_counter(), args)
+
+
+def instrument(driver):
+    # Every remote command, including those issued by WebElements and
+    # switch_to, goes through the driver's execute(); shadow it on the
+    # instance so each one is counted and timed.
+    if getattr(driver, "_traced", False):
+        return driver
+    execute = driver.execute
+
+    def traced_execute(driver_command, params=None):
+        tracer = _active
+        if tracer is None:
+            return execute(driver_command, params)
+        started = time.perf_counter()
+        try:
+            return execute(driver_command, params)
+        finally:
+            tracer.add(driver_command, "webdriver", started, time.perf_counter())
+
+    driver.execute = traced_execute
+    driver._traced = True
+    return driver
+
+
+def trace_filename(nodeid):
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", nodeid).strip("_") + ".json"
+
+
+class TraceRecorder:
+    # Plugin that traces each test where it runs (the xdist worker), from
+    # fixture setup to teardown, and writes <directory>/<test>.json.
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        global _active
+        _active = tracer = Tracer(item.nodeid)
+        try:
+            yield
+        finally:
+            _active = None
+            tracer.add("test", "phase", tracer.origin, time.perf_counter(), {"nodeid": item.nodeid})
+            tracer.save(os.path.join(self.directory, trace_filename(item.nodeid)))
+
+
+def session_totals():
+    return _totals
+
+
+def merge_totals(into, totals):
+    for kind in ("spans", "commands"):
+        table = into.setdefault(kind, {})
+        for name, (count, seconds, longest) in totals.get(kind, {}).items():
+            entry = table.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += count
+            entry[1] += seconds
+            entry[2] = max(entry[2], longest)
+    return into
+
+
+def trace_summary_lines(totals, top=TOP):
+    lines = []
+    spans = sorted(totals.get("spans", {}).items(), key=lambda kv: kv[1][1], reverse=True)[:top]
+    if spans:
+        lines.append(f"{'slowest phases':<28}{'count':>7}{'total s':>10}{'mean s':>9}{'max s':>8}")
+        for name, (count, seconds, longest) in spans:
+            lines.append(f"{name:<28}{count:>7}{seconds:>10.1f}{seconds / count:>9.2f}{longest:>8.2f}")
+    commands = sorted(totals.get("commands", {}).items(), key=lambda kv: kv[1][0], reverse=True)[:top]
+    if commands:
+        lines.append(f"{'noisiest commands':<28}{'count':>7}{'total s':>10}{'mean ms':>9}{'max s':>8}")
+        for name, (count, seconds, longest) in commands:
+            lines.append(f"{name:<28}{count:>7}{seconds:>10.1f}{seconds / count * 1000:>9.1f}{longest:>8.2f}")
+    return lines
@@ -0,0 +1,60 @@
+import os
+import time
+
+import numpy as np
+
+from baseline_cache import DecodedBaselineCache
+from image_compare import encode_png
+
+
+def write_png(tmp_path, name, value, size=(32, 32)):
+    path = tmp_path / f"{name}.png"
+    path.write_bytes(encode_png(np.full((*size, 3), value, dtype=np.uint8)))
+    return str(path)
+
+
+def age(path, seconds):
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+
+def test_a_baseline_is_decoded_once_and_then_mapped(tmp_path):
+    cache = DecodedBaselineCache(str(tmp_path / "decoded"))
+    png = write_png(tmp_path, "a", 7)
+    first = cache.load("a", png)
+    assert isinstance(first, np.memmap) and first.shape == (32, 32, 3) and (first == 7).all()
+    os.remove(png)
+    # The PNG is gone, so this can only come from the cache.
+    assert (cache.load("a", png) == 7).all()
+
+
+def test_the_least_recently_used_entries_are_evicted(tmp_path):
+    entry = 32 * 32 * 3 + 128
+    cache = DecodedBaselineCache(str(tmp_path / "decoded"), max_bytes=int(entry * 2.5))
+    pngs = {name: write_png(tmp_path, name, i) for i, name in enumerate("abc")}
+    cache.load("a", pngs["a"])
+    cache.load("b", pngs["b"])
+    age(cache.path("a"), 60)
+    age(cache.path("b"), 120)
+    # A hit refreshes "b", so "a" is now the oldest.
+    cache.load("b", pngs["b"])
+    cache.load("c", pngs["c"])
+    assert sorted(os.listdir(cache.directory)) == ["b.npy", "c.npy"]
+
+
+def test_the_entry_just_loaded_is_never_evicted(tmp_path):
+    cache = DecodedBaselineCache(str(tmp_path / "decoded"), max_bytes=1)
+    assert (cache.load("a", write_png(tmp_path, "a", 1)) == 1).all()
+    assert os.listdir(cache.directory) == ["a.npy"]
+    cache.load("b", write_png(tmp_path, "b", 2))
+    assert os.listdir(cache.directory) == ["b.npy"]
+
+
+def test_a_corrupt_entry_is_decoded_again(tmp_path):
+    cache = DecodedBaselineCache(str(tmp_path / "decoded"))
+    with open(cache.path("a"), "wb") as f:
+        f.write(b"truncated")
+    assert (cache.load("a", write_png(tmp_path, "a", 9)) == 9).all()
+    cache.invalidate("a")
+    cache.invalidate("a")
+    assert os.listdir(cache.directory) == []
@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from baseline_store import MANIFEST, STORE_DIR, BaselineStore, hash_bytes
+from image_compare import encode_png
+
+
+def png(value, size=(8, 8)):
+    return encode_png(np.full((*size, 3), value, dtype=np.uint8))
+
+
+def manifest(root):
+    with open(os.path.join(root, STORE_DIR, MANIFEST), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_identical_baselines_are_stored_once(tmp_path):
+    store = BaselineStore(str(tmp_path))
+    first = store.put("chrome_hero", png(10), run="r1")
+    second = store.put("firefox_hero", png(10), run="r1")
+    assert first == second and store.get_hash("chrome_hero") == hash_bytes(png(10))
+    assert os.listdir(store.objects_dir) == [os.path.basename(first)]
+    assert "chrome_hero" in store and len(store) == 2
+    assert store.get("missing") is None and store.ref("missing") is None
+
+
+def test_the_manifest_survives_a_new_store(tmp_path):
+    store = BaselineStore(str(tmp_path))
+    store.put("hero", png(10), run="r1")
+    store.put_fingerprint("chrome_Desktop_scroll", "abc", ["hero"], run="r1")
+    reopened = BaselineStore(str(tmp_path))
+    assert reopened.get_hash("hero") == hash_bytes(png(10))
+    assert reopened.entries["hero"]["run"] == "r1"
+    assert reopened.unchanged("chrome_Desktop_scroll", "abc")
+    assert not reopened.unchanged("chrome_Desktop_scroll", "def")
+    assert manifest(str(tmp_path))["version"] == 1
+
+
+def test_fingerprints_need_every_baseline_they_cover(tmp_path):
+    store = BaselineStore(str(tmp_path))
+    store.put("hero", png(10))
+    store.put_fingerprint("page", "abc", ["hero", "scroll_0"])
+    assert not store.unchanged("page", "abc")
+    store.put("scroll_0", png(20))
+    assert store.unchanged("page", "abc")
+
+
+def test_concurrent_workers_keep_each_others_entries(tmp_path):
+    # One store per thread, as every xdist worker opens its own.
+    root = str(tmp_path)
+    BaselineStore(root)
+
+    def worker(n):
+        store = BaselineStore(root)
+        for i in range(5):
+            store.put(f"w{n}_shot{i}", png(n * 10 + i))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(manifest(root)["entries"]) == 40
+    assert len(BaselineStore(root)) == 40
+
+
+def test_replaced_baselines_drop_their_decoded_copy(tmp_path):
+    store = BaselineStore(str(tmp_path))
+    store.put("hero", png(10))
+    store.put("twin", png(10))
+    old = store.ref("hero")
+    store.decoded.load(old.digest, old.path)
+    # Still referenced by "twin": the decoded copy stays.
+    store.put("hero", png(20))
+    assert os.path.exists(store.decoded.path(old.digest))
+    store.put("twin", png(30))
+    assert not os.path.exists(store.decoded.path(old.digest))
+
+
+def test_existing_run_folders_are_imported_newest_first(tmp_path):
+    root = str(tmp_path)
+    for run, value in (("2026-01-01_00-00-00", 10), ("2026-01-02_00-00-00", 20)):
+        os.makedirs(os.path.join(root, run, "baseline"))
+        with open(os.path.join(root, run, "baseline", "hero.png"), "wb") as f:
+            f.write(png(value))
+    with open(os.path.join(root, "2026-01-01_00-00-00", "baseline", "old_only.png"), "wb") as f:
+        f.write(png(30))
+    store = BaselineStore(root)
+    assert store.get_hash("hero") == hash_bytes(png(20))
+    assert store.entries["hero"]["run"] == "2026-01-02_00-00-00"
+    assert store.get_hash("old_only") == hash_bytes(png(30))
+
+
+def test_baselines_are_linked_into_run_folders(tmp_path):
+    store = BaselineStore(str(tmp_path))
+    store.put("hero", png(10))
+    run_dir = tmp_path / "run" / "baseline"
+    run_dir.mkdir(parents=True)
+    linked = store.link_into("hero", str(run_dir))
+    assert os.path.samefile(linked, store.get("hero"))
+    # Linking again replaces the previous copy.
+    store.put("hero", png(20))
+    assert os.path.samefile(store.link_into("hero", str(run_dir)), store.get("hero"))
+
+
+def test_merged_manifests_keep_the_latest_run_and_local_entries(tmp_path):
+    store = BaselineStore(str(tmp_path))
+    store.put("hero", png(10), run="r2")
+    # Another process saves a baseline after this store was opened.
+    BaselineStore(str(tmp_path)).put("footer", png(20), run="r1")
+    entries = store.merge({"hero": {"hash": "old", "path": "objects/old.png", "run": "r1"},
+                           "menu": {"hash": "new", "path": "objects/new.png", "run": "r3"}},
+                          {"chrome_Desktop_scroll": {"hash": "abc", "names": ["menu"], "run": "r3"}})
+    assert entries["hero"]["hash"] == hash_bytes(png(10))
+    assert set(entries) == {"hero", "footer", "menu"} and store.entries == entries
+    on_disk = manifest(str(tmp_path))
+    assert on_disk["entries"] == entries and on_disk["version"] == 1
+    assert on_disk["fingerprints"]["chrome_Desktop_scroll"]["hash"] == "abc"
@@ -0,0 +1,44 @@
+from run_benchmarks import Result, regressions
+
+
+def history(name, medians, host="ci"):
+    return {"runs": [{"host": host, "results": {name: {"median_ms": m}}} for m in medians]}
+
+
+def result(median_ms, samples=5, browser=False):
+    return Result(median_ms, median_ms, 1000 / median_ms, samples, browser)
+
+
+def test_slowdown_beyond_threshold_and_noise_is_a_regression():
+    found, skipped = regressions(history("compare", [10.0, 10.2, 9.9, 10.1]), {"compare": result(14.0)}, "ci")
+    assert found == [("compare", 10.05, 14.0)] and skipped == []
+
+
+def test_sub_millisecond_jitter_is_not_a_regression():
+    found, _ = regressions(history("store_open", [0.30, 0.31, 0.29]), {"store_open": result(0.42)}, "ci")
+    assert found == []
+
+
+def test_slowdown_within_run_to_run_noise_is_not_a_regression():
+    found, _ = regressions(history("animation", [40.0, 60.0, 35.0, 65.0, 50.0]), {"animation": result(64.0)}, "ci")
+    assert found == []
+
+
+def test_too_few_samples_or_runs_are_skipped():
+    few_runs = history("compare", [10.0, 10.0])
+    found, skipped = regressions(few_runs, {"compare": result(30.0)}, "ci")
+    assert (found, skipped) == ([], ["compare"])
+    found, skipped = regressions(history("compare", [10.0] * 5), {"compare": result(30.0, samples=2)}, "ci")
+    assert (found, skipped) == ([], ["compare"])
+
+
+def test_only_runs_from_the_same_host_are_compared():
+    found, skipped = regressions(history("compare", [10.0] * 5, host="laptop"), {"compare": result(30.0)}, "ci")
+    assert (found, skipped) == ([], ["compare"])
+
+
+def test_per_benchmark_threshold_overrides_the_category():
+    runs = history("driver_startup[chrome]", [1000.0] * 5)
+    results = {"driver_startup[chrome]": result(1800.0, samples=3, browser=True)}
+    assert regressions(runs, results, "ci", overrides={"driver_startup": 1.0})[0] == []
+    assert regressions(runs, results, "ci", overrides={})[0] != []
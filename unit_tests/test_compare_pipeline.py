@@ -0,0 +1,62 @@
+import threading
+import time
+
+import numpy as np
+
+import compare_pipeline
+from baseline_store import BaselineStore, read_tile_index
+from compare_pipeline import ComparisonPipeline, screenshot_job
+from image_compare import encode_png, tile_hashes
+
+
+def test_concurrent_submits_share_one_process_pool(monkeypatch, tmp_path):
+    created = []
+    real = compare_pipeline.ProcessPoolExecutor
+
+    def slow_pool(*args, **kwargs):
+        # Widen the window in which two threads could both see no pool.
+        time.sleep(0.05)
+        created.append(real(*args, **kwargs))
+        return created[-1]
+
+    monkeypatch.setattr(compare_pipeline, "ProcessPoolExecutor", slow_pool)
+    pipeline = ComparisonPipeline(max_workers=1)
+    frame = np.zeros((40, 60, 3), dtype=np.uint8)
+    threads = [threading.Thread(target=pipeline.submit,
+                                args=("test", f"shot_{i}", None, frame, str(tmp_path / f"{i}.png"),
+                                      str(tmp_path / f"{i}_diff.png"), {}, 30))
+               for i in range(6)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(created) == 1
+        assert len(pipeline.pending["test"]) == 6
+        assert pipeline.collect("test") == []
+    finally:
+        pipeline.close()
+
+
+def page(seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (150, 130, 3), dtype=np.uint8)
+
+
+def test_new_baselines_are_stored_without_decoding(monkeypatch, tmp_path):
+    monkeypatch.setattr("PIL.Image.open", lambda *a, **k: (_ for _ in ()).throw(AssertionError("decoded")))
+    store = BaselineStore(str(tmp_path))
+    store.put("shot", b"not even a png")
+    assert store.needs_tiles("shot")
+
+
+def test_the_job_writes_the_new_baseline_tile_index(tmp_path):
+    store = BaselineStore(str(tmp_path))
+    image = page()
+    store.put("shot", encode_png(image))
+    ref = store.ref("shot")
+    output = screenshot_job(None, encode_png(image), None, None, {}, 40, ref.tiles_path)
+    assert output.result is None and output.frame.shape[1] == 40
+    assert not store.needs_tiles("shot")
+    assert (read_tile_index(ref.tiles_path) == tile_hashes(image)).all()
+    # The next comparison against it passes on tile hashes alone.
+    assert screenshot_job(ref, encode_png(image), None, None, {}, None).result
@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+from qa_common.crawler import Crawler, normalize_url, page_slug, same_origin
+
+
+@pytest.mark.parametrize("href, expected", [
+    ("HTTPS://Example.COM:443/a/?utm_source=x&b=2&a=1#top", "https://example.com/a?a=1&b=2"),
+    ("http://example.com:80", "http://example.com/"),
+    ("http://example.com:8080/a/", "http://example.com:8080/a"),
+    ("/about/", "https://example.com/about"),
+    ("team#members", "https://example.com/docs/team"),
+    ("?fbclid=1", "https://example.com/docs/intro"),
+    ("mailto:me@example.com", None),
+    ("javascript:void(0)", None),
+    ("", None),
+])
+def test_normalize_url(href, expected):
+    assert normalize_url(href, "https://example.com/docs/intro") == expected
+
+
+def test_same_origin_compares_scheme_and_host():
+    assert same_origin("https://a.test/x", "https://a.test/y?z=1")
+    assert not same_origin("https://a.test/", "http://a.test/")
+    assert not same_origin("https://a.test/", "https://b.a.test/")
+
+
+def test_page_slug_keeps_punctuation_variants_apart():
+    slugs = {page_slug(f"https://a.test/{path}") for path in ("a-b", "a_b", "a.b", "a/b")}
+    assert len(slugs) == 4
+    assert all(slug.startswith("a_b_") for slug in slugs)
+
+
+def test_page_slug_is_stable_across_hosts_and_url_spellings():
+    assert page_slug("https://a.test/a-b/") == page_slug("http://127.0.0.1:8123/a-b?utm_source=x")
+    assert page_slug("https://a.test").startswith("home_")
+    assert page_slug("https://a.test/p?x=1") != page_slug("https://a.test/p?x=2")
+
+
+class Session:
+    def __init__(self):
+        self.driver = self
+        self.current = None
+
+    def get(self, url):
+        self.current = url
+
+
+class Pool:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.live = self.most = 0
+
+    def acquire(self, browser, window_size=None):
+        with self.lock:
+            self.live += 1
+            self.most = max(self.most, self.live)
+        return Session()
+
+    def release(self, session):
+        with self.lock:
+            self.live -= 1
+
+
+SITE = {
+    "https://a.test/": ["/one", "/two/", "https://elsewhere.test/", "/file.pdf", "/one?utm_source=x"],
+    "https://a.test/one": ["/three", "/"],
+    "https://a.test/two": ["/four"],
+    "https://a.test/three": ["/five"],
+    "https://a.test/four": [],
+}
+
+
+def crawl(**kwargs):
+    pool = Pool()
+
+    def visit(driver, url, depth):
+        time.sleep(0.02)
+        return SITE.get(url, [])
+
+    pages = Crawler(pool, "chrome", visit, **kwargs).crawl("https://a.test")
+    return {page.url: page.depth for page in pages}, pool
+
+
+def test_crawl_is_breadth_first_deduplicated_and_bounded(monkeypatch):
+    monkeypatch.setattr("qa_common.crawler.wait_for_page_ready", lambda driver: None)
+    pages, pool = crawl(max_depth=2, workers=2)
+    assert pages == {"https://a.test/": 0, "https://a.test/one": 1, "https://a.test/two": 1,
+                     "https://a.test/three": 2, "https://a.test/four": 2}
+    assert pool.most <= 2
+    pages, _ = crawl(max_depth=2, max_pages=3)
+    assert len(pages) == 3
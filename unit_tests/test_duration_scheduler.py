@@ -0,0 +1,147 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from qa_common.duration_scheduler import (DEFAULT_DURATION, PREFETCH, SMOOTHING, DurationHistory, DurationScheduling,
+                                          browser_of)
+
+
+class Config:
+    def __init__(self, workers):
+        self.values = {"tx": [f"{workers}*popen"], "maxschedchunk": None}
+
+    def getvalue(self, name):
+        return self.values[name]
+
+    getoption = getvalue
+
+
+class Node:
+    # The parts of xdist's WorkerController the scheduler talks to.
+    def __init__(self, name):
+        self.name = name
+        self.gateway = SimpleNamespace(id=name)
+        self.sent = []
+        self.shutting_down = False
+
+    def send_runtest_some(self, indices):
+        self.sent += indices
+
+    def shutdown(self):
+        self.shutting_down = True
+
+    def __repr__(self):
+        return self.name
+
+
+class History(DurationHistory):
+    def __init__(self, tests, launch=None):
+        self.path = None
+        self.tests = dict(tests)
+        self.launch = dict(launch or {})
+
+
+def start(tests, workers=2, launch=None):
+    collection = list(tests)
+    scheduler = DurationScheduling(Config(workers), history=History(tests, launch))
+    nodes = [Node(f"gw{i}") for i in range(workers)]
+    for node in nodes:
+        scheduler.add_node(node)
+        scheduler.add_node_collection(node, collection)
+    scheduler.schedule()
+    return scheduler, nodes
+
+
+def planned(scheduler, node):
+    # Everything a worker was given or still has queued, as test ids.
+    return [scheduler.collection[i] for i in node.sent + scheduler.queues[node]]
+
+
+def finish(scheduler, node, nodeid):
+    scheduler.mark_test_complete(node, scheduler.collection.index(nodeid))
+
+
+def test_longest_tests_are_planned_first_onto_the_least_loaded_worker():
+    tests = {"t::a": 10, "t::b": 8, "t::c": 6, "t::d": 5, "t::e": 3, "t::f": 2}
+    scheduler, (gw0, gw1) = start(tests)
+    assert planned(scheduler, gw0) == ["t::a", "t::d", "t::f"]
+    assert planned(scheduler, gw1) == ["t::b", "t::c", "t::e"]
+    assert len(gw0.sent) == len(gw1.sent) == PREFETCH
+
+
+def test_launch_costs_keep_same_browser_tests_on_one_worker():
+    tests = {"t::a[chrome]": 30, "t::b[firefox]": 28, "t::c[chrome]": 5, "t::d[firefox]": 5}
+    scheduler, (gw0, gw1) = start(tests, launch={"chrome": 20, "firefox": 20})
+    assert planned(scheduler, gw0) == ["t::a[chrome]", "t::c[chrome]"]
+    assert planned(scheduler, gw1) == ["t::b[firefox]", "t::d[firefox]"]
+    # With free launches the plan only balances the load.
+    scheduler, (gw0, gw1) = start(tests, launch={"chrome": 0, "firefox": 0})
+    assert planned(scheduler, gw1) == ["t::b[firefox]", "t::c[chrome]"]
+
+
+def test_an_idle_worker_steals_the_shortest_test_it_has_a_browser_for():
+    tests = {"t::x[chrome]": 1, "t::a[chrome]": 50, "t::b[firefox]": 40, "t::c[chrome]": 30,
+             "t::d[firefox]": 20, "t::e[firefox]": 10}
+    scheduler, (gw0, gw1) = start(tests)
+    assert planned(scheduler, gw0) == ["t::a[chrome]", "t::d[firefox]", "t::e[firefox]"]
+    assert planned(scheduler, gw1) == ["t::b[firefox]", "t::c[chrome]", "t::x[chrome]"]
+    # gw1 runs dry first: once its own tests are done it steals from gw0.
+    for nodeid in ("t::b[firefox]", "t::c[chrome]"):
+        finish(scheduler, gw1, nodeid)
+    assert scheduler.queues[gw0] == [scheduler.collection.index("t::e[firefox]")]
+    finish(scheduler, gw1, "t::x[chrome]")
+    assert scheduler.queues[gw0] == [] and gw1.sent[-1] == scheduler.collection.index("t::e[firefox]")
+    assert not scheduler.tests_finished
+
+
+def test_workers_only_steal_when_idle():
+    scheduler, (gw0, gw1) = start({"t::a": 2, "t::b": 1})
+    assert planned(scheduler, gw0) == ["t::a"] and planned(scheduler, gw1) == ["t::b"]
+
+
+def test_steals_prefer_an_open_browser_over_the_shortest_test():
+    scheduler, (gw0, gw1) = start({"t::a[chrome]": 1, "t::b[chrome]": 1})
+    scheduler.queues[gw0] = [scheduler.collection.index("t::a[chrome]"), scheduler.collection.index("t::b[chrome]")]
+    scheduler.collection.append("t::z[firefox]")
+    scheduler.queues[gw0].append(len(scheduler.collection) - 1)
+    scheduler.browsers[gw1] = {"chrome"}
+    assert scheduler.collection[scheduler._steal(gw1)] == "t::b[chrome]"
+    scheduler.browsers[gw1] = {"edge"}
+    assert scheduler.collection[scheduler._steal(gw1)] == "t::z[firefox]"
+
+
+def test_a_crashed_workers_tests_are_replanned():
+    tests = {"t::a": 10, "t::b": 8, "t::c": 6, "t::d": 5, "t::e": 3, "t::f": 2}
+    scheduler, (gw0, gw1) = start(tests)
+    crashed = scheduler.remove_node(gw0)
+    assert crashed == "t::a"
+    assert sorted(planned(scheduler, gw1)) == ["t::b", "t::c", "t::d", "t::e", "t::f"]
+
+
+def test_workers_shut_down_once_everything_ran():
+    scheduler, (gw0, gw1) = start({"t::a": 2, "t::b": 1})
+    finish(scheduler, gw0, "t::a")
+    finish(scheduler, gw1, "t::b")
+    assert gw0.shutting_down and gw1.shutting_down and scheduler.tests_finished
+
+
+def test_history_estimates_and_records(tmp_path):
+    path = str(tmp_path / "durations.json")
+    history = DurationHistory(path)
+    assert history.estimate("t::new") == DEFAULT_DURATION
+    history.record({"t::a": 10.0, "t::b": 2.0, "t::c": 4.0}, {"chrome": 3.0})
+    history.record({"t::a": 20.0}, {})
+    reloaded = DurationHistory(path)
+    assert reloaded.estimate("t::a") == pytest.approx(SMOOTHING * 20 + (1 - SMOOTHING) * 10)
+    # Unseen tests get the median, so they neither hog nor trail the plan.
+    assert reloaded.estimate("t::new") == 4.0
+    assert reloaded.launch_cost("chrome") == 3.0
+    with open(path, encoding="utf-8") as f:
+        assert set(json.load(f)) == {"tests", "launch"}
+
+
+def test_browser_comes_from_the_parametrize_id():
+    assert browser_of("tests/t.py::test_site[iPhone X-firefox]") == "firefox"
+    assert browser_of("tests/t.py::test_site[Desktop]") == ""
+    assert browser_of("tests/t.py::test_site") == ""
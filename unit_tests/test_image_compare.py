@@ -0,0 +1,109 @@
+import numpy as np
+
+from image_compare import (CHANNEL_THRESHOLD, PIXEL_THRESHOLD, TILE_SIZE, compare_arrays, differing_tiles,
+                           encode_png, load_image, render_diff, tile_hashes)
+
+
+def page(height=256, width=320, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+def nudged(image, box, delta):
+    # `delta` added to every channel inside box (left, top, right, bottom), without wrapping.
+    out = image.astype(np.int16)
+    left, top, right, bottom = box
+    out[top:bottom, left:right] += delta
+    return np.clip(out, 0, 255).astype(np.uint8)
+
+
+def test_identical_images_pass():
+    image = page()
+    result = compare_arrays(image, image.copy())
+    assert result and result.changed_pixels == 0 and result.boxes == [] and result.score == 1.0
+
+
+def test_rendering_noise_below_the_thresholds_is_ignored():
+    image = np.full((128, 128, 3), 120, dtype=np.uint8)
+    # Each channel moves by the channel threshold and their sum stays under the pixel threshold.
+    noisy = image.copy()
+    noisy[..., 0] += CHANNEL_THRESHOLD
+    assert CHANNEL_THRESHOLD < PIXEL_THRESHOLD
+    assert compare_arrays(image, noisy).changed_pixels == 0
+    # Spread over all three channels, the summed delta crosses the pixel threshold.
+    spread = image + PIXEL_THRESHOLD // 3 + 1
+    assert compare_arrays(image, spread, max_changed_ratio=1, max_tile_ratio=1).changed_pixels == 128 * 128
+
+
+def test_small_changes_within_the_budget_pass():
+    image = page()
+    changed = nudged(image, (10, 10, 14, 14), 100)
+    result = compare_arrays(image, changed, max_changed_ratio=0.001)
+    assert result and result.changed_pixels <= 16
+    assert compare_arrays(image, changed, max_changed_ratio=0.0001).passed is False
+
+
+def test_changed_regions_are_reported_as_tight_boxes():
+    image = np.zeros((256, 256, 3), dtype=np.uint8)
+    # One change straddling four tiles, one on its own in the far corner.
+    changed = nudged(nudged(image, (60, 60, 70, 70), 200), (250, 250, 256, 256), 200)
+    result = compare_arrays(image, changed, early_exit=False)
+    assert not result and result.complete
+    assert sorted(result.boxes) == [(60, 60, 70, 70), (250, 250, 256, 256)]
+    assert result.changed_pixels == 100 + 36
+
+
+def test_a_mostly_changed_tile_fails_even_within_the_budget():
+    image = np.zeros((640, 640, 3), dtype=np.uint8)
+    changed = nudged(image, (0, 0, 40, 40), 200)
+    assert compare_arrays(image, changed, max_changed_ratio=0.5, max_tile_ratio=1).passed
+    assert not compare_arrays(image, changed, max_changed_ratio=0.5)
+
+
+def test_early_exit_stops_at_the_first_failing_band():
+    image = np.zeros((256, 320, 3), dtype=np.uint8)
+    changed = nudged(image, (0, 0, 320, 256), 200)
+    result = compare_arrays(image, changed)
+    assert not result and not result.complete and result.changed_pixels < 320 * 256
+    assert "stopped early" in result.summary()
+    assert compare_arrays(image, changed, early_exit=False).changed_pixels == 320 * 256
+
+
+def test_size_mismatch_fails():
+    result = compare_arrays(page(256, 320), page(300, 320))
+    assert result.size_mismatch and not result and result.summary() == "size mismatch"
+
+
+def test_png_round_trip_and_diff_rendering():
+    image = page(64, 96)
+    assert (load_image(encode_png(image)) == image).all()
+    changed = nudged(image, (5, 5, 7, 7), 200)
+    diff = np.asarray(render_diff(image, changed))
+    assert (diff[5:7, 5:7] == (255, 0, 0)).all()
+    assert (diff[20, 20] == image[20, 20] // 3).all()
+
+
+def test_tile_hashes_cover_partial_edge_tiles():
+    image = page(150, 130)
+    grid = tile_hashes(image)
+    assert grid.shape == (-(-150 // TILE_SIZE), -(-130 // TILE_SIZE)) == (3, 3)
+    assert (tile_hashes(image.copy()) == grid).all()
+    # A one-unit change in the bottom-right partial tile changes that hash only.
+    changed = image.copy()
+    changed[149, 129, 2] ^= 1
+    assert differing_tiles(grid, tile_hashes(changed)) == [(2, 2)]
+
+
+def test_tiles_of_different_grids_are_not_compared():
+    assert differing_tiles(tile_hashes(page(128, 128)), tile_hashes(page(192, 128))) is None
+
+
+def test_candidate_tiles_give_the_full_comparison_result():
+    image = page()
+    changed = nudged(nudged(image, (3, 3, 9, 9), 90), (190, 130, 195, 190), -90)
+    candidates = differing_tiles(tile_hashes(image), tile_hashes(changed))
+    assert candidates == [(0, 0), (2, 2), (2, 3)]
+    full = compare_arrays(image, changed, early_exit=False)
+    partial = compare_arrays(image, changed, early_exit=False, candidates=candidates)
+    assert (partial.passed, partial.changed_pixels, sorted(partial.boxes)) == \
+        (full.passed, full.changed_pixels, sorted(full.boxes))
+    assert compare_arrays(image, image, candidates=[]).passed
@@ -0,0 +1,119 @@
+import pytest
+
+import qa_common.interactions as interactions
+from qa_common.interactions import OUTCOME_JS, InteractionEngine
+
+
+class Target:
+    def __init__(self, selector):
+        self.selector = selector
+
+    def label(self, default):
+        return self.selector
+
+
+class Button:
+    def __init__(self, driver, popups):
+        self.driver = driver
+        self.popups = popups
+
+    def click(self):
+        for _ in range(self.popups):
+            self.driver.open("popup", opener=self.driver.current_window_handle)
+
+
+class Switch:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        assert handle in self.driver.handles
+        self.driver.current_window_handle = handle
+
+    def new_window(self, kind):
+        self.driver.current_window_handle = self.driver.open("tab")
+
+
+class Driver:
+    # Each "#popN" button opens N windows when clicked; DevTools reports the
+    # tab that opened each one when `cdp` is set.
+    def __init__(self, cdp=True):
+        self.handles = {"home": None}
+        self.current_window_handle = "home"
+        self.switch_to = Switch(self)
+        self.closed = []
+        self.cdp = cdp
+        self.count = 0
+
+    @property
+    def window_handles(self):
+        return list(self.handles)
+
+    def open(self, kind, opener=None):
+        self.count += 1
+        handle = f"{kind}{self.count}"
+        self.handles[handle] = opener
+        return handle
+
+    def execute_script(self, script, *args):
+        if script == OUTCOME_JS:
+            return {"href": "https://a.test/", "navigated": False, "errors": [], "modal_buttons": None}
+
+    def find_element(self, by, selector):
+        return Button(self, int(selector.removeprefix("#pop")))
+
+    def close(self):
+        del self.handles[self.current_window_handle]
+        self.closed.append(self.current_window_handle)
+
+    def execute_cdp_cmd(self, cmd, params):
+        if not self.cdp:
+            raise RuntimeError("no DevTools")
+        assert cmd == "Target.getTargets"
+        return {"targetInfos": [{"targetId": handle, "openerId": opener} for handle, opener in self.handles.items()]}
+
+
+@pytest.fixture(autouse=True)
+def no_waits(monkeypatch):
+    monkeypatch.setattr(interactions, "wait_for_page_ready", lambda driver: None)
+    monkeypatch.setattr(interactions, "wait_for_settle", lambda driver: None)
+
+
+@pytest.mark.parametrize("cdp", [True, False])
+def test_popups_are_charged_to_the_click_that_opened_them(cdp):
+    driver = Driver(cdp)
+    engine = InteractionEngine(driver, "https://a.test/", tabs=3)
+    outcomes = engine.run([Target("#pop0"), Target("#pop2"), Target("#pop1")])
+    assert [o.new_windows for o in outcomes] == [0, 2, 1]
+    assert driver.window_handles == ["home"] and driver.current_window_handle == "home"
+
+
+def test_popups_closed_by_the_page_are_not_closed_again():
+    driver = Driver()
+    outcome_js = driver.execute_script
+
+    def close_popups(script, *args):
+        # The popups close themselves while the outcomes are being checked.
+        for handle in [h for h in driver.handles if h.startswith("popup")]:
+            del driver.handles[handle]
+        return outcome_js(script, *args)
+
+    driver.execute_script = close_popups
+    outcomes = InteractionEngine(driver, "https://a.test/", tabs=2).run([Target("#pop1"), Target("#pop1")])
+    assert [o.new_windows for o in outcomes] == [1, 1]
+    assert not any(h.startswith("popup") for h in driver.closed)
+
+
+def test_tabs_come_from_the_tab_factory():
+    driver = Driver()
+    urls = []
+
+    def new_tab(d, url):
+        urls.append(url)
+        d.current_window_handle = d.open("ctxtab")
+        return d.current_window_handle
+
+    outcomes = InteractionEngine(driver, "https://a.test/x", tabs=2, new_tab=new_tab).run([Target("#pop0")] * 3)
+    assert len(outcomes) == 3 and all(o.ok for o in outcomes)
+    assert urls == ["https://a.test/x"] * 3
+    assert sorted(driver.closed) == ["ctxtab1", "ctxtab2", "ctxtab3"]
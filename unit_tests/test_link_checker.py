@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from qa_common.link_checker import LinkChecker, normalize_links
+
+
+class Handler(BaseHTTPRequestHandler):
+    # /ok answers everything, /no-head refuses HEAD, /flaky fails its first
+    # request, /slow-once stalls on its first request, /slow always stalls,
+    # /moved redirects to /ok and /gone to /missing.
+    def do_HEAD(self):
+        self._answer()
+
+    def do_GET(self):
+        self._answer()
+
+    def _answer(self):
+        hits = self.server.hits
+        hits[(self.command, self.path)] += 1
+        first = hits[(self.command, self.path)] == 1
+        if self.path == "/no-head" and self.command == "HEAD":
+            return self._send(405)
+        if self.path == "/flaky" and first:
+            return self._send(503)
+        if self.path == "/slow" or (self.path == "/slow-once" and first):
+            time.sleep(1)
+        if self.path == "/moved":
+            return self._send(301, Location="/ok")
+        if self.path == "/gone":
+            return self._send(302, Location="/missing")
+        self._send(404 if self.path == "/missing" else 200)
+
+    def _send(self, status, **headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.hits = Counter()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", server.hits
+    server.shutdown()
+    server.server_close()
+
+
+def test_normalize_links_drops_fragments_and_other_schemes():
+    hrefs = ["https://a.test/x#top", "https://a.test/x", "mailto:me@a.test", "javascript:void(0)", None, "http://b.test/"]
+    assert normalize_links(hrefs) == ["https://a.test/x", "http://b.test/"]
+
+
+def test_head_refused_falls_back_to_get(site):
+    base, hits = site
+    [result] = LinkChecker(retries=0).check([f"{base}/no-head"])
+    assert result.ok and (result.method, result.status) == ("GET", 200)
+    assert hits[("HEAD", "/no-head")] == 1 and hits[("GET", "/no-head")] == 1
+
+
+def test_server_errors_are_retried(site):
+    base, hits = site
+    [result] = LinkChecker(retries=2).check([f"{base}/flaky"])
+    assert result.ok and result.status == 200
+    assert hits[("HEAD", "/flaky")] == 2
+
+
+def test_timeouts_are_retried(site):
+    base, hits = site
+    [result] = LinkChecker(timeout=0.3, retries=1).check([f"{base}/slow-once"])
+    assert result.ok
+    assert hits[("HEAD", "/slow-once")] == 2
+
+
+def test_timeout_on_every_attempt_is_reported(site):
+    base, hits = site
+    [result] = LinkChecker(timeout=0.3, retries=1).check([f"{base}/slow"])
+    assert not result.ok
+    assert result.status is None and result.error == "TimeoutError"
+    assert hits[("HEAD", "/slow")] == 2
+
+
+def test_redirects_are_followed(site):
+    base, _ = site
+    moved, gone = LinkChecker(retries=0).check([f"{base}/moved", f"{base}/gone"])
+    assert moved.ok and moved.status == 200
+    assert not gone.ok and gone.status == 404
+
+
+def test_checked_links_are_cached_in_process_and_on_disk(site, tmp_path):
+    base, hits = site
+    cache = str(tmp_path / "link_cache.json")
+    checker = LinkChecker(cache_path=cache)
+    checker.check([f"{base}/ok", f"{base}/ok#again"])
+    checker.check([f"{base}/ok"])
+    # Another worker of the same run reads the shared file instead of asking.
+    [result] = LinkChecker(cache_path=cache).check([f"{base}/ok"])
+    assert result.ok
+    assert hits[("HEAD", "/ok")] == 1
@@ -0,0 +1,102 @@
+from multi_context import DEVICES, ContextEngine
+
+
+class Switch:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.current_window_handle = handle
+
+
+class CdpDriver:
+    # Records DevTools commands and which tab each one was sent to.
+    def __init__(self):
+        self.current_window_handle = "home"
+        self.switch_to = Switch(self)
+        self.commands = []
+        self.targets = 0
+
+    def execute_cdp_cmd(self, cmd, params):
+        self.commands.append((self.current_window_handle, cmd, params))
+        if cmd == "Target.createBrowserContext":
+            return {"browserContextId": f"ctx{len(self.commands)}"}
+        if cmd == "Target.createTarget":
+            self.targets += 1
+            return {"targetId": f"tab{self.targets}"}
+        return {}
+
+    def sent(self, cmd):
+        return [(handle, params) for handle, name, params in self.commands if name == cmd]
+
+
+class Session:
+    def __init__(self, driver):
+        self.driver = driver
+
+
+class Pool:
+    def __init__(self):
+        self.acquired, self.released = [], []
+
+    def acquire(self, browser):
+        self.acquired.append(browser)
+        return Session(CdpDriver())
+
+    def release(self, session):
+        self.released.append(session)
+
+
+def test_every_device_is_opened_and_loaded_up_front():
+    pool = Pool()
+    engine = ContextEngine(pool)
+    driver = engine.activate("chrome", "iPhone X", "https://a.test/")
+    targets = [params for _, params in driver.sent("Target.createTarget")]
+    assert len(targets) == len(DEVICES) and all(t["url"] == "about:blank" for t in targets)
+    assert len({t["browserContextId"] for t in targets}) == len(DEVICES)
+    metrics = [(handle, params["width"]) for handle, params in driver.sent("Emulation.setDeviceMetricsOverride")]
+    assert metrics == [(f"tab{i}", device.width) for i, device in enumerate(DEVICES.values(), 1)]
+    # All tabs are emulated before any starts loading, so the loads overlap.
+    first_load = next(i for i, (_, cmd, _) in enumerate(driver.commands) if cmd == "Page.navigate")
+    assert all(cmd != "Emulation.setDeviceMetricsOverride" for _, cmd, _ in driver.commands[first_load:])
+    assert driver.sent("Page.navigate") == [(f"tab{i}", {"url": "https://a.test/"}) for i in range(1, len(DEVICES) + 1)]
+    assert driver.current_window_handle == f"tab{list(DEVICES).index('iPhone X') + 1}"
+
+
+def test_preloaded_tabs_are_used_once_then_navigated():
+    pool = Pool()
+    engine = ContextEngine(pool)
+    engine.activate("chrome", "Desktop", "https://a.test/")
+    driver = engine.activate("chrome", "Galaxy S20", "https://a.test/")
+    assert len(driver.sent("Page.navigate")) == len(DEVICES)
+    assert driver.current_window_handle == "tab3"
+    engine.activate("chrome", "Desktop", "https://a.test/again")
+    assert pool.acquired == ["chrome"]
+    assert len(driver.sent("Target.createTarget")) == len(DEVICES)
+    assert driver.sent("Page.navigate")[-1] == ("tab1", {"url": "https://a.test/again"})
+    engine.close()
+    assert [params["targetId"] for _, params in driver.sent("Target.closeTarget")] == ["tab1", "tab2", "tab3"]
+    assert len(driver.sent("Target.disposeBrowserContext")) == len(DEVICES)
+    assert len(pool.released) == 1
+
+
+def test_tabs_mode_shares_the_default_context():
+    engine = ContextEngine(Pool(), mode="tabs")
+    engine.activate("edge", "Desktop", "https://a.test/")
+    driver = engine.activate("edge", "iPhone X", "https://a.test/")
+    assert driver.sent("Target.createBrowserContext") == []
+    assert all("browserContextId" not in params for _, params in driver.sent("Target.createTarget"))
+
+
+def test_click_tabs_open_in_the_device_context_with_its_emulation():
+    engine = ContextEngine(Pool())
+    driver = engine.activate("chrome", "Galaxy S20", "https://a.test/")
+    context = engine.browsers["chrome"].contexts["Galaxy S20"]
+    new_tab = engine.tab_opener("chrome", "Galaxy S20")
+    assert new_tab(driver, "https://a.test/") == "tab4"
+    assert driver.current_window_handle == "tab4"
+    _, target = driver.sent("Target.createTarget")[-1]
+    assert target["browserContextId"] == context
+    handle, metrics = driver.sent("Emulation.setDeviceMetricsOverride")[-1]
+    assert handle == "tab4" and metrics["width"] == DEVICES["Galaxy S20"].width
+    assert driver.sent("Page.navigate")[-1] == ("tab4", {"url": "https://a.test/"})
@@ -0,0 +1,245 @@
+import asyncio
+import io
+import json
+import socketserver
+import threading
+import time
+
+import pytest
+from aiohttp import web
+from PIL import Image
+
+import notify
+
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    # Just enough SMTP for smtplib: the first `refuse` MAIL commands get a
+    # temporary failure, and an accepted message is acknowledged `stall`
+    # seconds after its DATA ends.
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        self.reply("220 stub ESMTP")
+        for raw in self.rfile:
+            command = raw.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250-stub")
+                self.reply("250 8BITMIME")
+            elif command.startswith("MAIL"):
+                server.mail_commands += 1
+                if server.refuse:
+                    server.refuse -= 1
+                    self.reply("451 try again later")
+                else:
+                    self.reply("250 ok")
+            elif command.startswith("DATA"):
+                self.reply("354 go ahead")
+                lines = []
+                for line in self.rfile:
+                    if line == b".\r\n":
+                        break
+                    lines.append(line)
+                time.sleep(server.stall)
+                server.messages.append(b"".join(lines))
+                self.reply("250 queued")
+            elif command.startswith("QUIT"):
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+@pytest.fixture
+def smtp():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SmtpHandler)
+    server.daemon_threads = True
+    server.refuse, server.stall, server.mail_commands, server.messages = 0, 0, 0, []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class SlackStub:
+    # Slack's Web API methods used by the notifier plus the upload URLs it
+    # hands out. `failures[method]` lists the HTTP status or Slack error of
+    # each failing call before the calls succeed again.
+    def __init__(self):
+        self.calls = {}
+        self.failures = {}
+        self.delay = 0
+        self.base = None
+
+    def app(self):
+        # An aiohttp application is bound to one event loop, so each run gets its own.
+        app = web.Application()
+        app.router.add_post("/api/{method}", self.api)
+        app.router.add_post("/upload/{file}", self.upload)
+        return app
+
+    def record(self, name, body):
+        self.calls.setdefault(name, []).append(body)
+        failures = self.failures.get(name)
+        return failures.pop(0) if failures else None
+
+    async def api(self, request):
+        method = request.match_info["method"]
+        body = await request.json() if request.content_type == "application/json" else dict(await request.post())
+        failure = self.record(method, body)
+        await asyncio.sleep(self.delay)
+        if isinstance(failure, int):
+            return web.Response(status=failure)
+        if failure:
+            return web.json_response({"ok": False, "error": failure})
+        if method == "chat.postMessage":
+            return web.json_response({"ok": True, "channel": "C1", "ts": "1700000000.1"})
+        if method == "files.getUploadURLExternal":
+            file_id = f"F{len(self.calls[method])}"
+            return web.json_response({"ok": True, "file_id": file_id, "upload_url": f"{self.base}/upload/{file_id}"})
+        return web.json_response({"ok": True})
+
+    async def upload(self, request):
+        failure = self.record(f"upload/{request.match_info['file']}", await request.read())
+        return web.Response(status=failure or 200)
+
+    def count(self, name):
+        return len(self.calls.get(name, []))
+
+
+@pytest.fixture
+def slack():
+    return SlackStub()
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch, smtp, tmp_path):
+    monkeypatch.setattr(notify, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(notify, "SMTP_PORT", smtp.server_address[1])
+    monkeypatch.setattr(notify, "SMTP_STARTTLS", False)
+    monkeypatch.setattr(notify, "GMAIL_USER", "qa@example.test")
+    monkeypatch.setattr(notify, "GMAIL_APP_PASSWORD", None)
+    monkeypatch.setattr(notify, "EMAIL_TO", "team@example.test")
+    monkeypatch.setattr(notify, "SLACK_TOKEN", "xoxb-test")
+    monkeypatch.setattr(notify, "SLACK_CHANNEL", "#qa")
+    monkeypatch.setattr(notify, "BACKOFF", 0)
+    monkeypatch.chdir(tmp_path)
+
+
+def summary(failed=("tests/test_site.py::test_site[chrome]",)):
+    return notify.Summary({"passed": 3, "failed": len(failed)}, list(failed), [("test_a", 1.5)],
+                          [("home_diff.jpg", b"jpeg")], b"report", "test-report.html.gz")
+
+
+def run(slack, results, **kwargs):
+    async def scenario():
+        runner = web.AppRunner(slack.app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        slack.base = f"http://127.0.0.1:{runner.addresses[0][1]}"
+        notify.SLACK_BASE_URL = f"{slack.base}/api/"
+        try:
+            return await notify.notify(results, **kwargs)
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(scenario())
+
+
+def test_both_channels_are_sent_at_once(smtp, slack):
+    # Email takes 1s and Slack's three round trips 0.9s: 1.9s one after the other.
+    smtp.stall, slack.delay = 1.0, 0.3
+    started = time.perf_counter()
+    assert run(slack, summary()) == {"Email": True, "Slack": True}
+    assert time.perf_counter() - started < 1.6
+    assert len(smtp.messages) == 1 and b"test_site[chrome]" in smtp.messages[0]
+    assert slack.count("chat.postMessage") == 1
+    assert slack.count("files.getUploadURLExternal") == 2
+    [complete] = slack.calls["files.completeUploadExternal"]
+    assert complete["channel_id"] == "C1" and complete["thread_ts"] == "1700000000.1"
+    assert {f["title"] for f in complete["files"]} == {"home_diff.jpg", "test-report.html.gz"}
+
+
+def test_a_failing_channel_does_not_hold_back_the_other(smtp, slack):
+    slack.failures["chat.postMessage"] = ["channel_not_found"] * 3
+    assert run(slack, summary()) == {"Email": True, "Slack": False}
+    assert slack.count("chat.postMessage") == 1
+    assert len(smtp.messages) == 1
+    with open(notify.STATE_PATH, encoding="utf-8") as f:
+        assert list(json.load(f)) == ["Email"]
+
+
+def test_failed_uploads_are_retried_without_reposting(slack):
+    slack.failures["upload/F1"] = [500]
+    slack.failures["files.getUploadURLExternal"] = [502]
+    assert run(slack, summary())["Slack"]
+    assert slack.count("chat.postMessage") == 1
+    assert slack.count("files.completeUploadExternal") == 1
+    assert slack.count("files.getUploadURLExternal") == 3
+
+
+def test_a_post_is_only_retried_when_slack_turned_it_away(slack):
+    slack.failures["chat.postMessage"] = [429, "ratelimited"]
+    assert run(slack, summary())["Slack"]
+    assert slack.count("chat.postMessage") == 3
+
+    slack.calls.clear()
+    # A server error may come after the message was posted.
+    slack.failures["chat.postMessage"] = [500]
+    assert not run(slack, summary(), force=True)["Slack"]
+    assert slack.count("chat.postMessage") == 1 and "files.getUploadURLExternal" not in slack.calls
+
+
+def test_a_refused_email_is_sent_again(smtp, slack):
+    smtp.refuse = 1
+    assert run(slack, summary())["Email"]
+    assert smtp.mail_commands == 2 and len(smtp.messages) == 1
+
+
+def test_a_timed_out_email_is_not_sent_again(smtp, slack):
+    smtp.stall = 1.0
+    assert not run(slack, summary(), timeout=0.3)["Email"]
+    # The abandoned send still completes; a retry would have sent it twice.
+    time.sleep(1.0)
+    assert smtp.mail_commands == 1 and len(smtp.messages) == 1
+
+
+def test_unchanged_results_are_not_sent_again(smtp, slack):
+    assert run(slack, summary()) == {"Email": True, "Slack": True}
+    assert run(slack, summary()) == {}
+    assert len(smtp.messages) == 1 and slack.count("chat.postMessage") == 1
+
+    assert run(slack, summary(), force=True) == {"Email": True, "Slack": True}
+    assert run(slack, summary(failed=())) == {"Email": True, "Slack": True}
+    assert len(smtp.messages) == 3 and slack.count("chat.postMessage") == 3
+
+
+def write_png(path, colour):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new("RGB", (480, 240), colour).save(path)
+
+
+def test_summary_takes_the_diffs_of_its_own_run(tmp_path):
+    # The visual suite's layout: screenshots/<run>/{baseline,current,failed}/.
+    screenshots = tmp_path / "visual-test" / "screenshots"
+    write_png(screenshots / "run-2" / "failed" / "home_diff.png", "red")
+    write_png(screenshots / "run-2" / "failed" / "home.png", "red")
+    write_png(screenshots / "run-2" / "current" / "about_diff.png", "red")
+    # An older run's diff written later must not leak into this one.
+    write_png(screenshots / "run-1" / "failed" / "old_diff.png", "red")
+    results = [tmp_path / "functional.xml", tmp_path / "visual.xml"]
+    results[0].write_text('<testsuites><testsuite time="3"><testcase classname="t" name="a" time="1"/>'
+                          '</testsuite></testsuites>')
+    results[1].write_text('<testsuite time="9"><testcase classname="v" name="home" time="8">'
+                          '<failure/></testcase></testsuite>')
+
+    built = notify.build_summary(results, str(tmp_path / "missing.html"), str(screenshots), "run-2")
+    assert built.counts == {"passed": 1, "failed": 1}
+    assert built.failed == ["v::home"] and built.slowest[0] == ("v::home", 8.0)
+    [(name, data)] = built.thumbnails
+    assert name == "home_diff.jpg"
+    with Image.open(io.BytesIO(data)) as img:
+        assert img.size == (notify.THUMB_WIDTH, 120)
+    assert notify.build_summary(results, "missing.html", str(screenshots), None).thumbnails == []
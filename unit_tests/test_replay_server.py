@@ -0,0 +1,113 @@
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from qa_common.replay_server import EXTERNAL_PREFIX, MirrorServer
+
+
+class Upstream(BaseHTTPRequestHandler):
+    # Serves `server.pages` ({path: (content type, body)}) and counts hits.
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.hits.append(self.path)
+        page = self.server.pages.get(self.path)
+        if page is None:
+            self.send_error(404)
+            return
+        content_type, body = page
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(host, pages):
+    server = ThreadingHTTPServer((host, 0), Upstream)
+    server.daemon_threads = True
+    server.pages, server.hits = pages, []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as resp:
+            return resp.status, resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, b""
+
+
+@pytest.fixture
+def sites():
+    # The site under test plus an http-only third party on another address.
+    third_party = serve("127.0.0.2", {"/app.js": ("text/javascript", b"console.log('app')"),
+                                      "/data.json": ("application/json", b'{"rows": 3}')})
+    cdn = f"127.0.0.2:{third_party.server_port}"
+    origin = serve("127.0.0.1", {
+        "/": ("text/html", f'<script src="http://{cdn}/app.js"></script>'
+                           f'<svg xmlns="http://www.w3.org/2000/svg"></svg>'.encode()),
+        "/api": ("application/json", f'{{"next": "http:\\/\\/{cdn}\\/data.json"}}'.encode()),
+    })
+    yield f"http://127.0.0.1:{origin.server_port}/", cdn, origin, third_party
+    for server in (origin, third_party):
+        server.shutdown()
+        server.server_close()
+
+
+def test_recorded_pages_replay_without_the_network(sites, tmp_path):
+    url, cdn, origin, third_party = sites
+    mirror = MirrorServer(url, str(tmp_path), record=True)
+    local = f"http://{mirror.host}"
+    external = f"{local}{EXTERNAL_PREFIX}http/{cdn}"
+    try:
+        status, page = get(mirror.url_for(url))
+        assert status == 200
+        # The http-only third party keeps its scheme; namespace URIs are left alone.
+        assert f'src="{external}/app.js"'.encode() in page
+        assert b'xmlns="http://www.w3.org/2000/svg"' in page
+        _, api = get(f"{local}/api")
+        # JSON-escaped URLs are rewritten and stay escaped.
+        assert api == f'{{"next": "{external}/data.json"}}'.replace("/", "\\/").encode()
+        assert get(f"{external}/app.js") == (200, b"console.log('app')")
+        assert get(f"{external}/data.json") == (200, b'{"rows": 3}')
+    finally:
+        assert mirror.close() == []
+    assert origin.hits == ["/", "/api"] and third_party.hits == ["/app.js", "/data.json"]
+
+    for server in (origin, third_party):
+        server.shutdown()
+    replay = MirrorServer(url, str(tmp_path))
+    local = f"http://{replay.host}"
+    external = f"{local}{EXTERNAL_PREFIX}http/{cdn}"
+    try:
+        status, page = get(replay.url_for(url))
+        assert status == 200 and f'src="{external}/app.js"'.encode() in page
+        assert get(f"{external}/data.json") == (200, b'{"rows": 3}')
+        assert get(f"{local}/missing")[0] == 404
+    finally:
+        assert replay.close() == [f"{url}missing"]
+    assert len(origin.hits) == 2 and len(third_party.hits) == 2
+
+
+def test_replay_needs_a_recording(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        MirrorServer("https://example.test/", str(tmp_path))
+
+
+def test_external_paths_keep_their_scheme(tmp_path, sites):
+    url = sites[0]
+    mirror = MirrorServer(url, str(tmp_path), record=True)
+    try:
+        assert mirror.upstream_url(f"{EXTERNAL_PREFIX}http/cdn.example.test/a.js") == "http://cdn.example.test/a.js"
+        assert mirror.upstream_url(f"{EXTERNAL_PREFIX}https/cdn.example.test/") == "https://cdn.example.test/"
+        # Protocol-relative URLs take the site's own scheme.
+        local = mirror.rewrite([("Content-Type", "text/css")], b"url(//fonts.example.test/a.woff2)", mirror.host)
+        assert local == f"url(http://{mirror.host}{EXTERNAL_PREFIX}http/fonts.example.test/a.woff2)".encode()
+    finally:
+        mirror.close()
@@ -0,0 +1,160 @@
+import io
+import json
+import os
+import socket
+import time
+
+import pytest
+from PIL import Image
+
+import report_writer
+import retention
+from retention import compact, has_failures, is_active, mark_active, plan_runs
+
+RUNS = [f"2026-01-0{day}_00-00-00" for day in range(1, 6)]
+
+
+def png(colour, size=(64, 64)):
+    buf = io.BytesIO()
+    # Uncompressed, so --recompress has something to save.
+    Image.new("RGB", size, colour).save(buf, "PNG", compress_level=0)
+    return buf.getvalue()
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+@pytest.fixture
+def root(tmp_path):
+    # Five runs, oldest first: the first had a visual failure, the third is
+    # still being written by this process. The store has one live baseline
+    # (copied into every run) and one the manifest no longer points at.
+    root = str(tmp_path)
+    live, dead = png("red"), png("blue")
+    store = os.path.join(root, retention.STORE_DIR)
+    write(os.path.join(store, "objects", "live.png"), live)
+    write(os.path.join(store, "objects", "dead.png"), dead)
+    write(os.path.join(store, "objects", "dead.tiles64.npy"), b"tiles")
+    write(os.path.join(store, retention.MANIFEST), json.dumps(
+        {"entries": {"home": {"hash": "live", "path": "objects/live.png"}}}).encode())
+    for run in RUNS:
+        write(os.path.join(root, run, "baseline", "home.png"), live)
+    write(os.path.join(root, RUNS[0], "failed", "home_diff.png"), png("white"))
+    write(os.path.join(root, RUNS[4], "current", "home.png"), png("green"))
+    mark_active(os.path.join(root, RUNS[2]))
+    os.makedirs(os.path.join(root, "viewer"))
+    return root
+
+
+def snapshot(root):
+    return sorted((path, os.stat(path).st_ino, os.path.getsize(path))
+                  for path in retention._files(root, ("",)))
+
+
+def test_recent_failed_and_active_runs_are_kept(root):
+    kept, removed = plan_runs(root, keep_last=2)
+    assert kept == [(RUNS[0], "failed"), (RUNS[2], "active"), (RUNS[3], "recent"), (RUNS[4], "recent")]
+    assert removed == [RUNS[1]]
+
+    kept, removed = plan_runs(root, keep_last=2, keep_failed=False)
+    assert removed == [RUNS[0], RUNS[1]]
+
+
+def test_keep_last_zero_keeps_only_protected_runs(root):
+    kept, removed = plan_runs(root, keep_last=0)
+    assert [run for run, _ in kept] == [RUNS[0], RUNS[2]]
+
+
+def test_failures_recorded_in_shard_results_count(root):
+    run_dir = os.path.join(root, RUNS[1])
+    assert not has_failures(run_dir)
+    write(os.path.join(run_dir, retention.RESULTS_DIR, "gw0.json"),
+          json.dumps({"tests": [{"nodeid": "t", "outcome": "error"}]}).encode())
+    assert has_failures(run_dir)
+
+
+def test_markers_of_finished_or_stale_sessions_are_ignored(tmp_path):
+    run_dir = str(tmp_path)
+    marker = os.path.join(run_dir, f"{retention.ACTIVE_PREFIX}x")
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump({"host": socket.gethostname(), "pid": 2 ** 22 + 1}, f)
+    assert not is_active(run_dir)
+
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump({"host": "another-machine", "pid": 1}, f)
+    assert is_active(run_dir)
+    old = time.time() - (retention.STALE_HOURS + 1) * 3600
+    os.utime(marker, (old, old))
+    assert not is_active(run_dir)
+
+
+def test_a_long_session_on_this_machine_stays_active(tmp_path):
+    run_dir = str(tmp_path)
+    marker = mark_active(run_dir)
+    old = time.time() - (retention.STALE_HOURS + 1) * 3600
+    os.utime(marker, (old, old))
+    assert is_active(run_dir)
+
+
+def test_failed_writes_leave_no_temp_files(tmp_path, monkeypatch):
+    path = write(str(tmp_path / "current" / "home.png"), png("green"))
+
+    def refuse(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", refuse)
+    with pytest.raises(OSError):
+        retention.recompress(path)
+    assert os.listdir(tmp_path / "current") == ["home.png"]
+
+    thumbs = tmp_path / "thumbs"
+    thumbs.mkdir()
+    class Unencodable:
+        def save(self, f, *args, **kwargs):
+            f.write(b"RIFF")
+            raise OSError("encoder error")
+
+    monkeypatch.setattr(report_writer, "fit_width", lambda img, width: Unencodable())
+    with pytest.raises(OSError, match="encoder"):
+        report_writer.make_thumbnail(path, str(thumbs / "home.webp"))
+    assert os.listdir(thumbs) == []
+
+
+def test_dry_run_changes_nothing(root, capsys):
+    before = snapshot(root)
+    compact(root, keep_last=2, recompress_frames=True, dry_run=True)
+    assert snapshot(root) == before
+    out = capsys.readouterr().out
+    assert "Would remove 1 run(s)" in out and "Hard-linked" in out
+
+
+def test_compact_prunes_links_and_recompresses(root):
+    # Without the active session the store is collected too.
+    retention.clear_active(os.path.join(root, RUNS[2]))
+    store = os.path.join(root, retention.STORE_DIR, "objects")
+    current = os.path.join(root, RUNS[4], "current", "home.png")
+    size = os.path.getsize(current)
+    compact(root, keep_last=2, recompress_frames=True)
+
+    assert sorted(os.listdir(root)) == sorted([RUNS[0], RUNS[3], RUNS[4], retention.STORE_DIR, "viewer"])
+    assert os.listdir(store) == ["live.png"]
+    inode = os.stat(os.path.join(store, "live.png")).st_ino
+    assert all(os.stat(os.path.join(root, run, "baseline", "home.png")).st_ino == inode
+               for run in (RUNS[0], RUNS[3], RUNS[4]))
+    assert os.path.getsize(current) < size
+    with Image.open(current) as img:
+        assert img.getpixel((0, 0)) == (0, 128, 0)
+
+
+def test_an_active_session_protects_the_store(root):
+    compact(root, keep_last=2)
+    objects = os.listdir(os.path.join(root, retention.STORE_DIR, "objects"))
+    assert "dead.png" in objects
+    assert os.path.isdir(os.path.join(root, RUNS[2]))
+    # The active run's files are not relinked either.
+    store_inode = os.stat(os.path.join(root, retention.STORE_DIR, "objects", "live.png")).st_ino
+    assert os.stat(os.path.join(root, RUNS[2], "baseline", "home.png")).st_ino != store_inode
@@ -0,0 +1,114 @@
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+from PIL import Image, ImageSequence
+
+from scroll_animation import LETTERBOX, AnimationStream, ScrollAnimationWriter, fit_width
+
+
+def solid(width, height, colour):
+    return np.full((height, width, 3), colour, dtype=np.uint8)
+
+
+def frames_of(path):
+    with Image.open(path) as img:
+        return [frame.convert("RGB") for frame in ImageSequence.Iterator(img)]
+
+
+def close_to(pixel, colour, tolerance=8):
+    return all(abs(a - b) <= tolerance for a, b in zip(pixel, colour))
+
+
+@pytest.mark.parametrize("fmt", ["gif", "webp"])
+def test_every_frame_is_written_at_the_report_width(tmp_path, fmt):
+    path = tmp_path / f"scroll.{fmt}"
+    with ScrollAnimationWriter(str(path), width=100) as animation:
+        for colour in [(255, 0, 0), (0, 255, 0), (0, 0, 255)]:
+            animation.append(solid(400, 300, colour))
+    frames = frames_of(path)
+    assert animation.frames == 3 and len(frames) == 3
+    assert {frame.size for frame in frames} == {(100, 75)}
+    assert close_to(frames[2].getpixel((50, 37)), (0, 0, 255))
+
+
+def test_gif_frames_are_written_as_they_arrive(tmp_path):
+    path = tmp_path / "scroll.gif"
+    animation = ScrollAnimationWriter(str(path), width=100)
+    animation.append(solid(100, 50, (255, 255, 255)))
+    assert path.exists() and animation._webp_frames == []
+    animation.close()
+    assert len(frames_of(path)) == 1
+
+
+def test_shorter_frames_are_letterboxed_not_stretched(tmp_path):
+    path = tmp_path / "scroll.gif"
+    with ScrollAnimationWriter(str(path), width=100) as animation:
+        animation.append(solid(100, 80, (255, 0, 0)))
+        # A short last tile: 100x20 on the 100x80 canvas, centred.
+        animation.append(solid(100, 20, (0, 0, 255)))
+    first, last = frames_of(path)
+    assert last.size == (100, 80)
+    assert close_to(last.getpixel((50, 40)), (0, 0, 255))
+    assert close_to(last.getpixel((50, 5)), LETTERBOX) and close_to(last.getpixel((50, 75)), LETTERBOX)
+
+
+def test_taller_frames_keep_their_aspect_ratio(tmp_path):
+    writer = ScrollAnimationWriter(str(tmp_path / "scroll.webp"), width=100)
+    writer._fit(solid(100, 50, (255, 0, 0)))
+    tall = writer._fit(solid(100, 100, (0, 255, 0)))
+    assert tall.size == (100, 50)
+    # Shrunk to 50x50 and centred, with bars left and right.
+    assert tall.getpixel((50, 25)) == (0, 255, 0)
+    assert tall.getpixel((10, 25)) == LETTERBOX and tall.getpixel((90, 25)) == LETTERBOX
+
+
+def test_fit_width_only_downscales():
+    assert fit_width(solid(80, 40, (0, 0, 0)), 100).size == (80, 40)
+    assert fit_width(solid(200, 40, (0, 0, 0)), 100).size == (100, 20)
+
+
+class Frames:
+    # Records what a writer is handed, in order.
+    def __init__(self):
+        self.appended = []
+        self.closed = False
+
+    def append(self, frame):
+        self.appended.append(frame)
+
+    def close(self):
+        self.closed = True
+
+
+def test_stream_writes_frames_in_order_as_soon_as_they_can_be():
+    writer = Frames()
+    stream = AnimationStream(writer)
+    futures = [Future() for _ in range(4)]
+    for future in futures:
+        stream.add(future)
+    futures[1].set_result("b")
+    futures[3].set_result("d")
+    assert writer.appended == [] and sorted(stream.ready) == [1, 3]
+    futures[0].set_result("a")
+    # Written up to the gap, and the frames no longer held.
+    assert writer.appended == ["a", "b"] and sorted(stream.ready) == [3]
+    futures[2].set_exception(RuntimeError("job failed"))
+    assert writer.appended == ["a", "b", "d"] and stream.ready == {}
+    stream.finish()
+    assert writer.closed
+
+
+def test_stream_finish_waits_for_frames_in_flight(tmp_path):
+    path = tmp_path / "scroll.gif"
+    stream = AnimationStream(ScrollAnimationWriter(str(path), width=100))
+    late = Future()
+    stream.add(late)
+    done = Future()
+    done.set_result(solid(200, 100, (255, 0, 0)))
+    stream.add(done)
+    threading.Timer(0.1, late.set_result, [solid(200, 100, (0, 0, 255))]).start()
+    stream.finish()
+    frames = frames_of(path)
+    assert len(frames) == 2 and close_to(frames[0].getpixel((50, 25)), (0, 0, 255))
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from shards import MANIFEST, RESULTS_DIR, STORE_DIR, ResultsRecorder, assign_shards, merge, parse_shard
+
+
+def test_shard_spec_is_validated():
+    assert parse_shard("2/4") == (2, 4)
+    for bad in ("0/4", "5/4", "two/4", "1"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_shard(bad)
+
+
+def test_tests_are_split_longest_first_and_the_same_way_everywhere():
+    durations = {"t::a": 9, "t::b": 7, "t::c": 5, "t::d": 4, "t::e": 3, "t::f": 2, "t::g": 2}
+    shards = assign_shards(durations, 3, durations.get)
+    assert set(shards) == set(durations) and set(shards.values()) == {1, 2, 3}
+    loads = {s: sum(d for t, d in durations.items() if shards[t] == s) for s in (1, 2, 3)}
+    assert loads == {1: 11, 2: 10, 3: 11}
+    # Collection order doesn't matter, so every machine agrees on the split.
+    assert assign_shards(list(reversed(list(durations))), 3, durations.get) == shards
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w" if isinstance(data, str) else "wb") as f:
+        f.write(data)
+
+
+def shard_tree(root, run, shard, tests, entries, failed=()):
+    write(os.path.join(root, STORE_DIR, MANIFEST), json.dumps({"version": 1, "entries": entries}))
+    for entry in entries.values():
+        write(os.path.join(root, STORE_DIR, entry["path"]), entry["hash"].encode())
+    for name in failed:
+        write(os.path.join(root, run, "failed", name), b"png")
+    write(os.path.join(root, run, RESULTS_DIR, f"{shard}.json"),
+          json.dumps({"run": run, "shard": shard, "tests": tests}))
+    return root
+
+
+def entry(digest, run):
+    return {"hash": digest, "path": f"objects/{digest}.png", "run": run}
+
+
+def test_shard_outputs_merge_into_one_tree_and_report(tmp_path):
+    run = "2026-01-01_00-00-00"
+    one = shard_tree(str(tmp_path / "one"), run, "shard-1-of-2",
+                     [{"nodeid": "t::a", "outcome": "passed", "duration": 1.0, "longrepr": ""}],
+                     {"hero": entry("h1", "2026-01-01"), "only_one": entry("o1", "2026-01-01")})
+    two = shard_tree(str(tmp_path / "two"), run, "shard-2-of-2",
+                     [{"nodeid": "t::b", "outcome": "failed", "duration": 2.0, "longrepr": "<boom>"}],
+                     {"hero": entry("h2", "2026-01-02")}, failed=["hero_diff.png"])
+    output = str(tmp_path / "merged")
+    report = merge([one, two], output)
+
+    with open(os.path.join(output, STORE_DIR, MANIFEST), encoding="utf-8") as f:
+        entries = json.load(f)["entries"]
+    # The latest run's baseline wins a name both shards saved.
+    assert entries["hero"]["hash"] == "h2" and entries["only_one"]["hash"] == "o1"
+    assert sorted(os.listdir(os.path.join(output, STORE_DIR, "objects"))) == ["h1.png", "h2.png", "o1.png"]
+    assert sorted(os.listdir(os.path.join(output, run, RESULTS_DIR))) == ["shard-1-of-2.json", "shard-2-of-2.json"]
+
+    with open(report, encoding="utf-8") as f:
+        page = f.read()
+    assert "2 shard result file(s): 1 failed, 1 passed" in page
+    assert "&lt;boom&gt;" in page and f"{run}/failed/hero_diff.png" in page
+
+
+def test_merging_again_keeps_the_merged_manifest(tmp_path):
+    run = "2026-01-01_00-00-00"
+    one = shard_tree(str(tmp_path / "one"), run, "shard-1-of-1", [], {"hero": entry("h1", "2026-01-01")})
+    output = str(tmp_path / "merged")
+    merge([one], output)
+    newer = shard_tree(str(tmp_path / "newer"), "2026-01-03_00-00-00", "shard-1-of-1", [],
+                       {"footer": entry("f1", "2026-01-03")})
+    merge([newer], output)
+    with open(os.path.join(output, STORE_DIR, MANIFEST), encoding="utf-8") as f:
+        assert sorted(json.load(f)["entries"]) == ["footer", "hero"]
+
+
+def phase(nodeid, when, outcome="passed", duration=1.0, longrepr=""):
+    return SimpleNamespace(nodeid=nodeid, when=when, duration=duration, longrepr=longrepr,
+                           failed=outcome == "failed", skipped=outcome == "skipped")
+
+
+def test_test_outcomes_fold_every_phase():
+    recorder = ResultsRecorder()
+    for report in (phase("t::ok", "setup"), phase("t::ok", "call"), phase("t::ok", "teardown"),
+                   phase("t::skip", "setup", "skipped"),
+                   phase("t::fail", "call", "failed", longrepr="assert 1 == 2"), phase("t::fail", "teardown"),
+                   phase("t::error", "call", "skipped"), phase("t::error", "teardown", "failed", longrepr="boom")):
+        recorder.pytest_runtest_logreport(report)
+    tests = recorder.tests
+    assert {nodeid: test["outcome"] for nodeid, test in tests.items()} == {
+        "t::ok": "passed", "t::skip": "skipped", "t::fail": "failed", "t::error": "error"}
+    assert tests["t::ok"]["duration"] == 3.0 and tests["t::fail"]["longrepr"] == "assert 1 == 2"
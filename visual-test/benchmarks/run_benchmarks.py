@@ -0,0 +1,363 @@
+# Benchmarks for the harness's own hot paths, run offline against the static
+# site in benchmarks/site/ and synthetic screenshots:
+#
+#   python benchmarks/run_benchmarks.py --headless
+#
+# Every run is appended to .benchmark_history.json. A benchmark whose median
+# is more than its threshold slower than the recent median on this machine,
+# by more than the run-to-run noise, is reported as a regression and the
+# command exits non-zero.
+import argparse
+import functools
+import http.server
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SITE_DIR = os.path.join(HERE, "site")
+sys.path.insert(0, os.path.join(HERE, "..", "tests"))
+sys.path.insert(0, os.path.join(HERE, "..", ".."))
+
+import numpy as np  # noqa: E402
+
+from baseline_cache import MAX_CACHE_MB  # noqa: E402
+from baseline_store import BaselineStore  # noqa: E402
+from compare_pipeline import ComparisonPipeline, _init_worker, screenshot_job  # noqa: E402
+from qa_common.dom_audit import collect_audit  # noqa: E402
+from full_page import full_page_tiles  # noqa: E402
+from image_compare import CHANNEL_THRESHOLD, MAX_CHANGED_RATIO, encode_png  # noqa: E402
+from qa_common.interactions import InteractionEngine  # noqa: E402
+from qa_common.link_checker import LinkChecker  # noqa: E402
+from qa_common.readiness import wait_for_page_ready  # noqa: E402
+from scroll_animation import REPORT_WIDTH, ScrollAnimationWriter  # noqa: E402
+
+HISTORY_FILE = ".benchmark_history.json"
+REPEAT = 5
+# Runs on the same machine a new result is compared against.
+WINDOW = 5
+THRESHOLD = 0.25
+# Anything that waits on a real browser is noisier than pure CPU work.
+BROWSER_THRESHOLD = 0.5
+# Overrides by benchmark name, with or without its [..] suffix.
+BENCHMARK_THRESHOLDS = {"driver_startup": 1.0}
+# A slowdown must also exceed this many milliseconds and this many times the
+# median absolute deviation of the recent runs, so sub-millisecond timings
+# and noisy benchmarks don't fail on jitter.
+MIN_DELTA_MS = 1.0
+MAD_FACTOR = 3
+# Fewer samples in this run, or fewer previous runs, are not compared at all.
+MIN_SAMPLES = 3
+MIN_HISTORY = 3
+FRAMES = 10
+STORE_ENTRIES = 300
+LINKS = 40
+THRESHOLDS = {"channel_threshold": CHANNEL_THRESHOLD, "max_changed_ratio": MAX_CHANGED_RATIO}
+
+
+@dataclass
+class Result:
+    median_ms: float
+    p95_ms: float
+    per_second: float
+    samples: int
+    browser: bool = False
+
+
+def synthetic_page(width, height, seed=0):
+    # Banded background with fine detail, roughly as compressible as a real capture.
+    rng = np.random.default_rng(seed)
+    page = np.repeat(rng.integers(0, 255, (height // 40 + 1, 1, 3), dtype=np.uint8), 40, axis=0)[:height]
+    page = np.repeat(page, width, axis=1)
+    page[::9, ::7] = 255
+    page[4::23, 3::5] = rng.integers(0, 255, page[4::23, 3::5].shape, dtype=np.uint8)
+    return page
+
+
+def changed(page):
+    out = page.copy()
+    h = out.shape[0]
+    out[h // 3:h // 3 + 40, 20:220] = (255, 0, 0)
+    return out
+
+
+class Runner:
+    def __init__(self, repeat=REPEAT):
+        self.repeat = repeat
+        self.results = {}
+
+    def measure(self, name, fn, repeat=None, items=1, warmup=1, browser=False):
+        for _ in range(warmup):
+            fn()
+        samples = []
+        for _ in range(repeat or self.repeat):
+            started = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - started)
+        samples.sort()
+        median = statistics.median(samples)
+        p95 = samples[min(len(samples) - 1, round(0.95 * (len(samples) - 1)))]
+        self.results[name] = Result(round(median * 1000, 3), round(p95 * 1000, 3),
+                                    round(items / median, 2) if median else 0.0, len(samples), browser)
+        print(f"⏱️ {name:<32} {median * 1000:10.1f} ms   p95 {p95 * 1000:10.1f} ms   {items / median:8.1f}/s")
+
+
+def bench_compare(runner, viewports, workdir):
+    # One screenshot_job per viewport size, as a pool worker runs it: decode
+    # the capture, tile-hash it against the baseline and, when it differs,
+    # write the capture and the diff. Baselines come from the decoded cache.
+    store = BaselineStore(os.path.join(workdir, "screenshots"))
+    _init_worker(store.decoded.directory, MAX_CACHE_MB * 1024 * 1024)
+    out = os.path.join(workdir, "out")
+    os.makedirs(out, exist_ok=True)
+    captures = {}
+    for label, (width, height) in viewports.items():
+        name = f"bench_{label.replace(' ', '_')}"
+        page = synthetic_page(width, height)
+        store.put(name, encode_png(page))
+        ref = store.ref(name)
+        # The tile index a test run's first comparison would have written.
+        screenshot_job(None, page, None, None, THRESHOLDS, None, ref.tiles_path)
+        same, diff = encode_png(page), encode_png(changed(page))
+        captures[label] = (ref, same, diff)
+        paths = (os.path.join(out, f"{name}.png"), os.path.join(out, f"{name}_diff.png"))
+        runner.measure(f"compare_identical[{label}]",
+                       functools.partial(screenshot_job, ref, same, *paths, THRESHOLDS, REPORT_WIDTH))
+        runner.measure(f"compare_changed[{label}]",
+                       functools.partial(screenshot_job, ref, diff, *paths, THRESHOLDS, REPORT_WIDTH))
+
+    # The whole pipeline, as a test drives it: a scroll run's worth of
+    # captures queued at once, then collected.
+    ref, same, diff = captures["Desktop"]
+    pipeline = ComparisonPipeline(cache_dir=store.decoded.directory, cache_bytes=MAX_CACHE_MB * 1024 * 1024)
+
+    def throughput():
+        for i in range(FRAMES):
+            pipeline.submit("bench", f"frame_{i}", ref, diff if i % 3 == 0 else same,
+                            os.path.join(out, f"frame_{i}.png"), os.path.join(out, f"frame_{i}_diff.png"),
+                            THRESHOLDS, REPORT_WIDTH)
+        pipeline.collect("bench")
+
+    try:
+        runner.measure("pipeline[Desktop x10]", throughput, items=FRAMES)
+    finally:
+        pipeline.close()
+
+
+def bench_animation(runner, viewports, workdir):
+    width, height = viewports["Desktop"]
+    frames = [synthetic_page(width, height, seed) for seed in range(FRAMES)]
+    for fmt in ("gif", "webp"):
+        def write():
+            with ScrollAnimationWriter(os.path.join(workdir, f"scroll.{fmt}")) as animation:
+                for frame in frames:
+                    animation.append(frame)
+        runner.measure(f"animation[{fmt}]", write, items=FRAMES)
+
+
+def bench_baseline_lookup(runner, workdir):
+    # A store the size of a long-lived project: opening it reads the manifest
+    # once per worker, then every screenshot looks its baseline up by name.
+    root = os.path.join(workdir, "lookup")
+    store = BaselineStore(root)
+    names = [f"chrome_page_{i}_scroll_{i % 10}" for i in range(STORE_ENTRIES)]
+    for i, name in enumerate(names):
+        store.put(name, encode_png(synthetic_page(64, 64, i)))
+    runner.measure("baseline_store_open", functools.partial(BaselineStore, root))
+    runner.measure(f"baseline_ref[x{STORE_ENTRIES}]", lambda: [store.ref(name) for name in names],
+                   items=STORE_ENTRIES)
+
+
+def serve_site():
+    handler = functools.partial(QuietHandler, directory=SITE_DIR)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/index.html"
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def bench_links(runner):
+    # The link audit's request loop against the local site: distinct URLs so
+    # none is answered from the cache, a quarter of them missing so HEAD falls
+    # back to GET, then the same list again from a warm checker.
+    server, url = serve_site()
+    try:
+        base = url.rsplit("/", 1)[0]
+        hrefs = [f"{url}?link={i}" if i % 4 else f"{base}/missing-{i}.html" for i in range(LINKS)]
+        runner.measure(f"link_checker[x{LINKS}]", lambda: LinkChecker(retries=0).check(hrefs), items=LINKS)
+        checker = LinkChecker(retries=0)
+        checker.check(hrefs)
+        runner.measure(f"link_checker_cached[x{LINKS}]", functools.partial(checker.check, hrefs), items=LINKS)
+    finally:
+        server.shutdown()
+
+
+def bench_browser(runner, browser, headless, driver_dir, viewports):
+    from test_visual_regression import get_driver
+
+    server, url = serve_site()
+    drivers = []
+    try:
+        def start():
+            drivers.append(get_driver(browser, headless, driver_dir))
+            drivers.pop().quit()
+
+        try:
+            runner.measure(f"driver_startup[{browser}]", start, repeat=min(runner.repeat, 3), browser=True)
+        except Exception as e:
+            print(f"⚠️ Skipping browser benchmarks, {browser} did not start: {type(e).__name__}: {e}")
+            return
+        driver = get_driver(browser, headless, driver_dir)
+        drivers.append(driver)
+
+        def navigate():
+            driver.get(url)
+            wait_for_page_ready(driver)
+
+        runner.measure("navigate_ready", navigate, browser=True)
+        for label, (width, height) in viewports.items():
+            driver.set_window_size(width, height)
+            navigate()
+            runner.measure(f"screenshot[{label}]", driver.get_screenshot_as_png, browser=True)
+        runner.measure("full_page_tiles", functools.partial(full_page_tiles, driver), browser=True)
+        runner.measure("dom_audit", functools.partial(collect_audit, driver), browser=True)
+
+        buttons = [b for b in collect_audit(driver)[0] if b.visible and b.enabled]
+        engine = InteractionEngine(driver, url)
+        runner.measure(f"interactions[x{len(buttons)}]", functools.partial(engine.run, buttons),
+                       repeat=min(runner.repeat, 3), items=len(buttons), browser=True)
+    finally:
+        for driver in drivers:
+            driver.quit()
+        server.shutdown()
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return {"runs": []}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def threshold_for(name, result, threshold=THRESHOLD, browser_threshold=BROWSER_THRESHOLD,
+                  overrides=BENCHMARK_THRESHOLDS):
+    for key in (name, name.split("[", 1)[0]):
+        if key in overrides:
+            return overrides[key]
+    return browser_threshold if result.browser else threshold
+
+
+def regressions(history, results, host, threshold=THRESHOLD, browser_threshold=BROWSER_THRESHOLD,
+                overrides=BENCHMARK_THRESHOLDS, min_delta_ms=MIN_DELTA_MS):
+    # Returns (regressions, names not compared for lack of samples or history).
+    previous = [run for run in history["runs"] if run["host"] == host][-WINDOW:]
+    found, skipped = [], []
+    for name, result in results.items():
+        medians = [run["results"][name]["median_ms"] for run in previous if name in run["results"]]
+        if result.samples < MIN_SAMPLES or len(medians) < MIN_HISTORY:
+            skipped.append(name)
+            continue
+        reference = statistics.median(medians)
+        noise = statistics.median(abs(median - reference) for median in medians)
+        limit = threshold_for(name, result, threshold, browser_threshold, overrides)
+        delta = result.median_ms - reference
+        if delta > reference * limit and delta > max(min_delta_ms, MAD_FACTOR * noise):
+            found.append((name, reference, result.median_ms))
+    return found, skipped
+
+
+def parse_override(value):
+    name, _, ratio = value.rpartition("=")
+    try:
+        return name, float(ratio)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected NAME=RATIO, got {value!r}")
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the visual test harness offline")
+    parser.add_argument("--browser", default="chrome", help="Browser for the driver, navigation and audit benchmarks")
+    parser.add_argument("--headless", action="store_true", help="Run the browser headless")
+    parser.add_argument("--driver-dir", default=None, help="Directory with pinned driver binaries")
+    parser.add_argument("--no-browser", action="store_true", help="Only run the benchmarks that need no browser")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="Timed repetitions per benchmark")
+    parser.add_argument("--history", default=HISTORY_FILE, help="JSON file the results are appended to")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="Allowed slowdown of a CPU benchmark's median against recent runs (0.25 = 25%%)")
+    parser.add_argument("--browser-threshold", type=float, default=BROWSER_THRESHOLD,
+                        help="Allowed slowdown for benchmarks that drive the browser")
+    parser.add_argument("--benchmark-threshold", type=parse_override, action="append", default=[],
+                        metavar="NAME=RATIO",
+                        help="Allowed slowdown for one benchmark, e.g. dom_audit=0.8 (repeatable)")
+    parser.add_argument("--min-delta-ms", type=float, default=MIN_DELTA_MS,
+                        help="Smallest absolute slowdown reported as a regression")
+    parser.add_argument("--no-record", action="store_true", help="Compare against the history without appending")
+    args = parser.parse_args(argv)
+
+    history_path = os.path.abspath(args.history)
+    driver_dir = os.path.abspath(args.driver_dir) if args.driver_dir else None
+    runner = Runner(args.repeat)
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="qa-bench-")
+    os.chdir(workdir)
+    try:
+        # The test module creates its run folders on import, so it is only
+        # imported once inside the scratch directory.
+        from test_visual_regression import MOBILE_VIEWPORTS as viewports
+        bench_compare(runner, viewports, workdir)
+        bench_animation(runner, viewports, workdir)
+        bench_baseline_lookup(runner, workdir)
+        bench_links(runner)
+        if not args.no_browser:
+            bench_browser(runner, args.browser, args.headless, driver_dir, viewports)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    host = platform.node()
+    history = load_history(history_path)
+    overrides = {**BENCHMARK_THRESHOLDS, **dict(args.benchmark_threshold)}
+    found, skipped = regressions(history, runner.results, host, args.threshold, args.browser_threshold,
+                                 overrides, args.min_delta_ms)
+    if skipped:
+        print(f"ℹ️ {len(skipped)} benchmark(s) not compared: fewer than {MIN_SAMPLES} samples "
+              f"or {MIN_HISTORY} earlier runs on this machine")
+    for name, reference, median in found:
+        print(f"❌ Regression: {name} {median:.1f} ms vs {reference:.1f} ms ({median / reference - 1:+.0%})")
+    if not args.no_record:
+        history["runs"].append({
+            "time": time.strftime("%Y-%m-%d_%H-%M-%S"),
+            "host": host,
+            "python": platform.python_version(),
+            "commit": _commit(),
+            "results": {name: asdict(result) for name, result in runner.results.items()},
+        })
+        with open(history_path, "w", encoding="utf-8") as f:
+            json.dump(history, f, indent=1)
+    if found:
+        sys.exit(1)
+    print(f"✅ {len(runner.results) - len(skipped)} benchmarks within thresholds")
+
+
+if __name__ == "__main__":
+    main()
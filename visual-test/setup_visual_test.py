@@ -15,7 +15,10 @@ webdriver-manager>=4.0.1
 pillow>=10.3.0
 pytest>=8.4.1
 pytest-html>=4.1.1
-imageio>=2.34.0
+pytest-xdist>=3.5.0
+numpy>=1.26.0
+filelock>=3.13.0
+aiohttp>=3.9.0
 """
 
 dev_requirements = """
@@ -0,0 +1,74 @@
+import os
+import tempfile
+
+import numpy as np
+
+from image_compare import load_image
+
+MAX_CACHE_MB = 512
+
+
+class DecodedBaselineCache:
+    # Decoded baselines kept as raw .npy pixel arrays keyed by PNG hash. Every
+    # process maps the same file read-only, so a baseline is inflated once for
+    # all runs and xdist workers. Hits refresh the file's mtime; the least
+    # recently used entries are evicted once the directory grows past max_bytes.
+
+    def __init__(self, directory, max_bytes=MAX_CACHE_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, digest):
+        return os.path.join(self.directory, f"{digest}.npy")
+
+    def load(self, digest, png_path):
+        path = self.path(digest)
+        try:
+            array = np.load(path, mmap_mode="r")
+            os.utime(path)
+            return array
+        except (OSError, ValueError):
+            pass
+        array = load_image(png_path)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.evict(keep=path)
+        return np.load(path, mmap_mode="r")
+
+    def invalidate(self, digest):
+        try:
+            os.remove(self.path(digest))
+        except OSError:
+            pass
+
+    def evict(self, keep=None):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".npy"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                # Still mapped by another process on platforms that forbid deleting it.
+                pass
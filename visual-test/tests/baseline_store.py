@@ -0,0 +1,204 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+from collections import namedtuple
+
+import numpy as np
+from filelock import FileLock
+
+from baseline_cache import DecodedBaselineCache
+from image_compare import TILE_SIZE
+from qa_common.files import atomic_write
+
+STORE_DIR = "baseline_store"
+MANIFEST = "manifest.json"
+MANIFEST_VERSION = 1
+TILE_INDEX_SUFFIX = f".tiles{TILE_SIZE}.npy"
+
+BaselineRef = namedtuple("BaselineRef", "path tiles_path digest")
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_manifest(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        payload = json.load(f)
+    payload.setdefault("entries", {})
+    return payload
+
+
+def _merge_latest(merged, records):
+    for key, record in records.items():
+        current = merged.get(key)
+        if current is None or (record.get("run") or "") > (current.get("run") or ""):
+            merged[key] = record
+
+
+def read_tile_index(path):
+    if not os.path.exists(path):
+        return None
+    return np.load(path)
+
+
+def write_tile_index(path, grid):
+    buf = io.BytesIO()
+    np.save(buf, grid)
+    atomic_write(path, buf.getvalue())
+
+
+def link_or_copy(src, dst):
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class BaselineStore:
+    # Content-addressed baseline PNGs plus a manifest of name -> {hash, path}.
+    # Objects are written once per unique image and hard-linked into run folders,
+    # so unchanged baselines never cost another full copy on disk.
+
+    def __init__(self, screenshots_root="screenshots"):
+        self.screenshots_root = screenshots_root
+        self.root = os.path.join(screenshots_root, STORE_DIR)
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.manifest_path = os.path.join(self.root, MANIFEST)
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.decoded = DecodedBaselineCache(os.path.join(self.root, "decoded"))
+        self.lock = FileLock(self.manifest_path + ".lock")
+        with self.lock:
+            payload = self._read_manifest()
+            if payload is None:
+                payload = {"entries": self._import_legacy()}
+                self._write_manifest(payload["entries"])
+            self.entries = payload["entries"]
+            self.fingerprints = payload.get("fingerprints", {})
+
+    def _read_manifest(self):
+        return read_manifest(self.manifest_path)
+
+    def _write_manifest(self, entries, fingerprints=None):
+        payload = {"version": MANIFEST_VERSION, "entries": entries, "fingerprints": fingerprints or {}}
+        atomic_write(self.manifest_path, json.dumps(payload, indent=1, sort_keys=True).encode("utf-8"))
+
+    def _import_legacy(self):
+        # First run with a manifest: adopt the newest copy of every baseline
+        # already sitting in screenshots/<timestamp>/baseline/.
+        entries = {}
+        runs = sorted((d for d in os.listdir(self.screenshots_root)
+                       if os.path.isdir(os.path.join(self.screenshots_root, d, "baseline"))), reverse=True)
+        for run in runs:
+            run_dir = os.path.join(self.screenshots_root, run, "baseline")
+            for filename in sorted(os.listdir(run_dir)):
+                name, ext = os.path.splitext(filename)
+                if ext != ".png" or name in entries:
+                    continue
+                with open(os.path.join(run_dir, filename), "rb") as f:
+                    entries[name] = self._entry(self._store_object(f.read()), run)
+        if entries:
+            print(f"📦 Indexed {len(entries)} existing baselines into {self.manifest_path}")
+        return entries
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, f"{digest}.png")
+
+    def _tiles_path(self, digest):
+        return os.path.join(self.objects_dir, f"{digest}{TILE_INDEX_SUFFIX}")
+
+    def _store_object(self, data):
+        digest = hash_bytes(data)
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            atomic_write(path, data)
+        return digest
+
+    def _entry(self, digest, run):
+        return {"hash": digest, "path": os.path.relpath(self._object_path(digest), self.root), "run": run}
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, name):
+        entry = self.entries.get(name)
+        return os.path.join(self.root, entry["path"]) if entry else None
+
+    def ref(self, name):
+        entry = self.entries.get(name)
+        if not entry:
+            return None
+        return BaselineRef(self.get(name), self._tiles_path(entry["hash"]), entry["hash"])
+
+    def needs_tiles(self, name):
+        ref = self.ref(name)
+        return ref is not None and not os.path.exists(ref.tiles_path)
+
+    def get_hash(self, name):
+        entry = self.entries.get(name)
+        return entry["hash"] if entry else None
+
+    def put(self, name, data, run=None):
+        # Only the PNG bytes are stored here; the tile index is written by the
+        # comparison pool (see screenshot_job), so saving a baseline never
+        # decodes it on the test thread.
+        digest = self._store_object(data)
+        entry = self._entry(digest, run)
+        with self.lock:
+            # Re-read under the lock so concurrent xdist workers don't drop each other's entries.
+            payload = self._read_manifest() or {"entries": {}}
+            entries = payload["entries"]
+            previous = entries.get(name)
+            entries[name] = entry
+            self._write_manifest(entries, payload.get("fingerprints"))
+        self.entries[name] = entry
+        if previous and previous["hash"] != digest and all(e["hash"] != previous["hash"] for e in entries.values()):
+            # The replaced baseline is no longer referenced: drop its decoded pixels.
+            self.decoded.invalidate(previous["hash"])
+        return self.get(name)
+
+    def merge(self, entries, fingerprints):
+        # Folds another store's manifest into this one (see shards.py); when
+        # both hold the same name or fingerprint key, the latest run wins.
+        with self.lock:
+            payload = self._read_manifest() or {"entries": {}}
+            merged_entries = payload["entries"]
+            merged_fingerprints = payload.get("fingerprints", {})
+            _merge_latest(merged_entries, entries)
+            _merge_latest(merged_fingerprints, fingerprints)
+            self._write_manifest(merged_entries, merged_fingerprints)
+        self.entries, self.fingerprints = merged_entries, merged_fingerprints
+        return merged_entries
+
+    def get_fingerprint(self, key):
+        return self.fingerprints.get(key)
+
+    def put_fingerprint(self, key, fingerprint, names, run=None):
+        # Page fingerprint the baselines in `names` were last confirmed against.
+        record = {"hash": fingerprint, "names": sorted(names), "run": run}
+        with self.lock:
+            payload = self._read_manifest() or {"entries": {}}
+            fingerprints = payload.get("fingerprints", {})
+            fingerprints[key] = record
+            self._write_manifest(payload["entries"], fingerprints)
+        self.fingerprints[key] = record
+
+    def unchanged(self, key, fingerprint):
+        record = self.fingerprints.get(key)
+        return bool(record and record["hash"] == fingerprint
+                    and all(name in self.entries for name in record["names"]))
+
+    def link_into(self, name, directory):
+        src = self.get(name)
+        dst = os.path.join(directory, f"{name}.png")
+        link_or_copy(src, dst)
+        return dst
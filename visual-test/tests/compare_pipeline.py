@@ -0,0 +1,148 @@
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image
+
+from baseline_cache import DecodedBaselineCache
+from baseline_store import read_tile_index, write_tile_index
+from image_compare import CompareResult, compare_arrays, differing_tiles, load_image, render_diff, tile_hashes
+from scroll_animation import fit_width
+
+
+
+@dataclass
+class JobOutput:
+    result: CompareResult = None
+    frame: np.ndarray = None
+
+    def take_frame(self):
+        # The frame is handed over once, so the futures the pipeline keeps
+        # until collect() don't hold every frame of a page.
+        frame, self.frame = self.frame, None
+        return frame
+
+
+def default_workers():
+    # Split the machine's cores between xdist workers so the pools don't oversubscribe.
+    workers = int(os.environ.get("PYTEST_XDIST_WORKER_COUNT", "1"))
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+_decoded_cache = None
+
+
+def _init_worker(cache_dir, cache_bytes):
+    global _decoded_cache
+    if cache_dir:
+        _decoded_cache = DecodedBaselineCache(cache_dir, cache_bytes)
+        _decoded_cache.evict()
+
+
+def _load_baseline(ref):
+    if _decoded_cache is None:
+        return load_image(ref.path)
+    return _decoded_cache.load(ref.digest, ref.path)
+
+
+def _compare(ref, current, thresholds):
+    # Hash the capture's tiles against the baseline's tile index and
+    # pixel-compare only the tiles that differ.
+    current_tiles = tile_hashes(current)
+    baseline = None
+    baseline_tiles = read_tile_index(ref.tiles_path)
+    if baseline_tiles is None:
+        # Baselines imported before tile indexes existed get theirs on first use.
+        baseline = _load_baseline(ref)
+        baseline_tiles = tile_hashes(baseline)
+        write_tile_index(ref.tiles_path, baseline_tiles)
+    candidates = differing_tiles(baseline_tiles, current_tiles)
+    if candidates == []:
+        return CompareResult(True, 0, current.shape[0] * current.shape[1]), None
+    if baseline is None:
+        baseline = _load_baseline(ref)
+    return compare_arrays(baseline, current, candidates=candidates, **thresholds), baseline
+
+
+def screenshot_job(ref, image, current_path, diff_path, thresholds, frame_width, tiles_path=None):
+    # Runs in a pool process. The capture is decoded once and used for the
+    # comparison, the downscaled animation frame and, for a capture just saved
+    # as a new baseline (tiles_path set), that baseline's tile index. Files are
+    # only written for failures: the capture as received plus the rendered diff.
+    current = load_image(image)
+    result = None
+    if tiles_path:
+        write_tile_index(tiles_path, tile_hashes(current))
+    if ref is not None:
+        result, baseline = _compare(ref, current, thresholds)
+        if not result:
+            if isinstance(image, bytes):
+                with open(current_path, "wb") as f:
+                    f.write(image)
+            else:
+                Image.fromarray(current).save(current_path)
+            if baseline is None:
+                baseline = _load_baseline(ref)
+            render_diff(baseline, current).save(diff_path)
+    frame = np.asarray(fit_width(current, frame_width)) if frame_width else None
+    return JobOutput(result, frame)
+
+
+class ComparisonPipeline:
+    def __init__(self, max_workers=None, max_pending=None, cache_dir=None, cache_bytes=None):
+        self.max_workers = max_workers or default_workers()
+        self.cache_dir = cache_dir
+        self.cache_bytes = cache_bytes
+        self.executor = None
+        # Backpressure: the test thread blocks once this many screenshots are queued,
+        # so a long scroll run can't pile unbounded PNG bytes into memory.
+        self.slots = threading.BoundedSemaphore(max_pending or self.max_workers * 2)
+        self.pending = defaultdict(list)
+        # Crawled pages submit from several threads at once.
+        self.lock = threading.Lock()
+
+    def _executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(self.max_workers, initializer=_init_worker,
+                                                    initargs=(self.cache_dir, self.cache_bytes))
+            return self.executor
+
+    def submit(self, key, name, ref, image, current_path, diff_path, thresholds, frame_width=None, tiles_path=None):
+        executor = self._executor()
+        self.slots.acquire()
+        try:
+            future = executor.submit(screenshot_job, ref, image, current_path, diff_path,
+                                     thresholds, frame_width, tiles_path)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        with self.lock:
+            self.pending[key].append((name, future))
+        return future
+
+    def collect(self, key):
+        verdicts = []
+        with self.lock:
+            pending = self.pending.pop(key, [])
+        for name, future in pending:
+            result = future.result().result
+            if result is not None:
+                verdicts.append((name, result))
+        return verdicts
+
+    def discard(self, key):
+        with self.lock:
+            pending = self.pending.pop(key, [])
+        for _, future in pending:
+            future.cancel()
+
+    def close(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
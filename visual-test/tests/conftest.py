@@ -1,7 +1,111 @@
+import os
+import sys
+
+# Modules shared with the functional suite live in qa_common/ at the repository root.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from baseline_cache import MAX_CACHE_MB  # noqa: E402
+from image_compare import CHANNEL_THRESHOLD, MAX_CHANGED_RATIO  # noqa: E402
+from multi_context import MODES  # noqa: E402
+from qa_common.duration_scheduler import DurationHistory  # noqa: E402
+from qa_common.tracing import TRACE_DIR, TraceRecorder  # noqa: E402
+from report_writer import ReportWriter  # noqa: E402
+from retention import clear_active, mark_active  # noqa: E402
+from scroll_animation import FORMATS, REPORT_WIDTH  # noqa: E402
+from shards import SCREENSHOTS_ROOT, ResultsRecorder, assign_shards, parse_shard, run_id  # noqa: E402
+
+# Options and hooks shared with the functional suite.
+pytest_plugins = ["qa_common.pytest_plugin"]
+
+
 def pytest_addoption(parser):
     parser.addoption(
-        "--headless",
+        "--shard",
+        type=parse_shard,
+        default=None,
+        help="Run only shard i of N (e.g. 2/4), split by recorded durations; "
+             "merge the outputs with `python tests/shards.py merge`"
+    )
+    parser.addoption(
+        "--multi-context",
+        choices=MODES,
+        nargs="?",
+        const="contexts",
+        default=None,
+        help="Run every viewport as an emulated device tab in one browser per worker "
+             "(contexts: isolated browser context per tab, tabs: shared cache)"
+    )
+    parser.addoption(
+        "--full-page",
+        action="store_true",
+        default=False,
+        help="Capture the whole page in one screenshot and compare it tile by tile instead of scrolling"
+    )
+    parser.addoption(
+        "--incremental",
         action="store_true",
         default=False,
-        help="Run browsers in headless mode"
-    )
\ No newline at end of file
+        help="Skip screenshots for pages whose DOM, assets and viewport match the fingerprint stored with their baselines"
+    )
+    parser.addoption(
+        "--scroll-format",
+        choices=FORMATS,
+        default="gif",
+        help="Scroll animation format: palette-optimised gif or animated webp"
+    )
+    parser.addoption(
+        "--report-width",
+        type=int,
+        default=REPORT_WIDTH,
+        help="Width in pixels that scroll animation frames are downscaled to"
+    )
+    parser.addoption(
+        "--baseline-cache-mb",
+        type=int,
+        default=MAX_CACHE_MB,
+        help="Size limit for decoded baselines cached as memory-mapped arrays"
+    )
+    parser.addoption(
+        "--channel-threshold",
+        type=int,
+        default=CHANNEL_THRESHOLD,
+        help="Per-channel colour delta (0-255) ignored as rendering noise"
+    )
+    parser.addoption(
+        "--max-diff-ratio",
+        type=float,
+        default=MAX_CHANGED_RATIO,
+        help="Fraction of changed pixels tolerated before a screenshot fails"
+    )
+
+
+def pytest_configure(config):
+    run_id()
+    if not hasattr(config, "workerinput"):
+        # Tells `retention.py` this run folder is still being written.
+        mark_active(os.path.join(SCREENSHOTS_ROOT, run_id()))
+    config.pluginmanager.register(ResultsRecorder(config.getoption("--shard")), "results_recorder")
+    config.pluginmanager.register(ReportWriter(os.path.join(SCREENSHOTS_ROOT, run_id()), config.getoption("--shard")),
+                                  "report_writer")
+    if config.getoption("--tracing"):
+        config.pluginmanager.register(TraceRecorder(os.path.join(SCREENSHOTS_ROOT, run_id(), TRACE_DIR)),
+                                      "trace_recorder")
+
+
+def pytest_unconfigure(config):
+    if not hasattr(config, "workerinput"):
+        clear_active(os.path.join(SCREENSHOTS_ROOT, run_id()))
+
+
+def pytest_collection_modifyitems(config, items):
+    shard = config.getoption("--shard")
+    if not shard:
+        return
+    index, count = shard
+    history = DurationHistory(config.getoption("--duration-history"))
+    shards = assign_shards([item.nodeid for item in items], count, history.estimate)
+    selected = [item for item in items if shards[item.nodeid] == index]
+    deselected = [item for item in items if shards[item.nodeid] != index]
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+    items[:] = selected
@@ -0,0 +1,55 @@
+import hashlib
+import json
+
+# Normalized DOM: tag names, attributes in sorted order and whitespace-collapsed
+# text, skipping comments and attributes that change on every load. Assets are
+# the set of loaded resource URLs plus the text of every readable stylesheet.
+# The page's own origin is stripped so a replay mirror on a random port
+# fingerprints the same as every other run against it.
+FINGERPRINT_JS = r"""
+const VOLATILE = new Set(["nonce", "integrity", "data-reactroot", "data-n-head-ssr"]);
+const parts = [];
+(function walk(node) {
+  if (node.nodeType === Node.TEXT_NODE) {
+    const text = node.data.replace(/\s+/g, " ").trim();
+    if (text) parts.push("#" + text);
+    return;
+  }
+  if (node.nodeType !== Node.ELEMENT_NODE) return;
+  const attrs = Array.from(node.attributes)
+    .filter(a => !VOLATILE.has(a.name))
+    .map(a => a.name + "=" + a.value)
+    .sort();
+  parts.push("<" + node.tagName.toLowerCase() + " " + attrs.join(" "));
+  for (const child of node.childNodes) walk(child);
+  parts.push(">");
+})(document.documentElement);
+const assets = new Set(performance.getEntriesByType("resource").map(e => e.name.split("#")[0]));
+const styles = [];
+for (const sheet of document.styleSheets) {
+  if (sheet.href) assets.add(sheet.href);
+  try {
+    styles.push(Array.from(sheet.cssRules, r => r.cssText).join("\n"));
+  } catch (e) {
+    // Cross-origin sheet: its URL above has to stand in for its content.
+  }
+}
+const local = s => s.split(location.origin).join("");
+return {
+  dom: local(parts.join("\n")),
+  assets: Array.from(assets, local).sort(),
+  styles: styles.map(local),
+  viewport: [window.innerWidth, window.innerHeight, window.devicePixelRatio],
+};
+"""
+
+
+def page_fingerprint(driver, *extra):
+    # One hash for everything a capture depends on: the page as loaded, its
+    # assets and styles, the viewport, plus any capture settings in `extra`.
+    state = driver.execute_script(FINGERPRINT_JS)
+    digest = hashlib.sha256()
+    for part in (state["dom"], state["assets"], state["styles"], state["viewport"], list(extra)):
+        digest.update(json.dumps(part, sort_keys=True).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
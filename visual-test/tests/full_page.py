@@ -0,0 +1,37 @@
+import base64
+
+from image_compare import load_image
+
+
+def capture_full_page(driver):
+    # Firefox has a native full-page command; Chrome and Edge go through DevTools.
+    if hasattr(driver, "get_full_page_screenshot_as_png"):
+        return driver.get_full_page_screenshot_as_png()
+    if hasattr(driver, "execute_cdp_cmd"):
+        metrics = driver.execute_cdp_cmd("Page.getLayoutMetrics", {})
+        size = metrics.get("cssContentSize") or metrics["contentSize"]
+        shot = driver.execute_cdp_cmd("Page.captureScreenshot", {
+            "format": "png",
+            "captureBeyondViewport": True,
+            "clip": {"x": 0, "y": 0, "width": size["width"], "height": size["height"], "scale": 1},
+        })
+        return base64.b64decode(shot["data"])
+    raise ValueError(f"Full-page capture not supported for {type(driver).__name__}")
+
+
+def split_into_tiles(png, tile_height):
+    # Tiles are views into the single decoded page; nothing is re-encoded.
+    page = load_image(png)
+    height = page.shape[0]
+    tiles = []
+    for top in range(0, height, tile_height):
+        # Like the final scroll step, the last tile is bottom-aligned so every
+        # tile keeps the viewport size.
+        top = max(0, min(top, height - tile_height))
+        tiles.append(page[top:top + tile_height])
+    return tiles
+
+
+def full_page_tiles(driver):
+    tile_height = driver.execute_script("return Math.round(window.innerHeight * window.devicePixelRatio)")
+    return split_into_tiles(capture_full_page(driver), tile_height)
@@ -0,0 +1,205 @@
+import hashlib
+import io
+from dataclasses import dataclass, field
+
+import numpy as np
+from PIL import Image
+
+TILE_SIZE = 64
+# A pixel counts as changed when any single channel moves more than
+# CHANNEL_THRESHOLD or the summed RGB delta exceeds PIXEL_THRESHOLD.
+# The defaults absorb sub-pixel anti-aliasing and font hinting noise.
+CHANNEL_THRESHOLD = 16
+PIXEL_THRESHOLD = 48
+# Fraction of pixels allowed to change before the whole image fails.
+MAX_CHANGED_RATIO = 0.001
+# Fraction of a single tile allowed to change before comparison stops early.
+MAX_TILE_RATIO = 0.25
+
+
+@dataclass
+class CompareResult:
+    passed: bool
+    changed_pixels: int
+    total_pixels: int
+    boxes: list = field(default_factory=list)
+    size_mismatch: bool = False
+    complete: bool = True
+
+    @property
+    def changed_ratio(self):
+        return self.changed_pixels / self.total_pixels if self.total_pixels else 0.0
+
+    @property
+    def score(self):
+        return 1.0 - self.changed_ratio
+
+    def __bool__(self):
+        return self.passed
+
+    def summary(self):
+        if self.size_mismatch:
+            return "size mismatch"
+        text = f"{self.changed_pixels} px changed ({self.changed_ratio:.3%}), score {self.score:.4f}"
+        if self.boxes:
+            text += f", regions {self.boxes}"
+        if not self.complete:
+            text += " (stopped early)"
+        return text
+
+
+def load_image(source):
+    if isinstance(source, np.ndarray):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    with Image.open(source) as img:
+        return np.asarray(img.convert("RGB"))
+
+
+def changed_mask(baseline, current, channel_threshold=CHANNEL_THRESHOLD, pixel_threshold=PIXEL_THRESHOLD):
+    delta = np.abs(baseline.astype(np.int16) - current.astype(np.int16))
+    return (delta.max(axis=2) > channel_threshold) | (delta.sum(axis=2) > pixel_threshold)
+
+
+def tile_hashes(image, tile=TILE_SIZE):
+    # One 64-bit blake2b digest per tile; equal digests mean byte-identical tiles.
+    h, w = image.shape[:2]
+    rows, cols = -(-h // tile), -(-w // tile)
+    grid = np.empty((rows, cols), dtype=np.uint64)
+    for r in range(rows):
+        band = image[r * tile:(r + 1) * tile]
+        for c in range(cols):
+            digest = hashlib.blake2b(band[:, c * tile:(c + 1) * tile].tobytes(), digest_size=8).digest()
+            grid[r, c] = int.from_bytes(digest, "little")
+    return grid
+
+
+def differing_tiles(baseline_hashes, current_hashes):
+    if baseline_hashes.shape != current_hashes.shape:
+        return None
+    return [(int(r), int(c)) for r, c in np.argwhere(baseline_hashes != current_hashes)]
+
+
+def _tile_counts(mask, tile):
+    h, w = mask.shape
+    rows, cols = -(-h // tile), -(-w // tile)
+    padded = np.zeros((rows * tile, cols * tile), dtype=np.uint32)
+    padded[:h, :w] = mask
+    return padded.reshape(rows, tile, cols, tile).sum(axis=(1, 3))
+
+
+def _tile_area(shape, row, col, tile):
+    h, w = shape
+    return (min(tile, h - row * tile)) * (min(tile, w - col * tile))
+
+
+def _regions(mask, changed_tiles, tile):
+    # Group 4-connected changed tiles and return the tight pixel bbox of each group.
+    seen = set()
+    boxes = []
+    for start in sorted(changed_tiles):
+        if start in seen:
+            continue
+        stack, group = [start], []
+        seen.add(start)
+        while stack:
+            r, c = stack.pop()
+            group.append((r, c))
+            for nxt in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+                if nxt in changed_tiles and nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+        top = min(r for r, _ in group) * tile
+        bottom = (max(r for r, _ in group) + 1) * tile
+        left = min(c for _, c in group) * tile
+        right = (max(c for _, c in group) + 1) * tile
+        ys, xs = np.nonzero(mask[top:bottom, left:right])
+        boxes.append((left + int(xs.min()), top + int(ys.min()),
+                      left + int(xs.max()) + 1, top + int(ys.max()) + 1))
+    return boxes
+
+
+def compare_arrays(baseline, current, channel_threshold=CHANNEL_THRESHOLD, pixel_threshold=PIXEL_THRESHOLD,
+                   max_changed_ratio=MAX_CHANGED_RATIO, max_tile_ratio=MAX_TILE_RATIO,
+                   tile=TILE_SIZE, early_exit=True, candidates=None):
+    if baseline.shape != current.shape:
+        h, w = current.shape[:2]
+        return CompareResult(False, h * w, h * w, [(0, 0, w, h)], size_mismatch=True)
+    if candidates is not None:
+        return _compare_candidates(baseline, current, candidates, channel_threshold, pixel_threshold,
+                                   max_changed_ratio, max_tile_ratio, tile, early_exit)
+
+    h, w = current.shape[:2]
+    total = h * w
+    budget = max_changed_ratio * total
+    changed = 0
+    changed_tiles = set()
+    tile_failed = False
+    masks = []
+
+    # Work one band of tiles at a time so a failing band stops the scan before
+    # the rest of the image is touched.
+    for top in range(0, h, tile):
+        band = changed_mask(baseline[top:top + tile], current[top:top + tile], channel_threshold, pixel_threshold)
+        masks.append(band)
+        counts = _tile_counts(band, tile)[0]
+        hits = np.nonzero(counts)[0]
+        if not hits.size:
+            continue
+        row = top // tile
+        changed += int(counts.sum())
+        changed_tiles.update((row, int(c)) for c in hits)
+        tile_failed = tile_failed or any(
+            counts[c] > max_tile_ratio * _tile_area((h, w), row, c, tile) for c in hits
+        )
+        if early_exit and (tile_failed or changed > budget):
+            mask = np.vstack(masks)
+            return CompareResult(False, changed, total, _regions(mask, changed_tiles, tile), complete=top + tile >= h)
+
+    mask = np.vstack(masks) if masks else np.zeros((h, w), dtype=bool)
+    return CompareResult(changed <= budget and not tile_failed, changed, total, _regions(mask, changed_tiles, tile))
+
+
+def _compare_candidates(baseline, current, candidates, channel_threshold, pixel_threshold,
+                        max_changed_ratio, max_tile_ratio, tile, early_exit):
+    # Only tiles whose hashes differ from the baseline are compared pixel by pixel.
+    h, w = current.shape[:2]
+    total = h * w
+    budget = max_changed_ratio * total
+    changed = 0
+    changed_tiles = set()
+    tile_failed = False
+    mask = np.zeros((h, w), dtype=bool)
+
+    for i, (r, c) in enumerate(sorted(candidates)):
+        rows = slice(r * tile, (r + 1) * tile)
+        cols = slice(c * tile, (c + 1) * tile)
+        tile_mask = changed_mask(baseline[rows, cols], current[rows, cols], channel_threshold, pixel_threshold)
+        count = int(tile_mask.sum())
+        if not count:
+            continue
+        mask[rows, cols] = tile_mask
+        changed += count
+        changed_tiles.add((r, c))
+        tile_failed = tile_failed or count > max_tile_ratio * _tile_area((h, w), r, c, tile)
+        if early_exit and (tile_failed or changed > budget):
+            return CompareResult(False, changed, total, _regions(mask, changed_tiles, tile),
+                                 complete=i == len(candidates) - 1)
+
+    return CompareResult(changed <= budget and not tile_failed, changed, total, _regions(mask, changed_tiles, tile))
+
+
+def encode_png(image):
+    buf = io.BytesIO()
+    Image.fromarray(image).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def render_diff(baseline, current, channel_threshold=CHANNEL_THRESHOLD, pixel_threshold=PIXEL_THRESHOLD):
+    if baseline.shape != current.shape:
+        return Image.fromarray(current)
+    mask = changed_mask(baseline, current, channel_threshold, pixel_threshold)
+    out = (current.astype(np.uint16) // 3).astype(np.uint8)
+    out[mask] = (255, 0, 0)
+    return Image.fromarray(out)
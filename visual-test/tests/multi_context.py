@@ -0,0 +1,150 @@
+from dataclasses import dataclass
+
+CDP_BROWSERS = ("chrome", "edge")
+MODES = ("contexts", "tabs")
+
+
+@dataclass(frozen=True)
+class Device:
+    width: int
+    height: int
+    scale: float = 1
+    mobile: bool = False
+    user_agent: str = None
+    platform: str = None
+
+
+DEVICES = {
+    "Desktop": Device(1280, 1000),
+    "iPhone X": Device(
+        375, 812, 3, True,
+        "Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15 "
+        "(KHTML, like Gecko) Version/16.0 Mobile/15E148 Safari/604.1",
+        "iPhone",
+    ),
+    "Galaxy S20": Device(
+        360, 800, 3, True,
+        "Mozilla/5.0 (Linux; Android 13; SM-G981B) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36",
+        "Android",
+    ),
+}
+
+
+def emulate(driver, device):
+    # Full device emulation on the current tab: viewport and pixel ratio,
+    # mobile layout, touch input and the device's user agent.
+    driver.execute_cdp_cmd("Emulation.setDeviceMetricsOverride", {
+        "width": device.width,
+        "height": device.height,
+        "deviceScaleFactor": device.scale,
+        "mobile": device.mobile,
+        "screenWidth": device.width,
+        "screenHeight": device.height,
+    })
+    driver.execute_cdp_cmd("Emulation.setTouchEmulationEnabled", {
+        "enabled": device.mobile,
+        "maxTouchPoints": 5 if device.mobile else 1,
+    })
+    driver.execute_cdp_cmd("Emulation.setEmitTouchEventsForMouse", {
+        "enabled": device.mobile,
+        "configuration": "mobile" if device.mobile else "desktop",
+    })
+    if device.user_agent:
+        driver.execute_cdp_cmd("Emulation.setUserAgentOverride", {
+            "userAgent": device.user_agent,
+            "platform": device.platform or "",
+        })
+    # Background tabs would otherwise be throttled while another one is driven.
+    driver.execute_cdp_cmd("Emulation.setFocusEmulationEnabled", {"enabled": True})
+
+
+class _Browser:
+    def __init__(self, session):
+        self.session = session
+        self.home = session.driver.current_window_handle
+        self.pages = {}
+        # Browser context of each device's tab in "contexts" mode.
+        self.contexts = {}
+        # URL each tab was loaded with up front, until a test takes it.
+        self.preloaded = {}
+
+
+class ContextEngine:
+    # One browser per browser type per worker, with a tab per device. In
+    # "contexts" mode every tab lives in its own browser context (separate
+    # cookies, storage and cache); in "tabs" mode they share the default
+    # context and so its HTTP cache: requests for a resource another tab is
+    # already fetching wait for that download instead of repeating it. The
+    # first test of a browser opens and emulates every device's tab and
+    # starts all their loads together; later tests switch to a tab that has
+    # already loaded and only navigate again for a different URL.
+
+    def __init__(self, pool, devices=DEVICES, mode="contexts"):
+        if mode not in MODES:
+            raise ValueError(f"Unsupported multi-context mode: {mode}")
+        self.pool = pool
+        self.devices = devices
+        self.mode = mode
+        self.browsers = {}
+
+    def supports(self, browser):
+        return browser in CDP_BROWSERS
+
+    def activate(self, browser, label, url):
+        state = self.browsers.get(browser)
+        if state is None:
+            state = self.browsers[browser] = _Browser(self.pool.acquire(browser))
+        driver = state.session.driver
+        if not state.pages:
+            self._open_all(driver, state, url)
+        driver.switch_to.window(state.pages[label])
+        # A preloaded tab is used once as is; after that it navigates again.
+        if state.preloaded.pop(label, None) != url:
+            driver.execute_cdp_cmd("Page.navigate", {"url": url})
+        return driver
+
+    def _open_all(self, driver, state, url):
+        for label, device in self.devices.items():
+            if self.mode == "contexts":
+                context = driver.execute_cdp_cmd("Target.createBrowserContext", {})
+                state.contexts[label] = context["browserContextId"]
+            state.pages[label] = self._open_tab(driver, state.contexts.get(label), device)
+        # Page.navigate returns once the navigation commits, so the loads run
+        # side by side while the next tab is started.
+        for label, handle in state.pages.items():
+            driver.switch_to.window(handle)
+            driver.execute_cdp_cmd("Page.navigate", {"url": url})
+            state.preloaded[label] = url
+
+    def tab_opener(self, browser, label):
+        # Tab factory for InteractionEngine: extra tabs for a device open in
+        # its browser context with the same emulation as its main tab.
+        state = self.browsers[browser]
+        return lambda driver, url: self._open_tab(driver, state.contexts.get(label), self.devices[label], url)
+
+    def _open_tab(self, driver, context, device, url=None):
+        params = {"url": "about:blank", "background": True}
+        if context:
+            params["browserContextId"] = context
+        # ChromeDriver window handles are DevTools target ids.
+        handle = driver.execute_cdp_cmd("Target.createTarget", params)["targetId"]
+        driver.switch_to.window(handle)
+        emulate(driver, device)
+        if url:
+            driver.execute_cdp_cmd("Page.navigate", {"url": url})
+        return handle
+
+    def close(self):
+        for state in self.browsers.values():
+            driver = state.session.driver
+            try:
+                driver.switch_to.window(state.home)
+                for handle in state.pages.values():
+                    driver.execute_cdp_cmd("Target.closeTarget", {"targetId": handle})
+                for context in state.contexts.values():
+                    driver.execute_cdp_cmd("Target.disposeBrowserContext", {"browserContextId": context})
+            except Exception as e:
+                print(f"⚠️ Closing emulated tabs failed: {e}")
+            self.pool.release(state.session)
+        self.browsers = {}
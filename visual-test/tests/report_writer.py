@@ -0,0 +1,214 @@
+import html
+import json
+import os
+import tempfile
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from scroll_animation import fit_width
+
+REPORT_FILE = "report.html"
+SHARD_DIR = os.path.join("report", "shards")
+THUMB_DIR = os.path.join("report", "thumbs")
+THUMB_WIDTH = 320
+THUMB_QUALITY = 70
+THUMB_WORKERS = 4
+IMAGE_KINDS = ("baseline", "current", "diff")
+
+
+def make_thumbnail(src, dst, width=THUMB_WIDTH):
+    # Thumbnails are named after their source, so one that already exists
+    # (a retried test, a rebuilt report) is never encoded twice.
+    if os.path.exists(dst):
+        return dst
+    with Image.open(src) as img:
+        img.draft("RGB", (width, width))
+        thumb = fit_width(img, width)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dst), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            thumb.save(f, "WEBP", quality=THUMB_QUALITY, method=4)
+        os.replace(tmp, dst)
+    finally:
+        # Gone after the replace; left behind only if the encode failed.
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return dst
+
+
+def record_outcome(tests, report):
+    # Folds one phase (setup, call or teardown) of a test into its record in
+    # `tests`: durations add up, a failure outside the call is an error, and
+    # a skip only counts if nothing failed.
+    test = tests.setdefault(report.nodeid, {"nodeid": report.nodeid, "outcome": "passed",
+                                            "duration": 0.0, "longrepr": ""})
+    test["duration"] = round(test["duration"] + report.duration, 3)
+    if report.failed:
+        test["outcome"] = "failed" if report.when == "call" else "error"
+        test["longrepr"] += str(report.longrepr)
+    elif report.skipped and test["outcome"] == "passed":
+        test["outcome"] = "skipped"
+    return test
+
+
+def thumbnail_path(rel):
+    return os.path.join(THUMB_DIR, os.path.splitext(rel)[0].replace(os.sep, "__").replace("/", "__") + ".webp")
+
+
+class ReportWriter:
+    # Plugin that streams one JSON line per finished test into
+    # <run>/report/shards/<worker>.jsonl on the process that ran it, and
+    # encodes its baseline/current/diff images into small WebP thumbnails on a
+    # thread pool while the next test runs. The controller (or a run without
+    # xdist) then only has to stitch the shards into <run>/report.html, so
+    # building the report costs the same however many tests produced it.
+    # Every path in the report is relative to the run folder, which can be
+    # moved or archived as a whole.
+
+    def __init__(self, run_dir, shard=None, width=THUMB_WIDTH):
+        self.run_dir = run_dir
+        self.shard = shard
+        self.width = width
+        self.tests = {}
+        self.path = None
+        self.stream = None
+        self.thumbs = None
+        self.pending = []
+
+    def pytest_configure(self, config):
+        worker = getattr(config, "workerinput", {}).get("workerid", "main")
+        if self.shard:
+            # Shards of one run share its folder once merged, and each has its own gw0.
+            worker = f"shard-{self.shard[0]}-of-{self.shard[1]}-{worker}"
+        os.makedirs(os.path.join(self.run_dir, SHARD_DIR), exist_ok=True)
+        os.makedirs(os.path.join(self.run_dir, THUMB_DIR), exist_ok=True)
+        self.path = os.path.join(self.run_dir, SHARD_DIR, f"{worker}.jsonl")
+        self.thumbs = ThreadPoolExecutor(THUMB_WORKERS, thread_name_prefix="thumbs")
+
+    def pytest_runtest_logreport(self, report):
+        # Reports relayed from xdist workers carry `node`; the worker that ran
+        # the test has already written it.
+        if self.path is None or hasattr(report, "node"):
+            return
+        record_outcome(self.tests, report)
+        if report.when == "teardown":
+            self._finish(self.tests.pop(report.nodeid), report.user_properties)
+
+    def _finish(self, test, properties):
+        test["screenshots"], test["animations"], test["notes"] = [], [], []
+        for key, value in properties:
+            if key == "screenshot":
+                shot = dict(value)
+                for kind in IMAGE_KINDS:
+                    if shot.get(kind):
+                        shot[f"{kind}_thumb"] = self._thumbnail(shot[kind])
+                test["screenshots"].append(shot)
+            elif key == "animation":
+                test["animations"].append(value)
+            elif key == "visual":
+                test["notes"].append(value)
+        if self.stream is None:
+            self.stream = open(self.path, "a", encoding="utf-8")
+        self.stream.write(json.dumps(test) + "\n")
+        self.stream.flush()
+
+    def _thumbnail(self, rel):
+        thumb = thumbnail_path(rel)
+        self.pending.append(self.thumbs.submit(
+            make_thumbnail, os.path.join(self.run_dir, rel), os.path.join(self.run_dir, thumb), self.width))
+        return thumb
+
+    def pytest_sessionfinish(self, session):
+        if self.thumbs is None:
+            return
+        for future in self.pending:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"⚠️ Could not write thumbnail: {e}")
+        self.thumbs.shutdown()
+        if self.stream is not None:
+            self.stream.close()
+        if not hasattr(session.config, "workerinput"):
+            path = build_report(self.run_dir)
+            if path:
+                print(f"\n🖼️ Visual report: {path}")
+
+
+def read_shards(run_dir):
+    directory = os.path.join(run_dir, SHARD_DIR)
+    tests = {}
+    if not os.path.isdir(directory):
+        return tests
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".jsonl"):
+            continue
+        with open(os.path.join(directory, filename), encoding="utf-8") as f:
+            for line in f:
+                # A line cut short by a crashed worker is skipped; the last
+                # record of a retried test wins.
+                try:
+                    test = json.loads(line)
+                except ValueError:
+                    continue
+                tests[test["nodeid"]] = test
+    return tests
+
+
+def _image(rel, thumb, kind):
+    src = html.escape(rel.replace(os.sep, "/"), quote=True)
+    small = html.escape(thumb.replace(os.sep, "/"), quote=True)
+    return (f"<td><a href='{src}' target='_blank'>"
+            f"<img src='{small}' loading='lazy' decoding='async' alt='{kind}'/></a></td>")
+
+
+def _render_test(test):
+    parts = [f"<details{' open' if test['outcome'] in ('failed', 'error') else ''} class='{test['outcome']}'>",
+             f"<summary>{html.escape(test['nodeid'])} — {test['outcome']} ({test['duration']:.1f}s)</summary>"]
+    for note in test.get("notes", []):
+        parts.append(f"<p>{html.escape(note)}</p>")
+    if test["longrepr"]:
+        parts.append(f"<pre>{html.escape(test['longrepr'])}</pre>")
+    for shot in test.get("screenshots", []):
+        cells = "".join(_image(shot[kind], shot[f"{kind}_thumb"], kind) for kind in IMAGE_KINDS if shot.get(kind))
+        heads = "".join(f"<th>{kind.title()}</th>" for kind in IMAGE_KINDS if shot.get(kind))
+        parts.append(f"<table><caption>{html.escape(shot['name'])}: {html.escape(shot.get('summary', ''))}</caption>"
+                     f"<tr>{heads}</tr><tr>{cells}</tr></table>")
+    for animation in test.get("animations", []):
+        src = html.escape(animation.replace(os.sep, "/"), quote=True)
+        parts.append(f"<a href='{src}' target='_blank'>🌀 Scroll animation</a>")
+    parts.append("</details>")
+    return "".join(parts)
+
+
+def build_report(run_dir):
+    tests = read_shards(run_dir)
+    if not tests:
+        return None
+    counts = Counter(test["outcome"] for test in tests.values())
+    groups = defaultdict(list)
+    for nodeid in sorted(tests):
+        groups[tests[nodeid]["outcome"] in ("failed", "error")].append(tests[nodeid])
+    body = "\n".join(_render_test(test) for test in groups[True] + groups[False])
+    summary = ", ".join(f"{n} {outcome}" for outcome, n in sorted(counts.items()))
+    page = f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"/><title>Visual test report</title>
+<style>
+body {{ font-family: sans-serif; }} details {{ border: 1px solid #ccc; margin: 4px 0; padding: 4px 8px; }}
+details.failed, details.error {{ background: #fdd; }} details.skipped {{ background: #ffd; }}
+table {{ margin: 6px 0; }} caption {{ text-align: left; font-weight: bold; }}
+img {{ max-width: {THUMB_WIDTH}px; border: 1px solid #999; }} pre {{ white-space: pre-wrap; }}
+</style></head><body>
+<h1>Visual test report</h1>
+<p>{summary}</p>
+{body}
+</body></html>
+"""
+    path = os.path.join(run_dir, REPORT_FILE)
+    fd, tmp = tempfile.mkstemp(dir=run_dir, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(page)
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,280 @@
+# Prune, deduplicate and compact the screenshots/ tree:
+#
+#   python tests/retention.py --keep-last 5 --recompress
+#
+# Runs newer than the last N, runs that had failures and runs a test session
+# is still writing to are kept, as is every baseline the manifest points at.
+# Files identical across the kept runs are hard-linked together.
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import socket
+import sys
+import time
+
+from filelock import FileLock
+from PIL import Image
+
+# Run as a script, only tests/ is on sys.path; qa_common/ lives at the repository root.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from baseline_cache import DecodedBaselineCache  # noqa: E402
+from baseline_store import MANIFEST, STORE_DIR, read_manifest  # noqa: E402
+from qa_common.files import atomic_write  # noqa: E402
+from shards import RESULTS_DIR, SCREENSHOTS_ROOT  # noqa: E402
+
+KEEP_LAST = 5
+ACTIVE_PREFIX = ".active-"
+# A marker left by a session on another machine (or on Windows, where the pid
+# can't be probed) is trusted for this long.
+STALE_HOURS = 12
+DEDUP_EXTENSIONS = (".png", ".gif", ".webp")
+RECOMPRESS_DIRS = ("current", "failed", "clicks")
+# Sub-folders that mark a directory of the screenshots root as a run, so
+# anything else kept there (the screenshot viewer) is never touched.
+RUN_DIRS = ("baseline", "current", "failed", "scroll_gifs", RESULTS_DIR)
+
+
+def _marker_name():
+    return f"{ACTIVE_PREFIX}{socket.gethostname()}-{os.getpid()}"
+
+
+def mark_active(run_dir):
+    # Written by every test session into its run folder and removed when it
+    # ends, so a concurrent cleanup leaves that run and the store alone.
+    os.makedirs(run_dir, exist_ok=True)
+    path = os.path.join(run_dir, _marker_name())
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"host": socket.gethostname(), "pid": os.getpid(), "started": time.time()}, f)
+    return path
+
+
+def clear_active(run_dir):
+    try:
+        os.remove(os.path.join(run_dir, _marker_name()))
+    except OSError:
+        pass
+
+
+def _pid_alive(pid):
+    # None where the pid can't be probed.
+    if os.name == "nt":
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def is_active(run_dir):
+    for name in os.listdir(run_dir):
+        if not name.startswith(ACTIVE_PREFIX):
+            continue
+        path = os.path.join(run_dir, name)
+        try:
+            with open(path, encoding="utf-8") as f:
+                marker = json.load(f)
+            age = time.time() - os.path.getmtime(path)
+        except (OSError, ValueError):
+            continue
+        # A session on this machine is active exactly while its process runs,
+        # however long that is; the age cutoff is for markers that can't be checked.
+        alive = _pid_alive(marker.get("pid", -1)) if marker.get("host") == socket.gethostname() else None
+        if alive or (alive is None and age <= STALE_HOURS * 3600):
+            return True
+    return False
+
+
+def has_failures(run_dir):
+    failed = os.path.join(run_dir, "failed")
+    if os.path.isdir(failed) and os.listdir(failed):
+        return True
+    results = os.path.join(run_dir, RESULTS_DIR)
+    if os.path.isdir(results):
+        for filename in os.listdir(results):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(results, filename), encoding="utf-8") as f:
+                    tests = json.load(f)["tests"]
+            except (OSError, ValueError, KeyError):
+                continue
+            if any(test["outcome"] in ("failed", "error") for test in tests):
+                return True
+    return False
+
+
+def _tree_size(path):
+    # Hard-linked files only cost disk once they lose their last link.
+    total = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            try:
+                st = os.stat(os.path.join(root, filename))
+            except OSError:
+                continue
+            if st.st_nlink == 1:
+                total += st.st_size
+    return total
+
+
+def plan_runs(root, keep_last=KEEP_LAST, keep_failed=True):
+    # Returns (kept, removed) run names, oldest first, each with the reason it is kept.
+    runs = sorted(d for d in os.listdir(root) if d != STORE_DIR
+                  and any(os.path.isdir(os.path.join(root, d, sub)) for sub in RUN_DIRS))
+    latest = set(runs[-keep_last:]) if keep_last > 0 else set()
+    kept, removed = [], []
+    for run in runs:
+        run_dir = os.path.join(root, run)
+        if is_active(run_dir):
+            kept.append((run, "active"))
+        elif run in latest:
+            kept.append((run, "recent"))
+        elif keep_failed and has_failures(run_dir):
+            kept.append((run, "failed"))
+        else:
+            removed.append(run)
+    return kept, removed
+
+
+def collect_garbage(root, dry_run=False):
+    # Store objects no manifest entry points at: superseded baselines, their
+    # tile indexes and decoded copies. Only called when no session is active,
+    # since a running test writes its object before it updates the manifest.
+    store = os.path.join(root, STORE_DIR)
+    manifest_path = os.path.join(store, MANIFEST)
+    objects = os.path.join(store, "objects")
+    if not (os.path.exists(manifest_path) and os.path.isdir(objects)):
+        return 0, 0
+    removed = freed = 0
+    with FileLock(manifest_path + ".lock"):
+        referenced = {entry["hash"] for entry in read_manifest(manifest_path)["entries"].values()}
+        decoded = DecodedBaselineCache(os.path.join(store, "decoded"))
+        for filename in sorted(os.listdir(objects)):
+            digest = filename.split(".", 1)[0]
+            if digest in referenced or filename.endswith(".tmp"):
+                continue
+            path = os.path.join(objects, filename)
+            st = os.stat(path)
+            removed += filename.endswith(".png")
+            freed += st.st_size if st.st_nlink == 1 else 0
+            if not dry_run:
+                os.remove(path)
+                decoded.invalidate(digest)
+    return removed, freed
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def deduplicate(paths, dry_run=False):
+    # Content-address every image: candidates are grouped by size first, so
+    # only files that could be equal get hashed. Duplicates on the same
+    # device become hard links to the first copy (store objects come first).
+    by_size = {}
+    for path in paths:
+        st = os.stat(path)
+        by_size.setdefault(st.st_size, []).append((path, st))
+    linked = freed = 0
+    for size, group in by_size.items():
+        if len(group) < 2:
+            continue
+        canonical = {}
+        for path, st in group:
+            digest = _file_digest(path)
+            first = canonical.setdefault(digest, (path, st))
+            if first[0] == path or (first[1].st_dev, first[1].st_ino) == (st.st_dev, st.st_ino):
+                continue
+            if first[1].st_dev != st.st_dev:
+                continue
+            linked += 1
+            freed += size if st.st_nlink == 1 else 0
+            if not dry_run:
+                tmp = f"{path}.{os.getpid()}.tmp"
+                os.link(first[0], tmp)
+                os.replace(tmp, path)
+    return linked, freed
+
+
+def recompress(path, dry_run=False):
+    # Lossless: the pixels are re-encoded with zlib's best settings and the
+    # file is replaced only if that came out smaller.
+    with open(path, "rb") as f:
+        original = f.read()
+    with Image.open(io.BytesIO(original)) as img:
+        buf = io.BytesIO()
+        img.save(buf, "PNG", optimize=True)
+    data = buf.getvalue()
+    if len(data) >= len(original):
+        return 0
+    if not dry_run:
+        atomic_write(path, data)
+    return len(original) - len(data)
+
+
+def _files(directory, extensions):
+    for root, _, files in os.walk(directory):
+        for filename in sorted(files):
+            if filename.endswith(extensions):
+                yield os.path.join(root, filename)
+
+
+def compact(root=SCREENSHOTS_ROOT, keep_last=KEEP_LAST, keep_failed=True, recompress_frames=False, dry_run=False):
+    kept, removed = plan_runs(root, keep_last, keep_failed)
+    prefix = "Would remove" if dry_run else "Removed"
+    freed = 0
+    for run in removed:
+        run_dir = os.path.join(root, run)
+        freed += _tree_size(run_dir)
+        if not dry_run:
+            shutil.rmtree(run_dir, ignore_errors=True)
+    print(f"🧹 {prefix} {len(removed)} run(s), kept {len(kept)} "
+          f"({', '.join(f'{run}: {reason}' for run, reason in kept) or 'none'}) → {freed / 1e6:.1f} MB")
+
+    active = any(reason == "active" for _, reason in kept)
+    if active:
+        print("⏳ A test session is running: leaving the baseline store and active runs untouched")
+    else:
+        objects, store_freed = collect_garbage(root, dry_run)
+        print(f"🗑️ {prefix} {objects} unreferenced baseline(s) → {store_freed / 1e6:.1f} MB")
+
+    idle = [os.path.join(root, run) for run, reason in kept if reason != "active"]
+    if recompress_frames:
+        saved = sum(recompress(path, dry_run) for run_dir in idle for sub in RECOMPRESS_DIRS
+                    for path in _files(os.path.join(run_dir, sub), (".png",)))
+        print(f"🗜️ Recompressed captures → {saved / 1e6:.1f} MB saved")
+
+    # Store objects first, so run copies of a baseline link back to the store.
+    candidates = list(_files(os.path.join(root, STORE_DIR, "objects"), (".png",)))
+    for run_dir in idle:
+        candidates += _files(run_dir, DEDUP_EXTENSIONS)
+    linked, dedup_freed = deduplicate(candidates, dry_run)
+    print(f"🔗 Hard-linked {linked} duplicate file(s) → {dedup_freed / 1e6:.1f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply retention policies to the screenshots folder")
+    parser.add_argument("--root", default=SCREENSHOTS_ROOT, help="Screenshots folder to clean up")
+    parser.add_argument("--keep-last", type=int, default=KEEP_LAST, help="Always keep this many most recent runs")
+    parser.add_argument("--no-keep-failed", dest="keep_failed", action="store_false",
+                        help="Also remove older runs that had failures")
+    parser.add_argument("--recompress", action="store_true",
+                        help="Losslessly recompress the PNG captures of the runs that are kept")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed or linked")
+    args = parser.parse_args(argv)
+    compact(args.root, args.keep_last, args.keep_failed, args.recompress, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import io
+import os
+import struct
+import threading
+
+import numpy as np
+from PIL import Image
+
+REPORT_WIDTH = 480
+FRAME_MS = 1000
+FORMATS = ("gif", "webp")
+# Fills the bars around frames smaller than the animation's first frame.
+LETTERBOX = (0, 0, 0)
+
+
+def _to_image(frame):
+    if isinstance(frame, Image.Image):
+        return frame
+    if isinstance(frame, np.ndarray):
+        return Image.fromarray(frame)
+    if isinstance(frame, (bytes, bytearray, memoryview)):
+        frame = io.BytesIO(frame)
+    img = Image.open(frame)
+    img.load()
+    return img
+
+
+def fit_width(img, width):
+    img = _to_image(img).convert("RGB")
+    w, h = img.size
+    if w <= width:
+        return img
+    return img.resize((width, max(1, round(h * width / w))), Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+
+def _skip_sub_blocks(data, pos):
+    while data[pos]:
+        pos += data[pos] + 1
+    return pos + 1
+
+
+def _gif_frame_blocks(img):
+    # Encode one palette frame with Pillow and lift out its colour table and
+    # LZW image data so it can be appended to a GIF that is already open.
+    buf = io.BytesIO()
+    img.save(buf, format="GIF", optimize=True)
+    data = buf.getvalue()
+    packed = data[10]
+    pos = 13
+    table = b""
+    if packed & 0x80:
+        size = 3 * 2 ** ((packed & 0x07) + 1)
+        table, pos = data[pos:pos + size], pos + size
+    while data[pos] == 0x21:
+        pos = _skip_sub_blocks(data, pos + 2)
+    if data[pos] != 0x2C:
+        raise ValueError("Unexpected GIF block from encoder")
+    descriptor = bytearray(data[pos:pos + 10])
+    pos += 10
+    if descriptor[9] & 0x80:
+        size = 3 * 2 ** ((descriptor[9] & 0x07) + 1)
+        table, pos = data[pos:pos + size], pos + size
+    else:
+        descriptor[9] |= 0x80 | (packed & 0x07)
+    end = _skip_sub_blocks(data, pos + 1)
+    return bytes(descriptor), table, data[pos:end]
+
+
+class ScrollAnimationWriter:
+    # Frames are downscaled and written as they arrive. GIF frames go straight to
+    # disk, so memory holds one frame at a time whatever the page height. WebP
+    # has no append API in Pillow, so it keeps the downscaled frames until close.
+
+    def __init__(self, path, width=REPORT_WIDTH, fmt=None, frame_ms=FRAME_MS):
+        self.path = path
+        self.width = width
+        self.fmt = (fmt or os.path.splitext(path)[1].lstrip(".") or "gif").lower()
+        if self.fmt not in FORMATS:
+            raise ValueError(f"Unsupported animation format: {self.fmt}")
+        self.frame_ms = frame_ms
+        self.size = None
+        self.frames = 0
+        self._file = None
+        self._webp_frames = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _fit(self, img):
+        img = fit_width(img, self.width)
+        if self.size is None:
+            self.size = img.size
+        if img.size == self.size:
+            return img
+        # The first frame fixes the canvas. Other sizes (a short last tile, a
+        # page that reflowed mid-scroll) keep their aspect ratio: a larger frame
+        # is shrunk to fit, and the frame is centred on letterbox bars.
+        if img.width > self.size[0] or img.height > self.size[1]:
+            img = img.copy()
+            img.thumbnail(self.size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+        canvas = Image.new("RGB", self.size, LETTERBOX)
+        canvas.paste(img, ((self.size[0] - img.width) // 2, (self.size[1] - img.height) // 2))
+        return canvas
+
+    def append(self, frame):
+        img = self._fit(frame)
+        if self.fmt == "webp":
+            self._webp_frames.append(img)
+        else:
+            self._append_gif(img)
+        self.frames += 1
+
+    def _append_gif(self, img):
+        if self._file is None:
+            self._file = open(self.path, "wb")
+            w, h = self.size
+            self._file.write(b"GIF89a" + struct.pack("<HHBBB", w, h, 0, 0, 0))
+            # NETSCAPE2.0 application extension: loop forever.
+            self._file.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")
+        palette_frame = img.quantize(colors=256, method=Image.Quantize.MEDIANCUT)
+        descriptor, table, image_data = _gif_frame_blocks(palette_frame)
+        delay = max(1, round(self.frame_ms / 10))
+        self._file.write(b"\x21\xf9\x04\x04" + struct.pack("<H", delay) + b"\x00\x00")
+        self._file.write(descriptor + table + image_data)
+
+    def close(self):
+        if self.fmt == "webp":
+            if self._webp_frames:
+                first, *rest = self._webp_frames
+                first.save(self.path, format="WEBP", save_all=True, append_images=rest,
+                           duration=self.frame_ms, loop=0, quality=70, method=4)
+            self._webp_frames = []
+        elif self._file is not None:
+            self._file.write(b"\x3b")
+            self._file.close()
+            self._file = None
+
+
+class AnimationStream:
+    # Feeds frames that finish out of order (pool futures) to a writer in the
+    # order they were added. Each frame is written as soon as the ones before
+    # it are, so only frames that finished ahead of an earlier one wait here.
+
+    def __init__(self, writer, take=lambda result: result):
+        self.writer = writer
+        self.take = take
+        self.added = 0
+        self.written = 0
+        self.ready = {}
+        self.error = None
+        self._lock = threading.Condition()
+
+    def add(self, future):
+        with self._lock:
+            index = self.added
+            self.added += 1
+        future.add_done_callback(lambda done: self._arrived(index, done))
+
+    def _arrived(self, index, future):
+        # A failed job gives no frame; its error surfaces where its result is collected.
+        frame = None
+        if not future.cancelled() and future.exception() is None:
+            frame = self.take(future.result())
+        with self._lock:
+            self.ready[index] = frame
+            while self.written in self.ready:
+                frame = self.ready.pop(self.written)
+                self.written += 1
+                if frame is not None and self.error is None:
+                    try:
+                        self.writer.append(frame)
+                    except Exception as e:
+                        self.error = e
+            self._lock.notify_all()
+
+    def finish(self):
+        # Waits for the frames still in flight, then closes the writer.
+        with self._lock:
+            self._lock.wait_for(lambda: self.written == self.added)
+        self.writer.close()
+        if self.error is not None:
+            raise self.error
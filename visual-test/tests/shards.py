@@ -0,0 +1,196 @@
+# Split the test matrix across machines and merge their screenshot trees.
+# Run one shard per machine with `pytest --shard=i/N`, then combine the copied
+# screenshots/ folders with:
+#
+#   python tests/shards.py merge --output merged shard-1/screenshots shard-2/screenshots
+import argparse
+import html
+import json
+import os
+import shutil
+import sys
+import time
+from collections import defaultdict
+
+# Run as a script, only tests/ is on sys.path; qa_common/ lives at the repository root.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from baseline_store import MANIFEST, STORE_DIR, BaselineStore, read_manifest  # noqa: E402
+from qa_common.files import atomic_write  # noqa: E402
+from report_writer import build_report, record_outcome  # noqa: E402
+
+SCREENSHOTS_ROOT = "screenshots"
+RUN_ID_ENV = "QA_RUN_ID"
+RESULTS_DIR = "results"
+
+
+def run_id():
+    # One id per run, shared by the controller and every xdist worker (they
+    # inherit the environment). CI can set QA_RUN_ID so all shards of a
+    # pipeline write into the same screenshots/<run>/ folder.
+    return os.environ.setdefault(RUN_ID_ENV, time.strftime("%Y-%m-%d_%H-%M-%S"))
+
+
+def parse_shard(value):
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {value!r}")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard index must be between 1 and {count}, got {index}")
+    return index, count
+
+
+def assign_shards(nodeids, count, estimate):
+    # Longest first onto the least-loaded shard. Ties break on node id and
+    # shard number, so every machine computes the same split from the same
+    # duration history.
+    loads = [0.0] * count
+    shards = {}
+    for nodeid in sorted(nodeids, key=lambda n: (-estimate(n), n)):
+        shard = min(range(count), key=lambda s: (loads[s], s))
+        loads[shard] += estimate(nodeid)
+        shards[nodeid] = shard + 1
+    return shards
+
+
+class ResultsRecorder:
+    # Plugin that writes screenshots/<run>/results/<shard>.json on the
+    # controller: one record per test with its outcome, duration and failure
+    # text, which the merge command turns into a combined report.
+
+    def __init__(self, shard=None):
+        self.shard = shard
+        self.tests = {}
+
+    def pytest_runtest_logreport(self, report):
+        record_outcome(self.tests, report)
+
+    def pytest_sessionfinish(self, session):
+        if hasattr(session.config, "workerinput") or not self.tests:
+            return
+        name = f"shard-{self.shard[0]}-of-{self.shard[1]}" if self.shard else "results"
+        directory = os.path.join(SCREENSHOTS_ROOT, run_id(), RESULTS_DIR)
+        os.makedirs(directory, exist_ok=True)
+        payload = {"run": run_id(), "shard": name, "tests": list(self.tests.values())}
+        atomic_write(os.path.join(directory, f"{name}.json"), json.dumps(payload, indent=1).encode("utf-8"))
+
+
+def _copy_tree(src, dst):
+    # Files that already exist are left alone: run folders from different
+    # shards hold different test names, and store objects are content-addressed.
+    copied = 0
+    for root, _, files in os.walk(src):
+        target = os.path.join(dst, os.path.relpath(root, src))
+        os.makedirs(target, exist_ok=True)
+        for filename in files:
+            if filename.endswith((".lock", ".tmp")):
+                continue
+            path = os.path.join(target, filename)
+            if not os.path.exists(path):
+                shutil.copy2(os.path.join(root, filename), path)
+                copied += 1
+    return copied
+
+
+def merge_baselines(sources, output):
+    # Union of every shard's store; when two shards saved the same baseline
+    # name or page fingerprint, the one from the latest run wins.
+    store = BaselineStore(output)
+    for source in sources:
+        objects = os.path.join(source, STORE_DIR, "objects")
+        if os.path.isdir(objects):
+            _copy_tree(objects, store.objects_dir)
+        manifest = read_manifest(os.path.join(source, STORE_DIR, MANIFEST))
+        if manifest:
+            store.merge(manifest["entries"], manifest.get("fingerprints", {}))
+    return store.entries
+
+
+def merge_runs(sources, output):
+    results = []
+    for source in sources:
+        for run in sorted(os.listdir(source)):
+            run_dir = os.path.join(source, run)
+            if run == STORE_DIR or not os.path.isdir(run_dir):
+                continue
+            _copy_tree(run_dir, os.path.join(output, run))
+            results_dir = os.path.join(run_dir, RESULTS_DIR)
+            if os.path.isdir(results_dir):
+                for filename in sorted(os.listdir(results_dir)):
+                    if filename.endswith(".json"):
+                        with open(os.path.join(results_dir, filename), encoding="utf-8") as f:
+                            results.append(json.load(f))
+    return results
+
+
+def render_report(results, output):
+    rows = []
+    counts = defaultdict(int)
+    for shard in results:
+        for test in shard["tests"]:
+            counts[test["outcome"]] += 1
+            detail = f"<pre>{html.escape(test['longrepr'])}</pre>" if test["longrepr"] else ""
+            rows.append(f"<tr class='{test['outcome']}'><td>{html.escape(test['nodeid'])}</td>"
+                        f"<td>{test['outcome']}</td><td>{test['duration']:.1f}</td>"
+                        f"<td>{html.escape(shard['run'])} / {html.escape(shard['shard'])}</td><td>{detail}</td></tr>")
+    diffs = []
+    for run in sorted({shard["run"] for shard in results}):
+        failed = os.path.join(output, run, "failed")
+        if os.path.isdir(failed):
+            for filename in sorted(os.listdir(failed)):
+                src = html.escape(f"{run}/failed/{filename}")
+                diffs.append(f"<figure><img src='{src}' height='150'/><figcaption>{src}</figcaption></figure>")
+    summary = ", ".join(f"{n} {outcome}" for outcome, n in sorted(counts.items()))
+    page = f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"/><title>Merged test report</title>
+<style>
+body {{ font-family: sans-serif; }} table {{ border-collapse: collapse; }}
+td, th {{ border: 1px solid #ccc; padding: 4px 8px; vertical-align: top; }}
+tr.failed, tr.error {{ background: #fdd; }} tr.skipped {{ background: #ffd; }}
+figure {{ display: inline-block; margin: 4px; }}
+</style></head><body>
+<h1>Merged test report</h1>
+<p>{len(results)} shard result file(s): {summary or "no tests"}</p>
+<table><tr><th>Test</th><th>Outcome</th><th>Seconds</th><th>Run / shard</th><th>Details</th></tr>
+{"".join(rows)}
+</table>
+<h2>Visual diffs</h2>
+{"".join(diffs) or "<p>None</p>"}
+</body></html>
+"""
+    path = os.path.join(output, "merged_report.html")
+    atomic_write(path, page.encode("utf-8"))
+    return path
+
+
+def merge(sources, output):
+    os.makedirs(output, exist_ok=True)
+    # The manifest goes in first so a BaselineStore opened on the merged tree
+    # never tries to rebuild it from the copied run folders.
+    entries = merge_baselines(sources, output)
+    results = merge_runs(sources, output)
+    with open(os.path.join(output, "merged_results.json"), "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=1)
+    report = render_report(results, output)
+    for run in sorted({shard["run"] for shard in results}):
+        # Each shard streamed its own report lines and thumbnails into the
+        # run folder; with them all copied in, rebuild the run's report.
+        build_report(os.path.join(output, run))
+    tests = sum(len(r["tests"]) for r in results)
+    print(f"🧩 Merged {len(sources)} shard(s): {tests} tests, {len(entries)} baselines → {report}")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge screenshot trees from sharded runs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    merge_cmd = commands.add_parser("merge", help="Combine shard screenshot folders into one tree and report")
+    merge_cmd.add_argument("sources", nargs="+", help="screenshots/ folders copied from each shard")
+    merge_cmd.add_argument("--output", default=SCREENSHOTS_ROOT, help="Merged screenshots folder")
+    args = parser.parse_args(argv)
+    merge(args.sources, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,33 @@
 import os
-import time
-import imageio
-from PIL import Image, ImageChops
+from dataclasses import dataclass
 import pytest
-import pytest_html
 from selenium import webdriver
-from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.firefox.options import Options as FirefoxOptions
 from selenium.webdriver.edge.options import Options as EdgeOptions
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.firefox.service import Service as FirefoxService
 from selenium.webdriver.edge.service import Service as EdgeService
-from webdriver_manager.chrome import ChromeDriverManager
-from webdriver_manager.firefox import GeckoDriverManager
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
+from compare_pipeline import ComparisonPipeline
+from baseline_store import BaselineStore
+from qa_common.driver_pool import DriverPool
+from qa_common.driver_resolver import resolve_driver
+from qa_common.readiness import wait_for_page_ready, wait_for_settle
+from full_page import full_page_tiles
+from image_compare import encode_png
+from fingerprint import page_fingerprint
+from qa_common.dom_audit import collect_audit
+from qa_common.crawler import Crawler, page_slug
+from qa_common.interactions import InteractionEngine, open_tab
+from qa_common.link_checker import LinkChecker
+from multi_context import ContextEngine
+from scroll_animation import AnimationStream, ScrollAnimationWriter
+from shards import SCREENSHOTS_ROOT, run_id
+from qa_common.tracing import instrument, span
 
-URL = "https://arunahf.vercel.app/"
-timestamp = time.strftime("%Y-%m-%d_%H-%M-%S")
-BASE_DIR = os.path.join("screenshots", timestamp)
+# Shared by every xdist worker, so a parallel run writes a single folder.
+timestamp = run_id()
+BASE_DIR = os.path.join(SCREENSHOTS_ROOT, timestamp)
 BASELINE_DIR = os.path.join(BASE_DIR, "baseline")
 CURRENT_DIR = os.path.join(BASE_DIR, "current")
 FAILED_DIR = os.path.join(BASE_DIR, "failed")
@@ -32,79 +41,218 @@ MOBILE_VIEWPORTS = {
     "Desktop": (1280, 1000)
 }
 
-def get_latest_baseline_dir():
-    parent = "screenshots"
-    dirs = sorted([d for d in os.listdir(parent) if os.path.isdir(os.path.join(parent, d))], reverse=True)
-    for d in dirs:
-        path = os.path.join(parent, d, "baseline")
-        if os.path.exists(path):
-            return path
-    return BASELINE_DIR
-
-def compare_images(baseline_path, current_path, diff_path):
-    baseline = Image.open(baseline_path)
-    current = Image.open(current_path)
-    diff = ImageChops.difference(baseline, current)
-    if diff.getbbox():
-        diff.save(diff_path)
-        return False
-    return True
+_baseline_store = None
+
+def get_baseline_store():
+    global _baseline_store
+    if _baseline_store is None:
+        _baseline_store = BaselineStore(SCREENSHOTS_ROOT)
+    return _baseline_store
+
+_link_checker = None
+
+def get_link_checker():
+    # One checker per worker, with a run-wide cache shared by every browser and viewport.
+    global _link_checker
+    if _link_checker is None:
+        _link_checker = LinkChecker(cache_path=os.path.join(BASE_DIR, "link_cache.json"))
+    return _link_checker
 
 def save_and_compare(name, driver, request):
+    return compare_screenshot(name, driver.get_screenshot_as_png(), request)
+
+def compare_screenshot(name, image, request, frame_width=None):
+    # Captures stay in memory: new baselines are stored straight from the capture,
+    # comparisons are queued on the process pool and their verdicts gathered by
+    # verify_screenshots() at the end of the test. Only failing captures are
+    # written to CURRENT_DIR. With frame_width the pool also returns the
+    # downscaled animation frame, so the capture is decoded once; for a new
+    # baseline the pool writes its tile index from that same decode.
+    store = get_baseline_store()
     current = os.path.join(CURRENT_DIR, f"{name}.png")
-    baseline = os.path.join(get_latest_baseline_dir(), f"{name}.png")
+    baseline = store.ref(name)
     diff = os.path.join(FAILED_DIR, f"{name}_diff.png")
-    driver.save_screenshot(current)
+    tiles_path = None
 
-    if not os.path.exists(baseline):
-        Image.open(current).save(baseline)
+    if baseline is None:
+        png = image if isinstance(image, bytes) else encode_png(image)
+        store.put(name, png, run=timestamp)
+        store.link_into(name, BASELINE_DIR)
         print(f"📸 Saved new baseline: {name}")
-    else:
-        passed = compare_images(baseline, current, diff)
-        if not passed:
-            html = f"""<div><b>{name}</b><table>
-              <tr><th>Baseline</th><th>Current</th><th>Diff</th></tr><tr>
-              <td><img src="file:///{baseline}" height="150"/></td>
-              <td><img src="file:///{current}" height="150"/></td>
-              <td><img src="file:///{diff}" height="150"/></td>
-              </tr></table></div>"""
-            request.node.extra = getattr(request.node, "extra", [])
-            request.node.extra.append(pytest_html.extras.html(html))
-            pytest.fail(f"❌ Visual diff found: {name}")
-
-def capture_scroll_screens(driver, name_prefix, request):
-    screenshots = []
+        if store.needs_tiles(name):
+            tiles_path = store.ref(name).tiles_path
+        elif not frame_width:
+            return None
+    thresholds = {
+        "channel_threshold": request.config.getoption("--channel-threshold"),
+        "max_changed_ratio": request.config.getoption("--max-diff-ratio"),
+    }
+    return request.getfixturevalue("compare_pipeline").submit(
+        request.node.nodeid, name, baseline, image, current, diff, thresholds, frame_width, tiles_path)
+
+def verify_screenshots(request, captures=()):
+    # Called after the functional checks, which gave the pool time to finish
+    # the comparisons and the animation frames queued by capture_page().
+    write_animations(captures, request)
+    store = get_baseline_store()
+    failures = []
+    # Time spent here is the test waiting on the comparison pool.
+    with span("compare.wait"):
+        verdicts = request.getfixturevalue("compare_pipeline").collect(request.node.nodeid)
+    for name, result in verdicts:
+        if result:
+            continue
+        baseline = store.link_into(name, BASELINE_DIR)
+        current = os.path.join(CURRENT_DIR, f"{name}.png")
+        diff = os.path.join(FAILED_DIR, f"{name}_diff.png")
+        # Picked up by the ReportWriter, which thumbnails the three images.
+        request.node.user_properties.append(("screenshot", {
+            "name": name,
+            "summary": result.summary(),
+            "baseline": os.path.relpath(baseline, BASE_DIR),
+            "current": os.path.relpath(current, BASE_DIR),
+            "diff": os.path.relpath(diff, BASE_DIR),
+        }))
+        failures.append(f"{name} — {result.summary()}")
+    if failures:
+        pytest.fail("❌ Visual diffs found:\n" + "\n".join(failures))
+
+def capture_scroll_screens(driver, name_prefix, request, animation):
+    names = []
     for i in range(10):
         scroll_position = driver.execute_script("return window.scrollY + window.innerHeight")
         max_scroll = driver.execute_script("return document.body.scrollHeight")
-        filename = os.path.join(CURRENT_DIR, f"{name_prefix}_scroll_{i}.png")
-        driver.save_screenshot(filename)
-        screenshots.append(filename)
-        save_and_compare(f"{name_prefix}_scroll_{i}", driver, request)
+        png = driver.get_screenshot_as_png()
+        names.append(f"{name_prefix}_scroll_{i}")
+        animation.add(compare_screenshot(names[-1], png, request, animation.writer.width))
         if scroll_position >= max_scroll:
             break
         driver.execute_script("window.scrollBy(0, window.innerHeight)")
-        time.sleep(1)
-    return screenshots
+        wait_for_settle(driver)
+    return names
+
+def capture_full_page_tiles(driver, name_prefix, request, animation):
+    # One capture of the whole document, cut into viewport-sized tiles in memory.
+    tiles = full_page_tiles(driver)
+    names = [f"{name_prefix}_full_{i}" for i in range(len(tiles))]
+    for name, tile in zip(names, tiles):
+        animation.add(compare_screenshot(name, tile, request, animation.writer.width))
+    return names
+
+@dataclass
+class PageCapture:
+    fingerprint_key: str
+    fingerprint: dict
+    names: list
+    animation_path: str
+    # Writes each downscaled frame, in scroll order, as soon as the pool has it.
+    animation: AnimationStream
+
+def capture_page(driver, prefix, request):
+    # Fingerprint the page before anything scrolls or clicks it. When it
+    # matches the one stored with these baselines, --incremental skips the
+    # screenshot and animation work and this returns None; otherwise the
+    # comparisons are queued and the PageCapture is handed to
+    # verify_screenshots() and record_fingerprints() once the functional
+    # checks have run.
+    store = get_baseline_store()
+    full_page = request.config.getoption("--full-page")
+    fingerprint_key = f"{prefix}_{'full' if full_page else 'scroll'}"
+    with span("fingerprint"):
+        fingerprint = page_fingerprint(driver, fingerprint_key)
+    if request.config.getoption("--incremental") and store.unchanged(fingerprint_key, fingerprint):
+        print(f"⏭️ {prefix} unchanged since {store.get_fingerprint(fingerprint_key)['run']}: skipping screenshots")
+        request.node.user_properties.append(("visual", f"{prefix} unchanged"))
+        return None
+
+    names = [f"{prefix}_hero"]
+    save_and_compare(names[0], driver, request)
+
+    animation_format = request.config.getoption("--scroll-format")
+    gif_path = os.path.join(GIF_DIR, f"{prefix}_scroll.{animation_format}")
+    writer = ScrollAnimationWriter(gif_path, width=request.config.getoption("--report-width"))
+    animation = AnimationStream(writer, take=lambda output: output.take_frame())
+    with span("scroll_capture", prefix=prefix, full_page=full_page):
+        if full_page:
+            scrolled = capture_full_page_tiles(driver, prefix, request, animation)
+        else:
+            scrolled = capture_scroll_screens(driver, prefix, request, animation)
+    return PageCapture(fingerprint_key, fingerprint, names + scrolled, gif_path, animation)
+
+def write_animations(captures, request):
+    # Most frames were written while the functional checks ran; this waits
+    # for the rest and closes the file.
+    for capture in captures:
+        if capture is None:
+            continue
+        with span("animation", frames=capture.animation.added):
+            capture.animation.finish()
+        request.node.user_properties.append(("animation", os.path.relpath(capture.animation_path, BASE_DIR)))
+
+def record_fingerprints(captures):
+    store = get_baseline_store()
+    for capture in captures:
+        if capture:
+            store.put_fingerprint(capture.fingerprint_key, capture.fingerprint, capture.names, run=timestamp)
+
+def check_interactions(driver, request, prefix, new_tab=open_tab):
+    with span("audit.collect"):
+        buttons, links = collect_audit(driver)
+    print("\n🔎 Button test started:")
+    targets = []
+    for i, btn in enumerate(buttons):
+        if btn.visible and btn.enabled:
+            targets.append(btn)
+        else:
+            print(f"⚠️ Skipped (hidden/disabled): {btn.label(f'Button{i+1}')}")
+    # Each click runs in its own tab, several at a time, so clicks that
+    # navigate or open the modal can't interfere with one another.
+    click_dir = os.path.join(BASE_DIR, "clicks", prefix)
+    os.makedirs(click_dir, exist_ok=True)
+    engine = InteractionEngine(driver, driver.current_url, tabs=request.config.getoption("--interaction-tabs"),
+                               screenshot_dir=click_dir, new_tab=new_tab)
+    with span("audit.buttons", buttons=len(targets)):
+        outcomes = engine.run(targets)
+    for outcome in outcomes:
+        if outcome.ok:
+            print(f"✅ Clicked button: {outcome.label} → {outcome.describe()}")
+        else:
+            print(f"❌ Failed to click button {outcome.label}: {outcome.error}")
+        for message in outcome.console_errors:
+            print(f"⚠️ Console error after {outcome.label}: {message}")
+
+    print("\n🔗 Link check started:")
+    for i, link in enumerate(links):
+        href = link.href
+        if href and not href.startswith("javascript"):
+            print(f"✅ Valid href: Link {i+1} → {href}")
+        else:
+            print(f"❌ Invalid href: Link {i+1}")
+    return links
 
-def create_gif(images, output_path):
-    imageio.mimsave(output_path, [Image.open(img) for img in images], fps=1)
+def check_links(hrefs):
+    print("\n🌐 Link reachability check:")
+    with span("audit.links", links=len(hrefs)):
+        broken = [r for r in get_link_checker().check(hrefs) if not r.ok]
+    for r in broken:
+        print(f"❌ Broken link: {r.url} ({r.status or r.error})")
+    assert not broken, f"{len(broken)} broken link(s)"
 
-def get_driver(browser_name, headless):
+def get_driver(browser_name, headless, driver_dir=None):
     if browser_name == "chrome":
         options = ChromeOptions()
         if headless: options.add_argument("--headless=new")
         options.add_argument("--window-size=1280,1000")
-        return webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=options)
+        return webdriver.Chrome(service=ChromeService(resolve_driver("chrome", driver_dir)), options=options)
     elif browser_name == "firefox":
         options = FirefoxOptions()
         if headless: options.add_argument("--headless")
-        return webdriver.Firefox(service=FirefoxService(GeckoDriverManager().install()), options=options)
+        return webdriver.Firefox(service=FirefoxService(resolve_driver("firefox", driver_dir)), options=options)
     elif browser_name == "edge":
         options = EdgeOptions()
         if headless: options.add_argument("--headless=new")
         options.add_argument("--window-size=1280,1000")
-        return webdriver.Edge(service=EdgeService(EdgeChromiumDriverManager().install()), options=options)
+        return webdriver.Edge(service=EdgeService(resolve_driver("edge", driver_dir)), options=options)
     raise ValueError(f"Unsupported browser: {browser_name}")
 
 def pytest_addoption(parser):
@@ -113,72 +261,104 @@ def pytest_addoption(parser):
 BROWSERS = ["chrome"]
 VIEWPORTS = ["Desktop", "iPhone X", "Galaxy S20"]
 
+@pytest.fixture(scope="session")
+def driver_pool(request):
+    headless = request.config.getoption("--headless")
+    driver_dir = request.config.getoption("--driver-dir")
+    pool = DriverPool(lambda browser_name: instrument(get_driver(browser_name, headless, driver_dir)))
+    yield pool
+    request.config.driver_pool_stats = getattr(request.config, "driver_pool_stats", []) + pool.close()
+
+@pytest.fixture(scope="session")
+def context_engine(request, driver_pool):
+    engine = ContextEngine(driver_pool, mode=request.config.getoption("--multi-context"))
+    yield engine
+    engine.close()
+
+@pytest.fixture(scope="session")
+def compare_pipeline(request):
+    pipeline = ComparisonPipeline(
+        cache_dir=get_baseline_store().decoded.directory,
+        cache_bytes=request.config.getoption("--baseline-cache-mb") * 1024 * 1024,
+    )
+    yield pipeline
+    pipeline.close()
+
 @pytest.mark.parametrize("browser_name", BROWSERS)
 @pytest.mark.parametrize("viewport_label", VIEWPORTS)
-def test_full_visual_and_functional(browser_name, viewport_label, request):
-    headless = request.config.getoption("--headless")
-    driver = get_driver(browser_name, headless)
-    width, height = MOBILE_VIEWPORTS[viewport_label]
+def test_full_visual_and_functional(browser_name, viewport_label, request, driver_pool, compare_pipeline, site_url):
+    prefix = f"{browser_name}_{viewport_label.replace(' ', '_')}"
+    session = None
+    new_tab = open_tab
+    engine = request.getfixturevalue("context_engine") if request.config.getoption("--multi-context") else None
+    if engine and engine.supports(browser_name):
+        # The page was already loaded in its emulated tab; device emulation
+        # renders differently from a resized window, so baselines are kept apart.
+        with span("navigate", url=site_url, emulated=True):
+            driver = engine.activate(browser_name, viewport_label, site_url)
+        # Click tabs open in the device's own context, emulated the same way.
+        new_tab = engine.tab_opener(browser_name, viewport_label)
+        prefix = f"{prefix}_emulated"
+    else:
+        session = driver_pool.acquire(browser_name, MOBILE_VIEWPORTS[viewport_label])
+        driver = session.driver
+        with span("navigate", url=site_url):
+            driver.get(site_url)
+
+    try:
+        with span("page_ready"):
+            wait_for_page_ready(driver)
+        captured = capture_page(driver, prefix, request)
+        links = check_interactions(driver, request, prefix, new_tab)
+        verify_screenshots(request, [captured])
+        record_fingerprints([captured])
 
+        if request.config.getoption("--check-links"):
+            check_links([link.href for link in links])
+
+    finally:
+        compare_pipeline.discard(request.node.nodeid)
+        if session is not None:
+            driver_pool.release(session)
+
+@pytest.mark.parametrize("browser_name", BROWSERS)
+@pytest.mark.parametrize("viewport_label", VIEWPORTS)
+def test_crawl_site(browser_name, viewport_label, request, compare_pipeline, site_url):
+    # Every same-origin page reachable from the start page gets the same visual
+    # and functional checks, under its own baseline namespace. The start page
+    # itself is covered by test_full_visual_and_functional and only seeds links.
+    if not request.config.getoption("--crawl"):
+        pytest.skip("multi-page crawl runs with --crawl")
+    prefix = f"{browser_name}_{viewport_label.replace(' ', '_')}"
+    captures, hrefs = [], []
+
+    def visit(driver, url, depth):
+        if depth == 0:
+            return [link.href for link in collect_audit(driver)[1]]
+        print(f"\n🕸️ Crawling {url}")
+        page_prefix = f"{prefix}_page_{page_slug(url)}"
+        captures.append(capture_page(driver, page_prefix, request))
+        links = [link.href for link in check_interactions(driver, request, page_prefix)]
+        hrefs.extend(links)
+        return links
+
+    headless = request.config.getoption("--headless")
+    driver_dir = request.config.getoption("--driver-dir")
+    workers = request.config.getoption("--crawl-workers")
+    pool = DriverPool(lambda name: instrument(get_driver(name, headless, driver_dir)), size=workers)
     try:
-        driver.set_window_size(width, height)
-        driver.get(URL)
-        time.sleep(3)
-
-        prefix = f"{browser_name}_{viewport_label.replace(' ', '_')}"
-
-        save_and_compare(f"{prefix}_hero", driver, request)
-
-        scroll_imgs = capture_scroll_screens(driver, prefix, request)
-        gif_path = os.path.join(GIF_DIR, f"{prefix}_scroll.gif")
-        create_gif(scroll_imgs, gif_path)
-
-        request.node.extra = getattr(request.node, "extra", [])
-        request.node.extra.append(pytest_html.extras.html(
-            f"<div><b>🌀 Scroll GIF:</b><br/><img src='file:///{gif_path}' height='300'/></div>"
-        ))
-
-        # Functional checks
-        print("\n🔎 Button test started:")
-        buttons = driver.find_elements(By.TAG_NAME, "button") + driver.find_elements(By.CLASS_NAME, "card-btn")
-        for i, btn in enumerate(buttons):
-            try:
-                label = btn.text or btn.get_attribute("aria-label") or f"Button{i+1}"
-                if btn.is_displayed() and btn.is_enabled():
-                    btn.click()
-                    print(f"✅ Clicked button: {label}")
-                    time.sleep(0.5)
-                else:
-                    print(f"⚠️ Skipped (hidden/disabled): {label}")
-            except Exception as e:
-                print(f"❌ Failed to click button {i+1}: {e}")
-
-        print("\n🔗 Link check started:")
-        links = driver.find_elements(By.TAG_NAME, "a")
-        for i, link in enumerate(links):
-            href = link.get_attribute("href")
-            if href and not href.startswith("javascript"):
-                print(f"✅ Valid href: Link {i+1} → {href}")
-            else:
-                print(f"❌ Invalid href: Link {i+1}")
-
-        # Modal interaction
-        try:
-            modal = driver.find_element(By.CLASS_NAME, "modal-overlay")
-            if modal.is_displayed():
-                print("✅ Modal appeared")
-
-                modal_buttons = modal.find_elements(By.TAG_NAME, "button")
-                for j, mbtn in enumerate(modal_buttons):
-                    if mbtn.is_displayed() and mbtn.is_enabled():
-                        try:
-                            mbtn.click()
-                            print(f"✅ Clicked modal button {j+1}")
-                            time.sleep(0.5)
-                        except:
-                            print(f"❌ Modal button {j+1} click failed")
-        except Exception as e:
-            print(f"⚠️ Modal not found or interaction failed: {e}")
+        pages = Crawler(pool, browser_name, visit, MOBILE_VIEWPORTS[viewport_label],
+                        max_depth=request.config.getoption("--crawl-depth"),
+                        max_pages=request.config.getoption("--crawl-max-pages"),
+                        workers=workers).crawl(site_url)
+        print(f"\n🕸️ Crawled {len(pages)} page(s)")
+        errors = [f"{page.url} — {page.error}" for page in pages if page.error]
+        assert not errors, "Pages failed to load:\n" + "\n".join(errors)
+        verify_screenshots(request, captures)
+        record_fingerprints(captures)
 
+        if request.config.getoption("--check-links"):
+            check_links(hrefs)
     finally:
-        driver.quit()
+        compare_pipeline.discard(request.node.nodeid)
+        request.config.driver_pool_stats = getattr(request.config, "driver_pool_stats", []) + pool.close()